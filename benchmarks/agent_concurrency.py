@@ -0,0 +1,116 @@
+"""
+Concurrency benchmark for /api/v1/ai_agent/chat.
+
+Fires N simultaneous chats at chat_with_ai in "sync" and "async" agent mode
+and reports requests/sec. The Groq API, the search gate, vector search and
+Celery are replaced by in-process stand-ins with a fixed latency; Redis and
+MongoDB are expected to run locally, e.g.
+
+    docker run -d -p 6379:6379 redis
+    docker run -d -p 27017:27017 mongo
+
+Run from the project root:
+
+    uv run python -m benchmarks.agent_concurrency --concurrency 50 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import types
+from types import SimpleNamespace
+
+# Local stand-in configuration, only applied when not already set in .env
+for key, value in {
+    "GROQ_API_KEY": "benchmark",
+    "MODEL_NAME": "benchmark-model",
+    "EMAIL_SMTP_PORT": "587",
+    "MONGO_URI": "mongodb://localhost:27017",
+    "MONGO_DB": "agent_benchmark",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+}.items():
+    os.environ.setdefault(key, value)
+
+
+def _install_stand_in_modules():
+    """Replace modules that load the embedding model or talk to Qdrant/Celery at import time"""
+    tasks = types.ModuleType("modules.celery.tasks")
+    tasks.embed_and_store_task = SimpleNamespace(delay=lambda document: None)
+    sys.modules["modules.celery.tasks"] = tasks
+
+    class _VectorSearchService:
+        def search_conversations(self, query, user_id, limit=20):
+            return []
+
+        async def asearch_conversations(self, query, user_id, limit=20):
+            return []
+
+    vector_search = types.ModuleType("modules.database.vector_db.vector_search")
+    vector_search.VectorSearchService = _VectorSearchService
+    sys.modules["modules.database.vector_db.vector_search"] = vector_search
+
+
+def _completion(content: str):
+    message = SimpleNamespace(role="assistant", content=content, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=SimpleNamespace(total_tokens=42))
+
+
+class _SyncCompletions:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def create(self, **kwargs):
+        time.sleep(self.latency)
+        return _completion("You have 3 contacts.")
+
+
+class _AsyncCompletions:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        return _completion("You have 3 contacts.")
+
+
+async def _run_batch(chat_with_ai, request_cls, concurrency: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        chat_with_ai(request_cls(query=f"how many contacts do I have? #{i}"))
+        for i in range(concurrency)
+    ])
+    return time.perf_counter() - start
+
+
+async def main(args):
+    _install_stand_in_modules()
+
+    from config import CONFIG
+    from modules.ai_agent import groq_client, async_groq_client, retrieval
+    from modules.ai_agent.ai_routes import chat_with_ai
+    from modules.ai_agent.schema import AgentQueryRequest
+
+    groq_client.client = SimpleNamespace(chat=SimpleNamespace(completions=_SyncCompletions(args.llm_latency)))
+    async_groq_client.client = SimpleNamespace(chat=SimpleNamespace(completions=_AsyncCompletions(args.llm_latency)))
+    retrieval.should_perform_vector_search = lambda query, messages: False
+    groq_client.get_user_id_from_token = lambda: "user_benchmark"
+    async_groq_client.get_user_id_from_token = lambda: "user_benchmark"
+
+    async def _gate(query, messages):
+        return False
+    retrieval.ashould_perform_vector_search = _gate
+
+    print(f"concurrency={args.concurrency} llm_latency={args.llm_latency}s")
+    for mode in ("sync", "async"):
+        CONFIG.agent_mode = mode
+        elapsed = await _run_batch(chat_with_ai, AgentQueryRequest, args.concurrency)
+        print(f"{mode:>5}: {elapsed:7.2f} s total, {args.concurrency / elapsed:7.2f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agent loop concurrency benchmark")
+    parser.add_argument("--concurrency", type=int, default=50, help="Simultaneous chats (default: 50)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stand-in LLM latency in seconds (default: 0.5)")
+    asyncio.run(main(parser.parse_args()))
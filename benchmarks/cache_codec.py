@@ -0,0 +1,92 @@
+"""
+Size and decode time of a cached contact list per cache codec.
+
+"raw" is the HubSpot list response as get_all_pages returns it (createdAt,
+updatedAt, archived, hs_object_id/createdate/lastmodifieddate and nulls for
+unset properties), stored as JSON text the way redis_set_json did.
+"projected" is what the contact cache stores now: project_contacts output,
+wrapped in the cache entry envelope.
+
+    uv run python -m benchmarks.cache_codec --contacts 10000 100000
+
+msgpack-zstd is skipped unless the optional msgpack and zstandard packages
+are installed.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+for key, value in {"GROQ_API_KEY": "benchmark", "EMAIL_SMTP_PORT": "587"}.items():
+    os.environ.setdefault(key, value)
+
+_FIRST = ["Jane", "John", "Aisha", "Taha", "Maria", "Wei", "Olga", "Pedro", "Fatima", "Liam"]
+_LAST = ["Doe", "Smith", "Khan", "Mehboob", "Garcia", "Chen", "Ivanova", "Silva", "Ali", "Brown"]
+_COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", None]
+
+
+def _contacts(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    contacts = []
+    for i in range(count):
+        first, last = rng.choice(_FIRST), rng.choice(_LAST)
+        stamp = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:15:42.123Z"
+        contacts.append({
+            "id": str(100000 + i),
+            "properties": {
+                "createdate": stamp,
+                "email": f"{first}.{last}{i}@example.com".lower(),
+                "firstname": first,
+                "lastname": last,
+                "phone": f"+1555{rng.randint(1000000, 9999999)}" if rng.random() < 0.6 else None,
+                "company": rng.choice(_COMPANIES),
+                "hs_object_id": str(100000 + i),
+                "lastmodifieddate": stamp
+            },
+            "createdAt": stamp,
+            "updatedAt": stamp,
+            "archived": False
+        })
+    return contacts
+
+
+def _decode_ms(codec, data: bytes, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        codec.decode(data)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main(args):
+    from modules.database.redis.cache_codec import CODECS
+    from modules.database.redis.contact_cache import project_contacts
+    from modules.crud_ops.contacts.batch_ops import DEFAULT_READ_PROPERTIES
+
+    if "msgpack-zstd" not in CODECS:
+        print("msgpack-zstd: not installed (uv add msgpack zstandard), skipped")
+    for count in args.contacts:
+        raw = _contacts(count)
+        payloads = {
+            "raw": raw,
+            "projected": {"value": project_contacts(raw, DEFAULT_READ_PROPERTIES), "fresh_until": time.time()}
+        }
+        print(f"\n{count} contacts")
+        for shape, value in payloads.items():
+            for name, codec in CODECS.items():
+                if shape == "raw" and name != "json":
+                    continue
+                start = time.perf_counter()
+                data = codec.encode(value)
+                encode_ms = (time.perf_counter() - start) * 1000
+                print(f"  {shape:>9} {name:<13} {len(data) / 1024:10.1f} KiB  "
+                      f"encode {encode_ms:8.1f} ms  decode {_decode_ms(codec, data, args.repeat):8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cache codec size/decode benchmark")
+    parser.add_argument("--contacts", type=int, nargs="+", default=[10000, 100000], help="List sizes (default: 10000 100000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Decodes per measurement, median reported (default: 5)")
+    main(parser.parse_args())
@@ -0,0 +1,161 @@
+"""
+Per-call latency of HubSpot requests: one-off `requests` calls (the old
+pattern in routes and tools) against the pooled HubSpotClient, sync and async.
+
+A fake HubSpot API is started on localhost (HTTP/1.1 keep-alive, optional
+TLS with a throwaway self-signed certificate when `--tls` is given and the
+`cryptography` package is installed), so the numbers isolate connection
+setup cost from HubSpot's own latency.
+
+    uv run python -m benchmarks.hubspot_client --calls 500
+    uv run python -m benchmarks.hubspot_client --calls 500 --tls
+"""
+import argparse
+import asyncio
+import json
+import os
+import ssl
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+for key, value in {"GROQ_API_KEY": "benchmark", "EMAIL_SMTP_PORT": "587"}.items():
+    os.environ.setdefault(key, value)
+
+_CONTACT = {"id": "1", "properties": {"email": "jane@example.com", "firstname": "Jane", "lastname": "Doe"}}
+
+
+class _FakeHubSpot(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY every
+    # keep-alive response waits for the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def _reply(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply({"results": [_CONTACT]})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply({"total": 1, "results": [_CONTACT]})
+
+    def log_message(self, *args):
+        pass
+
+
+def _self_signed_context():
+    from datetime import datetime, timedelta, timezone
+    try:
+        from cryptography import x509
+        from cryptography.x509.oid import NameOID
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+    except ImportError:
+        raise SystemExit("--tls needs the 'cryptography' package to create a self-signed certificate")
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name)
+        .public_key(key.public_key()).serial_number(x509.random_serial_number())
+        .not_valid_before(now).not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    directory = tempfile.mkdtemp()
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+def _start_server(tls: bool) -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeHubSpot)
+    scheme = "http"
+    if tls:
+        server.socket = _self_signed_context().wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+
+def _report(name: str, samples: list):
+    ordered = sorted(samples)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{name:>22}: mean {statistics.mean(samples):7.3f} ms  p50 {statistics.median(samples):7.3f} ms  p95 {p95:7.3f} ms")
+
+
+def main(args):
+    import requests
+    import httpx
+    from modules.crud_ops import hubspot_client
+    from modules.crud_ops.hubspot_client import HubSpotClient
+
+    from config import CONFIG
+
+    base_url = _start_server(args.tls)
+    hubspot_client.get_valid_access_token = lambda: "benchmark-token"
+    # Connection cost only: no Redis round trip for the shared rate limiter
+    CONFIG.hubspot_rate_limit_enabled = False
+    headers = {"Authorization": "Bearer benchmark-token", "Content-Type": "application/json"}
+    payload = {"query": "jane@example.com", "properties": ["email"]}
+    path = "/crm/v3/objects/contacts/search"
+
+    def one_off():
+        samples = []
+        for _ in range(args.calls):
+            start = time.perf_counter()
+            requests.post(base_url + path, headers=headers, json=payload, verify=False).json()
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    client = HubSpotClient(base_url)
+    if args.tls:
+        # The fake server's certificate is self-signed
+        client._client = httpx.Client(**{**client._options(), "verify": False})
+        client._async_client = httpx.AsyncClient(**{**client._options(), "verify": False})
+
+    def pooled():
+        samples = []
+        for _ in range(args.calls):
+            start = time.perf_counter()
+            client.request("POST", path, json=payload).json()
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    async def apooled():
+        samples = []
+        for _ in range(args.calls):
+            start = time.perf_counter()
+            (await client.arequest("POST", path, json=payload)).json()
+            samples.append((time.perf_counter() - start) * 1000)
+        await client.aclose()
+        return samples
+
+    if args.tls:
+        import urllib3
+        urllib3.disable_warnings()
+    print(f"fake HubSpot at {base_url}, {args.calls} sequential calls each")
+    _report("requests (no pooling)", one_off())
+    _report("HubSpotClient sync", pooled())
+    _report("HubSpotClient async", asyncio.run(apooled()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HubSpot client per-call latency benchmark")
+    parser.add_argument("--calls", type=int, default=500, help="Calls per variant (default: 500)")
+    parser.add_argument("--tls", action="store_true", help="Serve the fake API over TLS")
+    main(parser.parse_args())
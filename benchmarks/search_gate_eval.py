@@ -0,0 +1,128 @@
+"""
+Offline evaluation of the vector-search gates.
+
+Replays recorded conversations through the local gate and the LLM gate and
+reports how often they agree, where they disagree and what each costs.
+Conversations come from MongoDB `user_history` (each record's query is
+gated against the turns that preceded it) or from a JSONL file with one
+{"query": ..., "messages": [...], "label": true|false} object per line,
+where the optional label is the expected "needs vector search" decision.
+
+    uv run python -m benchmarks.search_gate_eval --users 20 --turns 30
+    uv run python -m benchmarks.search_gate_eval --jsonl cases.jsonl --skip-llm
+"""
+import argparse
+import json
+import statistics
+import time
+from collections import Counter
+
+_HISTORY_TURNS = 3
+
+
+def _cases_from_mongo(users: int, turns: int):
+    from modules.database.mongo_db.mongo_client import db
+    from modules.ai_agent.prompt_store import system_prompt_reference
+
+    collection = db["user_history"]
+    for user_id in collection.distinct("user_id")[:users]:
+        records = list(
+            collection.find(
+                {"user_id": user_id, "status": "completed"},
+                {"user_query": 1, "ai_response": 1, "_id": 0}
+            ).sort("created_at", 1).limit(turns)
+        )
+        for index, record in enumerate(records):
+            messages = [system_prompt_reference()]
+            for previous in records[max(0, index - _HISTORY_TURNS):index]:
+                messages.append({"role": "user", "content": previous.get("user_query")})
+                messages.append({"role": "assistant", "content": previous.get("ai_response")})
+            yield {"query": record.get("user_query") or "", "messages": messages, "label": None}
+
+
+def _cases_from_jsonl(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                case = json.loads(line)
+                case.setdefault("label", None)
+                yield case
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _latency(samples: list) -> str:
+    if not samples:
+        return "n/a"
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"mean {statistics.mean(samples):7.2f} ms  p50 {statistics.median(samples):7.2f} ms  p95 {p95:7.2f} ms"
+
+
+def main(args):
+    from modules.database.vector_db.vector_utility import LocalSearchGate, llm_should_perform_vector_search
+
+    cases = list(_cases_from_jsonl(args.jsonl) if args.jsonl else _cases_from_mongo(args.users, args.turns))
+    if not cases:
+        print("No recorded conversations found")
+        return
+
+    local_gate = LocalSearchGate()
+    # Warm the embedding model so the first case does not carry its load time
+    local_gate.classify("warm up", [{"role": "user", "content": "warm up"}])
+
+    local_ms, llm_ms = [], []
+    reasons = Counter()
+    confusion = Counter()
+    unsure = agree = hybrid_agree = labelled = local_correct = llm_correct = 0
+
+    for case in cases:
+        (local, reason), elapsed = _timed(local_gate.classify, case["query"], case["messages"])
+        local_ms.append(elapsed)
+        reasons[reason.split(":")[0]] += 1
+        unsure += local is None
+
+        llm = None
+        if not args.skip_llm:
+            llm, elapsed = _timed(llm_should_perform_vector_search, case["query"], case["messages"])
+            llm_ms.append(elapsed)
+            agree += (local if local is not None else True) == llm
+            hybrid_agree += local is None or local == llm
+            confusion[(local, llm)] += 1
+            if args.verbose and local is not None and local != llm:
+                print(f"disagree local={local} llm={llm} ({reason}): {case['query'][:80]!r}")
+
+        if case["label"] is not None:
+            labelled += 1
+            local_correct += (local if local is not None else True) == case["label"]
+            llm_correct += llm == case["label"]
+
+    total = len(cases)
+    print(f"cases: {total}")
+    print(f"local latency: {_latency(local_ms)}")
+    print(f"local unsure:  {unsure} ({unsure / total:.1%})")
+    print("local reasons: " + ", ".join(f"{name}={count}" for name, count in reasons.most_common()))
+    if llm_ms:
+        print(f"llm latency:   {_latency(llm_ms)}")
+        print(f"agreement local vs llm:  {agree / total:.1%}")
+        print(f"agreement hybrid vs llm: {hybrid_agree / total:.1%}  (LLM called on {unsure / total:.1%} of turns)")
+        print("confusion (local, llm) -> count:")
+        for (local, llm), count in sorted(confusion.items(), key=str):
+            print(f"  local={str(local):5} llm={str(llm):5} {count}")
+    if labelled:
+        print(f"accuracy on {labelled} labelled cases: local {local_correct / labelled:.1%}"
+              + ("" if args.skip_llm else f", llm {llm_correct / labelled:.1%}"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the local and LLM vector-search gates")
+    parser.add_argument("--jsonl", help="Recorded cases instead of MongoDB user_history")
+    parser.add_argument("--users", type=int, default=20, help="Users to sample from MongoDB (default: 20)")
+    parser.add_argument("--turns", type=int, default=30, help="Turns per user (default: 30)")
+    parser.add_argument("--skip-llm", action="store_true", help="Only run the local gate")
+    parser.add_argument("--verbose", action="store_true", help="Print every disagreement")
+    main(parser.parse_args())
@@ -0,0 +1,52 @@
+"""
+Microbenchmark: per-request tool setup cost before and after the tool registry.
+
+"before" re-lists tools/ and parses every JSON spec, then rebuilds the
+function table, as run_convo used to on every request/iteration.
+"after" is TOOL_REGISTRY.specs() plus a name lookup.
+
+    uv run python -m benchmarks.tool_registry --iterations 20000
+"""
+import argparse
+import json
+import os
+import timeit
+
+for key, value in {"GROQ_API_KEY": "benchmark", "EMAIL_SMTP_PORT": "587"}.items():
+    os.environ.setdefault(key, value)
+
+
+def main(args):
+    from modules.ai_agent.tool_registry import TOOL_REGISTRY, TOOLS_DIR
+    from modules.ai_agent.contacts import contact_tools
+    from modules.crud_ops.contacts.schema import ContactProperties, UpdateContactArgs, Search_by_query
+
+    def before():
+        tools = []
+        for file_name in os.listdir(TOOLS_DIR):
+            if file_name.endswith(".json"):
+                with open(os.path.join(TOOLS_DIR, file_name), "r", encoding="utf-8") as f:
+                    tools.append(json.load(f))
+        available_functions = {
+            "get_contacts": (contact_tools.get_contacts, None),
+            "create_contact": (contact_tools.create_contact, ContactProperties),
+            "update_contact": (contact_tools.update_contact, UpdateContactArgs),
+            "delete_contact": (contact_tools.delete_contact, None),
+            "search_by_identifier": (contact_tools.search_by_identifier, Search_by_query)
+        }
+        return tools, available_functions["search_by_identifier"]
+
+    TOOL_REGISTRY.load()
+
+    def after():
+        return TOOL_REGISTRY.specs(), TOOL_REGISTRY.get("search_by_identifier")
+
+    for name, func in (("before", before), ("after", after)):
+        seconds = timeit.timeit(func, number=args.iterations)
+        print(f"{name:>6}: {seconds / args.iterations * 1e6:9.2f} us per request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tool registry microbenchmark")
+    parser.add_argument("--iterations", type=int, default=20000, help="Timed iterations (default: 20000)")
+    main(parser.parse_args())
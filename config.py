@@ -45,6 +45,80 @@ class ConfigClass(BaseModel):
     celery_broker_url:str
     celery_result_backend:str
     embeding_model:str
+
+    # Agent runtime: "sync" keeps the blocking run_convo, "async" uses run_convo_async
+    agent_mode:str = "sync"
+    hubspot_timeout_seconds:float = 30.0
+    hubspot_connect_timeout_seconds:float = 5.0
+    # Pooled keep-alive connections to the HubSpot API per client (sync and async)
+    hubspot_max_connections:int = 20
+    # Cluster-wide HubSpot budget shared through Redis (see modules/crud_ops/rate_limiter.py)
+    hubspot_rate_limit_enabled:bool = True
+    hubspot_rate_limit_per_10s:int = 100
+    hubspot_daily_limit:int = 250000
+    # Share of both budgets background calls (contact sync) leave for interactive ones
+    hubspot_interactive_reserve:float = 0.2
+    hubspot_rate_limit_max_wait_seconds:float = 30.0
+    # 429 retries after Retry-After, per call
+    hubspot_max_retries:int = 3
+    # /webhooks/hubspot: events arriving within this window are applied as one batch
+    hubspot_webhook_batch_seconds:int = 2
+    # Public URL HubSpot posts to, when a proxy changes the URL the app sees (signature v2/v3)
+    hubspot_webhook_url:Optional[str] = None
+    # Idempotent contact writes: how long a response is replayed, and how long a running write holds its key
+    idempotency_ttl_seconds:int = 300
+    idempotency_lock_seconds:int = 60
+    # Max read-only tool calls from one LLM turn executed concurrently
+    tool_parallelism:int = 4
+    # Conversation tokens per LLM call, excluding the fixed system prompt
+    context_token_budget:int = 6000
+    context_recent_turns:int = 4
+    context_max_tool_tokens:int = 800
+    # Tool results reaching the LLM: default budget per call (tools can set their own),
+    # and whether the full result of a shortened one is kept in Mongo tool_payloads
+    tool_result_max_tokens:int = 1500
+    tool_result_max_bytes:int = 12000
+    tool_result_keep_full:bool = True
+    tool_payload_retention_days:int = 30
+    # Re-read tools/*.json when they change on disk
+    tool_hot_reload:bool = True
+    tool_reload_interval_seconds:float = 2.0
+    # Vector-search gate: "hybrid" (local, LLM when unsure), "local" or "llm"
+    search_gate:str = "hybrid"
+    search_gate_high:float = 0.6
+    search_gate_low:float = 0.3
+    # Start the Qdrant search alongside the gate and keep it only if the gate asks for it
+    speculative_retrieval:bool = True
+    # Final answers of read-only turns, per user namespace; dropped on any contact write
+    response_cache_enabled:bool = True
+    response_cache_ttl_seconds:int = 300
+    response_cache_semantic:bool = False
+    response_cache_similarity:float = 0.95
+    # Local Mongo mirror of HubSpot contacts, kept fresh by Celery beat
+    contacts_mirror_enabled:bool = True
+    contacts_sync_interval_seconds:int = 120
+    contacts_reconcile_interval_seconds:int = 21600
+    contacts_mirror_max_age_seconds:int = 600
+    contacts_sync_lock_seconds:int = 900
+    # Redis contact cache: fresh for ttl, then served stale for up to stale_seconds while one caller refreshes it
+    contacts_cache_ttl_seconds:int = 3600
+    contacts_cache_stale_seconds:int = 600
+    contacts_cache_lock_seconds:int = 300
+    contacts_cache_wait_seconds:int = 60
+    # Encoding of cached contact payloads: auto, msgpack-zstd, json-zlib or json (see cache_codec.py)
+    cache_codec:str = "auto"
+    # Email/phone -> contact index answering search_by_identifier without HubSpot
+    identifier_index_enabled:bool = True
+    identifier_index_max_age_seconds:int = 300
+    # Country code assumed for phone numbers written without "+"
+    default_phone_country_code:str = "1"
+    # search_by_name: trigram match score in [0, 1] a contact needs, and results returned
+    name_search_min_score:float = 0.3
+    name_search_limit:int = 10
+    # query_contacts and get_contacts output caps: rows per page, groups per group-by, serialized size
+    query_contacts_max_rows:int = 50
+    query_contacts_max_groups:int = 25
+    query_contacts_max_chars:int = 4000
     
 
 
@@ -78,5 +152,55 @@ CONFIG = ConfigClass(
     redis_url=getenv("REDIS_URL"),
     celery_broker_url=getenv("CELERY_BROKER_URL"),
     celery_result_backend=getenv("CELERY_RESULT_BACKEND"),
-    embeding_model=getenv("EMBEDING_MODEL")
+    embeding_model=getenv("EMBEDING_MODEL"),
+    agent_mode=getenv("AGENT_MODE", "sync"),
+    hubspot_timeout_seconds=float(getenv("HUBSPOT_TIMEOUT_SECONDS", "30")),
+    hubspot_connect_timeout_seconds=float(getenv("HUBSPOT_CONNECT_TIMEOUT_SECONDS", "5")),
+    hubspot_max_connections=int(getenv("HUBSPOT_MAX_CONNECTIONS", "20")),
+    hubspot_rate_limit_enabled=getenv("HUBSPOT_RATE_LIMIT_ENABLED", "true").lower() == "true",
+    hubspot_rate_limit_per_10s=int(getenv("HUBSPOT_RATE_LIMIT_PER_10S", "100")),
+    hubspot_daily_limit=int(getenv("HUBSPOT_DAILY_LIMIT", "250000")),
+    hubspot_interactive_reserve=float(getenv("HUBSPOT_INTERACTIVE_RESERVE", "0.2")),
+    hubspot_rate_limit_max_wait_seconds=float(getenv("HUBSPOT_RATE_LIMIT_MAX_WAIT_SECONDS", "30")),
+    hubspot_max_retries=int(getenv("HUBSPOT_MAX_RETRIES", "3")),
+    hubspot_webhook_batch_seconds=int(getenv("HUBSPOT_WEBHOOK_BATCH_SECONDS", "2")),
+    hubspot_webhook_url=getenv("HUBSPOT_WEBHOOK_URL"),
+    idempotency_ttl_seconds=int(getenv("IDEMPOTENCY_TTL_SECONDS", "300")),
+    idempotency_lock_seconds=int(getenv("IDEMPOTENCY_LOCK_SECONDS", "60")),
+    tool_parallelism=int(getenv("TOOL_PARALLELISM", "4")),
+    context_token_budget=int(getenv("CONTEXT_TOKEN_BUDGET", "6000")),
+    context_recent_turns=int(getenv("CONTEXT_RECENT_TURNS", "4")),
+    context_max_tool_tokens=int(getenv("CONTEXT_MAX_TOOL_TOKENS", "800")),
+    tool_result_max_tokens=int(getenv("TOOL_RESULT_MAX_TOKENS", "1500")),
+    tool_result_max_bytes=int(getenv("TOOL_RESULT_MAX_BYTES", "12000")),
+    tool_result_keep_full=getenv("TOOL_RESULT_KEEP_FULL", "true").lower() == "true",
+    tool_payload_retention_days=int(getenv("TOOL_PAYLOAD_RETENTION_DAYS", "30")),
+    tool_hot_reload=getenv("TOOL_HOT_RELOAD", "true").lower() == "true",
+    tool_reload_interval_seconds=float(getenv("TOOL_RELOAD_INTERVAL_SECONDS", "2")),
+    search_gate=getenv("SEARCH_GATE", "hybrid"),
+    search_gate_high=float(getenv("SEARCH_GATE_HIGH", "0.6")),
+    search_gate_low=float(getenv("SEARCH_GATE_LOW", "0.3")),
+    speculative_retrieval=getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true",
+    response_cache_enabled=getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true",
+    response_cache_ttl_seconds=int(getenv("RESPONSE_CACHE_TTL_SECONDS", "300")),
+    response_cache_semantic=getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true",
+    response_cache_similarity=float(getenv("RESPONSE_CACHE_SIMILARITY", "0.95")),
+    contacts_mirror_enabled=getenv("CONTACTS_MIRROR_ENABLED", "true").lower() == "true",
+    contacts_sync_interval_seconds=int(getenv("CONTACTS_SYNC_INTERVAL_SECONDS", "120")),
+    contacts_reconcile_interval_seconds=int(getenv("CONTACTS_RECONCILE_INTERVAL_SECONDS", "21600")),
+    contacts_mirror_max_age_seconds=int(getenv("CONTACTS_MIRROR_MAX_AGE_SECONDS", "600")),
+    contacts_sync_lock_seconds=int(getenv("CONTACTS_SYNC_LOCK_SECONDS", "900")),
+    contacts_cache_ttl_seconds=int(getenv("CONTACTS_CACHE_TTL_SECONDS", "3600")),
+    contacts_cache_stale_seconds=int(getenv("CONTACTS_CACHE_STALE_SECONDS", "600")),
+    contacts_cache_lock_seconds=int(getenv("CONTACTS_CACHE_LOCK_SECONDS", "300")),
+    contacts_cache_wait_seconds=int(getenv("CONTACTS_CACHE_WAIT_SECONDS", "60")),
+    cache_codec=getenv("CACHE_CODEC", "auto"),
+    identifier_index_enabled=getenv("IDENTIFIER_INDEX_ENABLED", "true").lower() == "true",
+    identifier_index_max_age_seconds=int(getenv("IDENTIFIER_INDEX_MAX_AGE_SECONDS", "300")),
+    default_phone_country_code=getenv("DEFAULT_PHONE_COUNTRY_CODE", "1"),
+    name_search_min_score=float(getenv("NAME_SEARCH_MIN_SCORE", "0.3")),
+    name_search_limit=int(getenv("NAME_SEARCH_LIMIT", "10")),
+    query_contacts_max_rows=int(getenv("QUERY_CONTACTS_MAX_ROWS", "50")),
+    query_contacts_max_groups=int(getenv("QUERY_CONTACTS_MAX_GROUPS", "25")),
+    query_contacts_max_chars=int(getenv("QUERY_CONTACTS_MAX_CHARS", "4000")),
 )
@@ -10,6 +10,9 @@ from modules.auth.auth_routes import API_ROUTER as AUTH_ROUTER
 from modules.logviewer.log_viewer_routes import API_ROUTER as LOG_VIEWER_ROUTER
 from modules.crud_ops.contacts.contacts_routes import API_ROUTER as CONTACTS_ROUTER
 from modules.ai_agent.ai_routes import API_ROUTER as AI_ROUTER
+from modules.webhooks.webhook_routes import API_ROUTER as WEBHOOKS_ROUTER
+from modules.ai_agent.tool_registry import TOOL_REGISTRY
+from modules.crud_ops.hubspot_client import HUBSPOT_CLIENT
 
 
 
@@ -19,6 +22,7 @@ def init_routers(app_: FastAPI) -> None:
     app_.include_router(LOG_VIEWER_ROUTER)
     app_.include_router(CONTACTS_ROUTER)
     app_.include_router(AI_ROUTER)
+    app_.include_router(WEBHOOKS_ROUTER)
 
 def make_middleware() -> list[Middleware]:
     middleware = [
@@ -32,11 +36,13 @@ def make_middleware() -> list[Middleware]:
     return middleware
 
 
-# @asynccontextmanager
-# async def lifespan(app: FastAPI):
-#     # Code to run *before* the application starts (e.g., initialize DB, start background tasks)
-#     yield
-#     # Code to run *after* the application shuts down (e.g., cleanup, close connections)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the tool registry once so the first chat request doesn't pay for it
+    TOOL_REGISTRY.load()
+    yield
+    # Close the pooled HubSpot connections
+    await HUBSPOT_CLIENT.aclose()
 
 
 def create_app() -> FastAPI:
@@ -45,7 +51,7 @@ def create_app() -> FastAPI:
         description=CONFIG.description,
         version=CONFIG.version,
         middleware=make_middleware(),
-        # lifespan=lifespan,
+        lifespan=lifespan,
         docs_url="/docs",
         redoc_url="/redoc",
         
@@ -1,5 +1,10 @@
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from modules.ai_agent.groq_client import run_convo
+from modules.ai_agent.async_groq_client import run_convo_async, stream_convo
+from modules.ai_agent.response_cache import get_response_cache_stats
+from modules.ai_agent.tool_results import TOOL_PAYLOADS
+from config import CONFIG
 from core.logger.logger import LOG
 from modules.ai_agent.schema import AgentQueryRequest
 import asyncio
@@ -10,10 +15,35 @@ API_ROUTER = APIRouter(prefix="/api/v1/ai_agent", tags=["ai"])
 async def chat_with_ai(prompt: AgentQueryRequest):
     try:
         LOG.info("User Querry Processing")
-        response =run_convo(prompt)
+        if CONFIG.agent_mode == "async":
+            response = await run_convo_async(prompt)
+        else:
+            response =run_convo(prompt)
 
         LOG.info(f"User query processed response: {response}")
         return {"response": response}
     except Exception as e:
         LOG.error(f"process Error: {str(e)}")
-        raise HTTPException(status_code=500,detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500,detail=str(e))
+
+@API_ROUTER.post("/chat/stream")
+async def chat_with_ai_stream(prompt: AgentQueryRequest):
+    LOG.info("User Querry Processing (stream)")
+    return StreamingResponse(
+        stream_convo(prompt),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@API_ROUTER.get("/cache/stats")
+async def response_cache_stats():
+    """Hit/miss/invalidation counters of the agent response cache"""
+    return {"response_cache": get_response_cache_stats()}
+
+@API_ROUTER.get("/tool_payloads/{payload_id}")
+async def tool_payload(payload_id: str):
+    """Full result of a tool call recorded with response_ref"""
+    payload = await asyncio.to_thread(TOOL_PAYLOADS.get_payload, payload_id)
+    if not payload:
+        raise HTTPException(status_code=404, detail="Tool payload not found")
+    return payload
@@ -0,0 +1,414 @@
+import asyncio
+from groq import AsyncGroq
+import json
+from modules.ai_agent.intent import get_tools, group_tool_calls
+from modules.ai_agent.tool_registry import TOOL_REGISTRY
+from modules.ai_agent.tool_results import ashape_tool_result
+from modules.ai_agent.context_manager import build_llm_messages
+from config import CONFIG
+from core.logger.logger import LOG
+from core.utils.utils import message_to_dict
+import time
+from datetime import datetime
+from modules.auth.user_id import get_user_id_from_token
+from modules.database.mongo_db.mongo_ops import AsyncMessageOperations
+from modules.database.redis.redis_client import (aget_messages_from_redis,aappend_messages_to_redis)
+from modules.celery.tasks import embed_and_store_task
+from modules.database.vector_db.vector_search import VectorSearchService
+from modules.ai_agent.retrieval import aretrieve_context
+from modules.ai_agent.response_cache import aget_cached_response, astore_cached_response, is_cacheable_turn
+client = AsyncGroq()
+MODEL = CONFIG.model_name
+_tool_semaphore = asyncio.Semaphore(CONFIG.tool_parallelism)
+
+
+def _usage_tokens(usage) -> int:
+    return usage.total_tokens if usage is not None else 0
+
+
+async def _completion(messages: list, stream: bool, **kwargs):
+    """
+    Run one LLM call.
+
+    Yields ("token", text) for every streamed content delta and finally
+    ("message", (assistant_message_dict, tokens_used)). With stream=False only
+    the final item is produced.
+    """
+    if not stream:
+        response = await client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            stream=False,
+            **kwargs
+        )
+        tokens_used = response.usage.total_tokens if hasattr(response, 'usage') else 0
+        yield "message", (message_to_dict(response.choices[0].message), tokens_used)
+        return
+
+    content_parts = []
+    tool_calls = {}
+    tokens_used = 0
+    response_stream = await client.chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        stream=True,
+        **kwargs
+    )
+    async for chunk in response_stream:
+        # Groq reports usage on the last chunk under x_groq, OpenAI-style servers under usage
+        x_groq = getattr(chunk, "x_groq", None)
+        if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+            tokens_used = _usage_tokens(x_groq.usage)
+        elif getattr(chunk, "usage", None) is not None:
+            tokens_used = _usage_tokens(chunk.usage)
+
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+
+        if delta.content:
+            content_parts.append(delta.content)
+            yield "token", delta.content
+
+        # Tool call deltas arrive keyed by index; id/name come once, arguments may be split
+        for tc in delta.tool_calls or []:
+            entry = tool_calls.setdefault(tc.index, {
+                "id": None,
+                "type": "function",
+                "function": {"name": "", "arguments": ""}
+            })
+            if tc.id:
+                entry["id"] = tc.id
+            if tc.function:
+                if tc.function.name:
+                    entry["function"]["name"] += tc.function.name
+                if tc.function.arguments:
+                    entry["function"]["arguments"] += tc.function.arguments
+
+    message = {"role": "assistant", "content": "".join(content_parts) or None}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+    yield "message", (message, tokens_used)
+
+
+async def _execute_tool_call(tool_call: dict, entry, function_args: dict):
+    """
+    Validate and run one tool call under the parallelism semaphore.
+    Returns (tool_message, tool_record).
+    """
+    async with _tool_semaphore:
+        function_name = entry.name
+        tool_start = time.time()
+        LOG.info(f"function Called: {function_name}")
+
+        function_response = entry.check(function_args)
+        if function_response is not None:
+            tool_status = "error"
+        else:
+            # Execute the function call
+            try:
+                function_response = await entry.acall(function_args)
+                LOG.info(f"Response from {function_name}: {function_response}")
+                tool_status = "success"
+
+            except Exception as e:
+                LOG.error(f"Error running {function_name}: {e}")
+                function_response = {"error": str(e)}
+                tool_status = "error"
+
+        # Budgeted copy for the LLM and the history; the full result is kept by reference when cut
+        function_response, response_ref = await ashape_tool_result(entry, function_response)
+        tool_message = {
+            "tool_call_id": tool_call["id"],
+            "role": "tool",
+            "name": function_name,
+            "content": json.dumps(function_response)
+        }
+        tool_execution_time = int((time.time() - tool_start) * 1000)
+        tool_record = {
+            "tool_call_id": tool_call["id"],
+            "function_name": function_name,
+            "arguments": function_args,
+            "response": function_response,
+            "response_ref": response_ref,
+            "execution_time_ms": tool_execution_time,
+            "status": tool_status,
+            "timestamp": datetime.now().isoformat()
+        }
+        return tool_message, tool_record
+
+
+async def _replay_cached_response(user_prompt, user_id: str, cached: dict, message_ops, start_time: float, phase_timings: dict):
+    """Answer from the response cache: record the turn in history and Mongo without calling the LLM"""
+    await aget_messages_from_redis(user_id)  # seeds the prompt reference for a fresh history
+    await aappend_messages_to_redis(user_id,[
+        {"role": "user", "content": str(user_prompt)},
+        {"role": "assistant", "content": cached["response"]}
+    ])
+    response_time = time.time() - start_time
+    phase_timings["response_cache"] = cached["match"]
+    message_id = await message_ops.save_message({
+        "user_id": user_id,
+        "user_query": user_prompt.query,
+        "ai_response": cached["response"],
+        "response_time_seconds": round(response_time, 2),
+        "model": MODEL,
+        "status": "completed",
+        "phase_timings": phase_timings
+    })
+    return {
+        "message_id": message_id,
+        "response": cached["response"],
+        "tokens_used": 0,
+        "tool_calls": 0,
+        "react_cycles": 0,
+        "response_time": round(response_time, 2)
+    }
+
+
+async def _agent_events(user_prompt, stream: bool):
+    """
+    Core ReAct loop shared by run_convo_async and stream_convo.
+
+    Yields (event_name, data) tuples: "token" while the LLM streams,
+    "tool_call_start"/"tool_call_end" around each tool and a final "done"
+    carrying the same summary run_convo returns.
+    """
+    message_ops = AsyncMessageOperations()
+    vector_search_service = VectorSearchService()
+    start_time = time.time()
+    user_id = get_user_id_from_token()
+    LOG.info(f"User id : {user_id}")
+
+    phase_timings = {}
+    phase_start = time.perf_counter()
+    cached, cache_generation = await aget_cached_response(user_prompt.query)
+    phase_timings["response_cache_ms"] = round((time.perf_counter() - phase_start) * 1000, 2)
+    if cached:
+        result = await _replay_cached_response(user_prompt, user_id, cached, message_ops, start_time, phase_timings)
+        if stream:
+            yield "token", {"content": result["response"]}
+        yield "done", result
+        return
+
+    phase_start = time.perf_counter()
+    messages = await aget_messages_from_redis(user_id)
+    phase_timings["history_ms"] = round((time.perf_counter() - phase_start) * 1000, 2)
+    # Search gate plus (speculative) vector search; snippets are sent to the LLM but never persisted
+    context_messages = await aretrieve_context(user_prompt.query, user_id, messages, vector_search_service, phase_timings)
+
+    user_message = {
+        "role": "user",
+        "content": str(user_prompt)
+    }
+    messages.append(user_message)
+
+    await aappend_messages_to_redis(user_id,[user_message])
+
+    tools = get_tools()
+    total_tokens = 0
+    total_tool_calls = 0
+    react_cycles = []
+    final_response = ""
+    status = "completed"
+    error_msg = None
+    phase_timings["llm_ms"] = 0.0
+    phase_timings["tools_ms"] = 0.0
+
+    try:
+        max_iterations = 5  # Prevent infinite loops
+        iteration = 0
+
+        while iteration < max_iterations:
+            iteration += 1
+
+            # LLM call - agent can decide to call tools
+            llm_start = time.perf_counter()
+            async for kind, payload in _completion(
+                build_llm_messages(messages, context_messages),
+                stream,
+                temperature=0.3,
+                tools=tools,
+                tool_choice="auto",
+                max_completion_tokens=4096
+            ):
+                if kind == "token":
+                    yield "token", {"content": payload}
+                else:
+                    response_message, tokens_used = payload
+            phase_timings["llm_ms"] += (time.perf_counter() - llm_start) * 1000
+            LOG.info(f"response of LLM call {iteration}: {response_message}")
+
+            total_tokens += tokens_used
+
+            tool_calls = response_message.get("tool_calls")
+            LOG.info(f"tool calls in iteration {iteration}: {tool_calls}")
+
+            messages.append(response_message)
+            await aappend_messages_to_redis(user_id,[response_message])
+
+            cycle_data = {
+                "cycle_number":iteration,
+                "timestamp":datetime.now().isoformat(),
+                "llm_response":response_message["content"],
+                "tool_calls":[],
+                "token_used":tokens_used
+            }
+
+            # If no tool calls, we're done
+            if not tool_calls:
+                final_response = response_message["content"]
+                react_cycles.append(cycle_data)
+                break
+
+            total_tool_calls +=len(tool_calls)
+
+            tools_start = time.perf_counter()
+            for batch in group_tool_calls(tool_calls, lambda tc: tc["function"]["name"]):
+                prepared = []
+                for tool_call in batch:
+                    function_name = tool_call["function"]["name"]
+                    entry = TOOL_REGISTRY.get(function_name)
+                    if entry is None or entry.async_handler is None:
+                        LOG.error(f"Unknown function called: {function_name}")
+                        continue
+                    function_args = entry.parse_arguments(tool_call["function"]["arguments"])
+                    prepared.append((tool_call, entry, function_args))
+                    yield "tool_call_start", {
+                        "tool_call_id": tool_call["id"],
+                        "function_name": function_name,
+                        "arguments": function_args
+                    }
+
+                # Read-only calls from the same turn run concurrently, bounded by the semaphore
+                results = await asyncio.gather(*[
+                    _execute_tool_call(tool_call, entry, function_args)
+                    for tool_call, entry, function_args in prepared
+                ])
+
+                # Append in the order the model issued the calls and persist once per batch
+                batch_messages = []
+                for tool_message, tool_record in results:
+                    batch_messages.append(tool_message)
+                    cycle_data["tool_calls"].append(tool_record)
+                    yield "tool_call_end", {
+                        "tool_call_id": tool_record["tool_call_id"],
+                        "function_name": tool_record["function_name"],
+                        "status": tool_record["status"],
+                        "execution_time_ms": tool_record["execution_time_ms"]
+                    }
+                messages.extend(batch_messages)
+                await aappend_messages_to_redis(user_id,batch_messages)
+            phase_timings["tools_ms"] += (time.perf_counter() - tools_start) * 1000
+
+            react_cycles.append(cycle_data)
+
+            if iteration >= max_iterations and not final_response:
+                llm_start = time.perf_counter()
+                async for kind, payload in _completion(
+                    build_llm_messages(messages, context_messages),
+                    stream,
+                    tool_choice="none",
+                    max_completion_tokens=4096
+                ):
+                    if kind == "token":
+                        yield "token", {"content": payload}
+                    else:
+                        final_message, final_tokens = payload
+                phase_timings["llm_ms"] += (time.perf_counter() - llm_start) * 1000
+
+                final_response = final_message["content"]
+                total_tokens += final_tokens
+                final_message = {"role":"assistant","content":final_response}
+                messages.append(final_message)
+                await aappend_messages_to_redis(user_id,[final_message])
+
+                react_cycles.append({
+                    "cycle_number": iteration + 1,
+                    "timestamp": datetime.now().isoformat(),
+                    "llm_response": final_response,
+                    "tool_calls": [],
+                    "tokens_used": final_tokens
+                })
+
+    except Exception as e:
+        LOG.error(f"Error in run_convo_async: {e}")
+        final_response = f"Error processing request: {str(e)}"
+        status = "error"
+        error_msg = str(e)
+
+    tool_names = [record["function_name"] for cycle in react_cycles for record in cycle["tool_calls"]]
+    if is_cacheable_turn(status, final_response, tool_names, TOOL_REGISTRY.is_read_only):
+        await astore_cached_response(user_prompt.query, final_response, cache_generation)
+
+    response_time = time.time() - start_time
+    phase_timings["llm_ms"] = round(phase_timings["llm_ms"], 2)
+    phase_timings["tools_ms"] = round(phase_timings["tools_ms"], 2)
+
+    message_data = {
+        "user_id": user_id,
+        "user_query": user_prompt.query,
+        "ai_response": final_response,
+        "react_cycles": react_cycles,
+        "total_tokens": total_tokens,
+        "total_tool_calls": total_tool_calls,
+        "total_react_cycles": len(react_cycles),
+        "response_time_seconds": round(response_time, 2),
+        "model": MODEL,
+        "status": status,
+        "error": error_msg,
+        "phase_timings": phase_timings
+    }
+    LOG.info(f"Phase timings: {phase_timings}")
+
+    message_id = await message_ops.save_message(message_data)
+    try:
+        document_for_qdrant = {
+            "_id":message_id,
+            "user_id":user_id,
+            "user_query":user_prompt.query,
+            "ai_response":final_response,
+            "status": status,
+            "created_at": datetime.now().isoformat()
+        }
+        # Publishing to the broker is a blocking socket write
+        await asyncio.to_thread(embed_and_store_task.delay, document_for_qdrant)
+        LOG.info(f"Queued vector emebeding task for messages {message_id} and {user_id}")
+    except Exception as e:
+        LOG.error(f"Failed to queue vector emebeding: {e}")
+
+    yield "done", {
+        "message_id": message_id,
+        "response": final_response,
+        "tokens_used": total_tokens,
+        "tool_calls": total_tool_calls,
+        "react_cycles": len(react_cycles),
+        "response_time": round(response_time, 2)
+    }
+
+
+async def run_convo_async(user_prompt):
+    """
+    asyncio-native version of run_convo.
+
+    Groq, HubSpot, Redis and Mongo calls are awaited; the embedding model,
+    token file access and Celery publish run in worker threads so a slow
+    LLM turn never blocks other requests on the same worker.
+    """
+    result = None
+    async for event, data in _agent_events(user_prompt, stream=False):
+        if event == "done":
+            result = data
+    return result
+
+
+async def stream_convo(user_prompt):
+    """
+    Server-sent-events variant of run_convo_async.
+
+    Streams LLM tokens, tool_call_start/tool_call_end events and a final
+    "done" event with the usage summary; the Mongo record is identical to
+    the non-streaming path.
+    """
+    async for event, data in _agent_events(user_prompt, stream=True):
+        yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
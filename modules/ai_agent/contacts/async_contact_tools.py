@@ -0,0 +1,209 @@
+import asyncio
+from modules.crud_ops.contacts.schema import (
+    ContactProperties,UpdateContactArgs,Search_by_query,SearchByNameArgs,QueryContactsArgs,GetContactsArgs,
+    BatchCreateContactsArgs,BatchUpdateContactsArgs,BatchReadContactsArgs,BatchArchiveContactsArgs
+)
+from modules.crud_ops.contacts.batch_ops import (
+    arun_batch, create_inputs, update_inputs, id_inputs, succeeded_ids, DEFAULT_READ_PROPERTIES
+)
+from modules.crud_ops.contacts.contact_sync import (
+    aread_mirrored_contacts, aensure_contact_indexes, awrite_through_upsert, awrite_through_remove, request_sync,
+    build_contact_indexes, arefresh_contact_indexes, index_contacts, aunindex_contacts, aindex_version
+)
+from modules.crud_ops.contacts.identifier_index import IDENTIFIER_INDEX
+from modules.crud_ops.contacts.name_index import NAME_INDEX
+from modules.crud_ops.contacts.contact_query import run_query, page_contacts
+from modules.crud_ops.hubspot_client import HUBSPOT_CLIENT, HubSpotError
+from typing import Dict,Any
+from config import CONFIG
+from core.logger.logger import LOG
+import json
+from modules.database.redis.redis_client import get_user_namespace
+from modules.database.redis.contact_cache import (
+    acontact_generation, acontact_cache_get, acontact_cache_set, acached_load, ainvalidate_contact_cache, project_contacts
+)
+from modules.ai_agent.tool_registry import async_tool
+from modules.ai_agent.response_cache import ainvalidate_response_cache
+from modules.ai_agent.contacts.contact_common import (
+    CONTACTS_PATH, LIST_PARAMS, search_key, create_request, update_request, delete_request, search_request,
+    created_result, updated_result, deleted_result, searched_result, indexed_result, cached_result,
+    name_matches_result, table_result
+)
+
+# Async counterparts of contact_tools used by run_convo_async; requests and
+# results are built by contact_common, as for the sync tools.
+# HubSpot calls share the pooled AsyncClient of HUBSPOT_CLIENT; the token
+# file and the namespace lookup read token.json, so they run in a worker thread.
+
+
+async def _after_write(user_ns: str, contact: dict = None):
+    await ainvalidate_contact_cache(user_ns)
+    await ainvalidate_response_cache(user_ns)
+    if contact:
+        await acontact_cache_set(user_ns, await acontact_generation(user_ns), "contact", contact, str(contact["id"]))
+
+
+async def _aload_all(user_ns: str) -> list:
+    version = await aindex_version(user_ns)
+    results = await HUBSPOT_CLIENT.aget_all_pages(CONTACTS_PATH, params=LIST_PARAMS)
+    contacts = project_contacts(results, DEFAULT_READ_PROPERTIES)
+    await asyncio.to_thread(build_contact_indexes, user_ns, contacts, version)
+    return contacts
+
+
+async def _load_contacts():
+    """The whole contact list ({"results"[, "mirror"]}) or an error dict; tools page or query it"""
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    mirrored = await aread_mirrored_contacts(user_ns)
+    if mirrored:
+        LOG.info("Fetched contacts from local mirror")
+        return mirrored
+
+    version = await aindex_version(user_ns)
+    try:
+        all_results = await acached_load(user_ns, "all", lambda: _aload_all(user_ns))
+    except HubSpotError as e:
+        return e.as_dict()
+
+    await arefresh_contact_indexes(user_ns, all_results, version)
+
+    return {"results": all_results}
+
+
+@async_tool("get_contacts")
+async def get_contacts(args: GetContactsArgs):
+    LOG.info(f"Listing contacts: {args.dict(exclude_defaults=True)}")
+    return table_result(await _load_contacts(), page_contacts, args)
+
+@async_tool("create_contact")
+async def create_contact(contact:ContactProperties) ->Dict[str,Any]:
+    LOG.info("Into create func")
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    try:
+        result = created_result(await HUBSPOT_CLIENT.arequest(**create_request(contact)))
+    except HubSpotError as e:
+        return e.as_dict()
+    if "error" not in result:
+        await awrite_through_upsert(user_ns, [result["data"]])
+        await _after_write(user_ns, result["data"])
+    return result
+
+@async_tool("update_contact")
+async def update_contact(args: UpdateContactArgs):
+    LOG.info("Into update contact func")
+
+    LOG.info(f"UpdateContactArgs: {json.dumps(args.dict(), indent=2)}")
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    try:
+        result = updated_result(await HUBSPOT_CLIENT.arequest(**update_request(args)))
+    except HubSpotError as e:
+        return e.as_dict()
+    if "error" not in result:
+        await awrite_through_upsert(user_ns, [result["data"]])
+        await _after_write(user_ns, result["data"])
+    return result
+
+
+@async_tool("delete_contact")
+async def delete_contact(contact_id:str):
+    LOG.info("Into delete contact func")
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    try:
+        result = deleted_result(await HUBSPOT_CLIENT.arequest(**delete_request(contact_id)))
+    except HubSpotError as e:
+        return e.as_dict()
+    if "error" not in result:
+        await awrite_through_remove(user_ns, [contact_id])
+        await _after_write(user_ns)
+        LOG.info("contact deleted and cache cleared")
+    return result
+
+
+
+@async_tool("search_by_identifier")
+async def search_by_identifier(query:Search_by_query):
+    LOG.info(f"Searching for contant email {query}")
+
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    await aensure_contact_indexes(user_ns)
+    indexed = IDENTIFIER_INDEX.lookup(user_ns, query.query)
+    if indexed:
+        return indexed_result(indexed)
+
+    generation = await acontact_generation(user_ns)
+    cached = await acontact_cache_get(user_ns, generation, "search", search_key(query.query))
+    if cached:
+        return cached_result(cached)
+
+    try:
+        result = searched_result(await HUBSPOT_CLIENT.arequest(**search_request(query.query)), query.query)
+    except HubSpotError as e:
+        return e.as_dict()
+    if "error" not in result:
+        await acontact_cache_set(user_ns, generation, "search", result["data"], search_key(query.query))
+        index_contacts(user_ns, result["data"].get("results", []))
+    return result
+
+
+@async_tool("search_by_name")
+async def search_by_name(args: SearchByNameArgs):
+    LOG.info(f"Searching contacts by name: {args.query}")
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    await aensure_contact_indexes(user_ns)
+    if not NAME_INDEX.is_fresh(user_ns):
+        contacts = await _load_contacts()
+        if "error" in contacts:
+            return contacts
+
+    matches = NAME_INDEX.search(user_ns, args.query, limit=args.limit or CONFIG.name_search_limit)
+    return name_matches_result(args.query, matches)
+
+
+@async_tool("query_contacts")
+async def query_contacts(args: QueryContactsArgs):
+    LOG.info(f"Querying contacts: {args.dict(exclude_defaults=True)}")
+    return table_result(await _load_contacts(), run_query, args)
+
+
+async def _after_batch_write(user_ns: str, summary: dict):
+    if not summary["succeeded"]:
+        return
+    await _after_write(user_ns)
+    if summary["operation"] == "archive":
+        await awrite_through_remove(user_ns, succeeded_ids(summary))
+    else:
+        await aunindex_contacts(user_ns, succeeded_ids(summary))
+        await asyncio.to_thread(request_sync, user_ns)
+
+
+@async_tool("batch_create_contacts")
+async def batch_create_contacts(args: BatchCreateContactsArgs):
+    LOG.info(f"Batch creating {len(args.contacts)} contacts")
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    summary = await arun_batch("create", create_inputs(args.contacts))
+    await _after_batch_write(user_ns, summary)
+    return summary
+
+
+@async_tool("batch_update_contacts")
+async def batch_update_contacts(args: BatchUpdateContactsArgs):
+    LOG.info(f"Batch updating {len(args.contacts)} contacts")
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    summary = await arun_batch("update", update_inputs(args.contacts))
+    await _after_batch_write(user_ns, summary)
+    return summary
+
+
+@async_tool("batch_read_contacts")
+async def batch_read_contacts(args: BatchReadContactsArgs):
+    LOG.info(f"Batch reading {len(args.ids)} contacts")
+    return await arun_batch("read", id_inputs(args.ids), properties=args.properties, id_property=args.id_property)
+
+
+@async_tool("batch_archive_contacts")
+async def batch_archive_contacts(args: BatchArchiveContactsArgs):
+    LOG.info(f"Batch archiving {len(args.contact_ids)} contacts")
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    summary = await arun_batch("archive", id_inputs(args.contact_ids))
+    await _after_batch_write(user_ns, summary)
+    return summary
@@ -0,0 +1,137 @@
+from typing import Any, Callable, Dict, List
+from core.logger.logger import LOG
+from modules.crud_ops.contacts.schema import ContactProperties, UpdateContactArgs
+from modules.crud_ops.contacts.batch_ops import DEFAULT_READ_PROPERTIES
+
+# Transport-independent half of the contact tools.
+#
+# contact_tools (run_convo) and async_contact_tools (run_convo_async) send the
+# same HubSpot requests and turn the same responses into tool results. The
+# request builders return the keyword arguments of HUBSPOT_CLIENT.request /
+# arequest, and the result builders return the tool result or an
+# {"error", "details"} dict; each tool module keeps only its HubSpot calls and
+# its cache, index and mirror updates.
+CONTACTS_PATH = "/crm/v3/objects/contacts"
+SEARCH_PROPERTIES = ["email", "firstname", "lastname", "phone", "company", "website", "jobtitle"]
+# Full contact list read (get_contacts, query_contacts, search_by_name without a mirror)
+LIST_PARAMS = {"properties": ",".join(DEFAULT_READ_PROPERTIES), "archived": "false", "limit": 100}
+
+
+def validate_identifier_query(function_args: dict):
+    """Guard for search_by_identifier: only a valid email or phone number may reach HubSpot"""
+    query_value = function_args.get("query", "")
+
+    # Check if it's a valid email or phone number
+    is_email = "@" in query_value and "." in query_value
+    is_phone = sum(c.isdigit() for c in query_value) >= 7
+
+    if not (is_email or is_phone):
+        LOG.warning(f"Invalid search query rejected: '{query_value}'")
+
+        # Names go to search_by_name instead of costing a clarification turn
+        return {
+            "error": "Invalid identifier provided",
+            "message": f"The query '{query_value}' is not a valid email or phone number. To find a contact by name or company, call search_by_name with this query instead."
+        }
+    return None
+
+
+# Identity part of the idempotency key of write tools; the payload hash is added to it
+def by_email(args: dict) -> str:
+    return args.get("email", "")
+
+
+def by_contact_id(args: dict) -> str:
+    return str(args.get("contact_id", ""))
+
+
+def by_payload(args: dict) -> str:
+    return ""
+
+
+def search_key(query: str) -> str:
+    """Name of a search_by_identifier result in the contact cache"""
+    return query.strip().lower()
+
+
+# ---------- Requests ----------
+def create_request(contact: ContactProperties) -> dict:
+    return {"method": "POST", "path": CONTACTS_PATH, "json": {"properties": contact.dict(exclude_unset=True)}}
+
+
+def update_request(args: UpdateContactArgs) -> dict:
+    # Remove unset fields so we only update what's given
+    properties = args.dict(exclude_unset=True)
+    properties.pop("contact_id", None)  # Remove id from update payload
+    return {"method": "PATCH", "path": f"{CONTACTS_PATH}/{args.contact_id}", "json": {"properties": properties}}
+
+
+def delete_request(contact_id: str) -> dict:
+    return {"method": "DELETE", "path": f"{CONTACTS_PATH}/{contact_id}"}
+
+
+def search_request(query: str) -> dict:
+    return {"method": "POST", "path": f"{CONTACTS_PATH}/search", "json": {"query": query, "properties": SEARCH_PROPERTIES}}
+
+
+# ---------- Responses ----------
+def _error(res) -> Dict[str, Any]:
+    LOG.info({"error": res.status_code, "details": res.text})
+    return {"error": res.status_code, "details": res.text}
+
+
+def created_result(res) -> Dict[str, Any]:
+    if res.status_code != 201:
+        return _error(res)
+    LOG.info(f"status code of creating contact {res.status_code}")
+    return {"message": "contact_created", "data": res.json()}
+
+
+def updated_result(res) -> Dict[str, Any]:
+    if res.status_code != 200:
+        return _error(res)
+    updated_data = res.json()
+    LOG.info({"message": "Contact updated", "data": updated_data})
+    return {"message": "Contact updated", "data": updated_data}
+
+
+def deleted_result(res) -> Dict[str, Any]:
+    if res.status_code != 204:
+        return _error(res)
+    return {"message": "contact deleted"}
+
+
+def searched_result(res, query: str) -> Dict[str, Any]:
+    if res.status_code != 200:
+        return _error(res)
+    LOG.info(f"Contact Fetched Successfully: {query}")
+    return {"message": "contact fetched", "data": res.json()}
+
+
+def indexed_result(contacts: List[dict]) -> Dict[str, Any]:
+    LOG.info("Search result served from identifier index")
+    return {"message": "contact fetched (indexed)", "data": {"total": len(contacts), "results": contacts}}
+
+
+def cached_result(data: dict) -> Dict[str, Any]:
+    LOG.info("Search result fetched from redis cache")
+    return {"message": "contact fetched (cached)", "data": data}
+
+
+def name_matches_result(query: str, matches: List[dict]) -> Dict[str, Any]:
+    return {
+        "message": "contacts matched" if matches else "no contacts matched",
+        "query": query,
+        "total": len(matches),
+        "results": matches
+    }
+
+
+def table_result(contacts: dict, tabulate: Callable[[List[dict], Any], dict], args) -> Dict[str, Any]:
+    """page_contacts/run_query over a loaded contact list, keeping the mirror's staleness; errors pass through"""
+    if "results" not in contacts:
+        return contacts
+    result = tabulate(contacts["results"], args)
+    if "mirror" in contacts:
+        result["mirror"] = contacts["mirror"]
+    return result
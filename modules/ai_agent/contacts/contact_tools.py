@@ -1,180 +1,212 @@
-import requests
-from modules.crud_ops.contacts.schema import ContactProperties,UpdateContactArgs,Search_by_query
-from modules.auth.token_manager import get_valid_access_token,refresh_access_token
+from modules.crud_ops.contacts.schema import (
+    ContactProperties,UpdateContactArgs,Search_by_query,SearchByNameArgs,QueryContactsArgs,GetContactsArgs,
+    BatchCreateContactsArgs,BatchUpdateContactsArgs,BatchReadContactsArgs,BatchArchiveContactsArgs
+)
+from modules.crud_ops.contacts.batch_ops import (
+    run_batch, create_inputs, update_inputs, id_inputs, succeeded_ids, DEFAULT_READ_PROPERTIES
+)
+from modules.crud_ops.contacts.contact_sync import (
+    read_mirrored_contacts, ensure_contact_indexes, write_through_upsert, write_through_remove, request_sync,
+    build_contact_indexes, refresh_contact_indexes, index_contacts, unindex_contacts, index_version
+)
+from modules.crud_ops.contacts.identifier_index import IDENTIFIER_INDEX
+from modules.crud_ops.contacts.name_index import NAME_INDEX
+from modules.crud_ops.contacts.contact_query import run_query, page_contacts
+from modules.crud_ops.hubspot_client import HUBSPOT_CLIENT, HubSpotError
 from typing import Dict,Any
+from config import CONFIG
 from core.logger.logger import LOG
 import json
-from modules.database.redis.redis_client import (
-    redis_client, redis_get_json, redis_set_json, redis_delete_pattern, get_user_namespace
+from modules.database.redis.redis_client import get_user_namespace
+from modules.database.redis.contact_cache import (
+    contact_generation, contact_cache_get, contact_cache_set, cached_load, invalidate_contact_cache, project_contacts
+)
+from modules.ai_agent.tool_registry import tool
+from modules.ai_agent.response_cache import invalidate_response_cache
+from modules.ai_agent.contacts.contact_common import (
+    CONTACTS_PATH, LIST_PARAMS, validate_identifier_query, by_email, by_contact_id, by_payload, search_key,
+    create_request, update_request, delete_request, search_request, created_result, updated_result, deleted_result,
+    searched_result, indexed_result, cached_result, name_matches_result, table_result
 )
 
-def get_contacts():
-    access_token = get_valid_access_token()
-    if not access_token:
-        return {"error": "No valid token available. Please authorize first at /"}
-    
+
+def _after_write(user_ns: str, contact: dict = None):
+    """Retire cached reads (one INCR each for contact keys and answers), then cache the written contact"""
+    invalidate_contact_cache(user_ns)
+    invalidate_response_cache(user_ns)
+    if contact:
+        contact_cache_set(user_ns, contact_generation(user_ns), "contact", contact, str(contact["id"]))
+
+
+def _load_contacts():
+    """The whole contact list ({"results"[, "mirror"]}) or an error dict; tools page or query it"""
     user_ns = get_user_namespace()
-    cache_key = f"contact:{user_ns}:all"
-
-    cached_data = redis_get_json(cache_key)
-    if cached_data:
-        LOG.info("Fetched contacts from redis cache")
-        return {"results":cached_data}
-    
-    url = "https://api.hubapi.com/crm/v3/objects/contacts"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    params = {
-        "properties": "email,firstname,lastname,phone,company",
-        "archived": "false",
-        "limit": 100
-    }
-
-    all_results = []
-
-    res = requests.get(url, headers=headers, params=params)
-
-    # Handle expired token
-    if res.status_code == 401:
-        LOG.info("Got 401, attempting token refresh...")
-        access_token_data = refresh_access_token()
-        if access_token_data:
-            headers["Authorization"] = f"Bearer {access_token_data['access_token']}"
-            res = requests.get(url, headers=headers, params=params)
-        else:
-            return {"error": "Failed to refresh token"}
-
-    if res.status_code != 200:
-        return {"error": res.status_code, "details": res.text}
-
-    data = res.json()
-
-    # Pagination loop
-    while True:
-        all_results.extend(data.get("results", []))
-        try:
-            url = data["paging"]["next"]["link"]  # Full URL from HubSpot
-        except KeyError:
-            break  # No more pages
-
-        res = requests.get(url, headers=headers)
-        if res.status_code != 200:
-            return {"error": res.status_code, "details": res.text}
-
-        data = res.json()
-    
-    redis_set_json(cache_key, all_results)
+    mirrored = read_mirrored_contacts(user_ns)
+    if mirrored:
+        LOG.info("Fetched contacts from local mirror")
+        return mirrored
+
+    def load_all():
+        version = index_version(user_ns)
+        contacts = project_contacts(HUBSPOT_CLIENT.get_all_pages(CONTACTS_PATH, params=LIST_PARAMS), DEFAULT_READ_PROPERTIES)
+        build_contact_indexes(user_ns, contacts, version)
+        return contacts
+
+    # One HubSpot pagination per namespace at a time, across workers; expired lists are served while they refresh.
+    # A list loaded here rebuilds the indexes; a cached one only once they are stale
+    version = index_version(user_ns)
+    try:
+        all_results = cached_load(user_ns, "all", load_all)
+    except HubSpotError as e:
+        return e.as_dict()
+
+    refresh_contact_indexes(user_ns, all_results, version)
 
     return {"results": all_results}
 
+
+@tool("get_contacts", args_model=GetContactsArgs, read_only=True)
+def get_contacts(args: GetContactsArgs):
+    """A page of the contact list as a table; the model pages with next_after instead of receiving every contact"""
+    LOG.info(f"Listing contacts: {args.dict(exclude_defaults=True)}")
+    return table_result(_load_contacts(), page_contacts, args)
+
+@tool("create_contact", args_model=ContactProperties, idempotency_key=by_email)
 def create_contact(contact:ContactProperties) ->Dict[str,Any]:
     LOG.info("Into create func")
-    access_token = get_valid_access_token()
-    if not access_token:
-        return {"error":"No valid access token"}
-    
     user_ns = get_user_namespace()
-    url  = "https://api.hubapi.com/crm/v3/objects/contacts"
-    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-    data = {"properties":contact.dict(exclude_unset=True)}
-    res = requests.post(url,json=data,headers=headers)
-    if res.status_code == 201:
-        LOG.info(f"status code of creating contact {res.status_code}")
-        response_data = res.json()
-        contact_id = response_data["id"]
-        redis_set_json(f"contacts:{user_ns}:{contact_id}",response_data)
-        redis_delete_pattern(f"contacts:{user_ns}:all")
-
-        return {"message":"contact_created","data":response_data}
-    LOG.info({"error":res.status_code,"details":res.text})
-    return {"error":res.status_code,"details":res.text}
-
+    try:
+        result = created_result(HUBSPOT_CLIENT.request(**create_request(contact)))
+    except HubSpotError as e:
+        return e.as_dict()
+    if "error" not in result:
+        write_through_upsert(user_ns, [result["data"]])
+        _after_write(user_ns, result["data"])
+    return result
+
+@tool("update_contact", args_model=UpdateContactArgs, idempotency_key=by_contact_id)
 def update_contact(args: UpdateContactArgs):
     LOG.info("Into update contact func")
 
     LOG.info(f"UpdateContactArgs: {json.dumps(args.dict(), indent=2)}")
-    access_token = get_valid_access_token()
-    if not access_token:
-        return {"error": "No Valid token. Please authenticate at root"}
-
     user_ns = get_user_namespace()
-    
-    url = f"https://api.hubapi.com/crm/v3/objects/contacts/{args.contact_id}"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-
-    # Remove unset fields so we only update what's given
-    properties = args.dict(exclude_unset=True)
-    properties.pop("contact_id", None)  # Remove id from update payload
-
-    data = {"properties": properties}
-
-    res = requests.patch(url, headers=headers, json=data)
-
-    if res.status_code == 200:
-        LOG.info({"message": "Contact updated", "data": res.json()})
-        updated_data = res.json()
-        redis_set_json(f"contacts:{user_ns}:{args.contact_id}",updated_data)
-        redis_delete_pattern(f"contacts:{user_ns}:search:{args.email.lower()}")
-        redis_delete_pattern(f"contacts:{user_ns}:all")
-        return {"message": "Contact updated", "data": updated_data}
-
-    LOG.info({"error": res.status_code, "details": res.text})
-    return {"error": res.status_code, "details": res.text}
+    try:
+        result = updated_result(HUBSPOT_CLIENT.request(**update_request(args)))
+    except HubSpotError as e:
+        return e.as_dict()
+    if "error" not in result:
+        write_through_upsert(user_ns, [result["data"]])
+        _after_write(user_ns, result["data"])
+    return result
 
 
+@tool("delete_contact", idempotency_key=by_contact_id)
 def delete_contact(contact_id:str):
     LOG.info("Into delete contact func")
-    access_token = get_valid_access_token()
-    if not access_token:
-        return {"error":"No Valid token. Please authenticate at root"}
     user_ns = get_user_namespace()
-    url  = f"https://api.hubapi.com/crm/v3/objects/contacts/{contact_id}"
-    headers = {"Authorization":f"Bearer {access_token}","Content-Type":"application/json"}
-    res = requests.delete(url,headers=headers) 
-    if res.status_code == 204:
-        redis_client.delete(f"contacts:{user_ns}:{contact_id}")
-        redis_delete_pattern(f"contacts:{user_ns}:all")
+    try:
+        result = deleted_result(HUBSPOT_CLIENT.request(**delete_request(contact_id)))
+    except HubSpotError as e:
+        return e.as_dict()
+    if "error" not in result:
+        write_through_remove(user_ns, [contact_id])
+        _after_write(user_ns)
         LOG.info("contact deleted and cache cleared")
-        return {"message":"contact deleted"}
-    return {"error": res.status_code, "details": res.text}
+    return result
 
 
 
+# An email or phone number matches a handful of contacts; more than fits 800 tokens is noise
+@tool(
+    "search_by_identifier", args_model=Search_by_query, read_only=True, guard=validate_identifier_query,
+    max_result_tokens=800
+)
 def search_by_identifier(query:Search_by_query):
     LOG.info(f"Searching for contant email {query}")
 
-    access_token = get_valid_access_token()
-    if not access_token:
-        return {"error":"No valid token available. Please authorize first"}
-    
     user_ns = get_user_namespace()
-    cached_key = f"contacts:{user_ns}:search:{query.query.lower()}"
-    cached = redis_get_json(cached_key)
+    ensure_contact_indexes(user_ns)
+    indexed = IDENTIFIER_INDEX.lookup(user_ns, query.query)
+    if indexed:
+        return indexed_result(indexed)
+
+    generation = contact_generation(user_ns)
+    cached = contact_cache_get(user_ns, generation, "search", search_key(query.query))
     if cached:
-        LOG.info("Search result fetched from redis cache")
-        return {"message":"contact fetched (cached)","data":cached}
-    
-    url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
-    headers = {"Authorization":f"Bearer {access_token}","Content-Type":"application/json"}
-
-    payload = {
-        "query": query.query,
-        "properties": [
-            "email",
-            "firstname", 
-            "lastname",
-            "phone",
-            "company",
-            "website",
-            "jobtitle"
-        ]
-    }
-
-    res = requests.post(url,headers=headers,json=payload)
-    if res.status_code ==200:
-        LOG.info(f"Contact Fetched Successfully: {query.query}")
-        redis_set_json(cached_key,res.json())
-        return {"message":"contact fetched","data":res.json()}
-    return {"error": res.status_code, "details": res.text}
\ No newline at end of file
+        return cached_result(cached)
+
+    try:
+        result = searched_result(HUBSPOT_CLIENT.request(**search_request(query.query)), query.query)
+    except HubSpotError as e:
+        return e.as_dict()
+    if "error" not in result:
+        contact_cache_set(user_ns, generation, "search", result["data"], search_key(query.query))
+        index_contacts(user_ns, result["data"].get("results", []))
+    return result
+
+
+@tool("search_by_name", args_model=SearchByNameArgs, read_only=True)
+def search_by_name(args: SearchByNameArgs):
+    LOG.info(f"Searching contacts by name: {args.query}")
+    user_ns = get_user_namespace()
+    ensure_contact_indexes(user_ns)
+    if not NAME_INDEX.is_fresh(user_ns):
+        # Without a mirror to build from, the contact list read builds the index
+        contacts = _load_contacts()
+        if "error" in contacts:
+            return contacts
+
+    matches = NAME_INDEX.search(user_ns, args.query, limit=args.limit or CONFIG.name_search_limit)
+    return name_matches_result(args.query, matches)
+
+
+@tool("query_contacts", args_model=QueryContactsArgs, read_only=True)
+def query_contacts(args: QueryContactsArgs):
+    """Filter/count/group the cached contact set locally; only the compact result reaches the model"""
+    LOG.info(f"Querying contacts: {args.dict(exclude_defaults=True)}")
+    return table_result(_load_contacts(), run_query, args)
+
+
+def _after_batch_write(user_ns: str, summary: dict):
+    if not summary["succeeded"]:
+        return
+    _after_write(user_ns)
+    # Archive reports only ids; create/update results lack the mirrored properties, so resync those
+    if summary["operation"] == "archive":
+        write_through_remove(user_ns, succeeded_ids(summary))
+    else:
+        unindex_contacts(user_ns, succeeded_ids(summary))
+        request_sync(user_ns)
+
+
+@tool("batch_create_contacts", args_model=BatchCreateContactsArgs, idempotency_key=by_payload)
+def batch_create_contacts(args: BatchCreateContactsArgs):
+    LOG.info(f"Batch creating {len(args.contacts)} contacts")
+    user_ns = get_user_namespace()
+    summary = run_batch("create", create_inputs(args.contacts))
+    _after_batch_write(user_ns, summary)
+    return summary
+
+
+@tool("batch_update_contacts", args_model=BatchUpdateContactsArgs, idempotency_key=by_payload)
+def batch_update_contacts(args: BatchUpdateContactsArgs):
+    LOG.info(f"Batch updating {len(args.contacts)} contacts")
+    user_ns = get_user_namespace()
+    summary = run_batch("update", update_inputs(args.contacts))
+    _after_batch_write(user_ns, summary)
+    return summary
+
+
+@tool("batch_read_contacts", args_model=BatchReadContactsArgs, read_only=True)
+def batch_read_contacts(args: BatchReadContactsArgs):
+    LOG.info(f"Batch reading {len(args.ids)} contacts")
+    return run_batch("read", id_inputs(args.ids), properties=args.properties, id_property=args.id_property)
+
+
+@tool("batch_archive_contacts", args_model=BatchArchiveContactsArgs, idempotency_key=by_payload)
+def batch_archive_contacts(args: BatchArchiveContactsArgs):
+    LOG.info(f"Batch archiving {len(args.contact_ids)} contacts")
+    user_ns = get_user_namespace()
+    summary = run_batch("archive", id_inputs(args.contact_ids))
+    _after_batch_write(user_ns, summary)
+    return summary
@@ -0,0 +1,158 @@
+import re
+from config import CONFIG
+from core.logger.logger import LOG
+from core.utils.utils import message_to_dict
+from modules.ai_agent.prompt_store import hydrate_messages
+
+# Rough local tokenizer: words, numbers and individual punctuation marks,
+# with long runs split every 4 characters like BPE vocabularies tend to do.
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_MESSAGE_OVERHEAD_TOKENS = 4
+_SUMMARY_QUERY_CHARS = 200
+_SUMMARY_ANSWER_CHARS = 300
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return sum(max(1, len(piece) // 4) for piece in _TOKEN_RE.findall(text))
+
+
+def count_message_tokens(msg: dict) -> int:
+    tokens = _MESSAGE_OVERHEAD_TOKENS + estimate_tokens(msg.get("content") or "")
+    for tool_call in msg.get("tool_calls") or []:
+        function = tool_call.get("function", {})
+        tokens += estimate_tokens(function.get("name", "")) + estimate_tokens(function.get("arguments", ""))
+    return tokens
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = (text or "").replace("\n", " ").strip()
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _squeeze_tool_message(msg: dict, max_tokens: int) -> dict:
+    """Cut an oversized tool payload down to roughly max_tokens"""
+    content = msg.get("content") or ""
+    if estimate_tokens(content) <= max_tokens:
+        return msg
+    keep_chars = max_tokens * 4
+    squeezed = dict(msg)
+    squeezed["content"] = f"{content[:keep_chars]}... [truncated {len(content) - keep_chars} chars]"
+    return squeezed
+
+
+def _split_turns(messages: list):
+    """Leading system messages, then turns that each start at a user message"""
+    head = []
+    index = 0
+    while index < len(messages) and messages[index].get("role") == "system":
+        head.append(messages[index])
+        index += 1
+
+    turns = []
+    for msg in messages[index:]:
+        if msg.get("role") == "user" or not turns:
+            turns.append([msg])
+        else:
+            turns[-1].append(msg)
+    return head, turns
+
+
+def _summarize_turns(turns: list) -> str:
+    lines = []
+    for turn in turns:
+        query = next((m.get("content") for m in turn if m.get("role") == "user"), "")
+        tools = [
+            tc.get("function", {}).get("name", "")
+            for m in turn if m.get("role") == "assistant"
+            for tc in m.get("tool_calls") or []
+        ]
+        answer = next(
+            (m.get("content") for m in reversed(turn) if m.get("role") == "assistant" and m.get("content")),
+            ""
+        )
+        line = f"- User: {_shorten(query, _SUMMARY_QUERY_CHARS)}"
+        if tools:
+            line += f" | Tools: {', '.join(tools)}"
+        if answer:
+            line += f" | Assistant: {_shorten(answer, _SUMMARY_ANSWER_CHARS)}"
+        lines.append(line)
+    return "Summary of earlier conversation (oldest first):\n" + "\n".join(lines)
+
+
+def compact_messages(
+        messages: list,
+        context_messages: list = None,
+        budget: int = None,
+        recent_turns: int = None,
+        max_tool_tokens: int = None
+) -> list:
+    """
+    Fit the conversation into a token budget.
+
+    The system prompt is a fixed cost and not counted. The current turn is
+    always kept verbatim, up to `recent_turns` earlier turns are kept with big
+    tool payloads squeezed, everything older becomes a single summary message,
+    and vector-search snippets fill whatever budget is left.
+    """
+    budget = budget if budget is not None else CONFIG.context_token_budget
+    recent_turns = recent_turns if recent_turns is not None else CONFIG.context_recent_turns
+    max_tool_tokens = max_tool_tokens if max_tool_tokens is not None else CONFIG.context_max_tool_tokens
+
+    head, turns = _split_turns([message_to_dict(m) for m in messages])
+    if not turns:
+        return head + list(context_messages or [])
+
+    current, previous = turns[-1], turns[:-1]
+    kept = [
+        [_squeeze_tool_message(m, max_tool_tokens) if m.get("role") == "tool" else m for m in turn]
+        for turn in previous[-recent_turns:]
+    ] if recent_turns > 0 else []
+    older = previous[:len(previous) - len(kept)]
+
+    def turn_tokens(turn):
+        return sum(count_message_tokens(m) for m in turn)
+
+    used = turn_tokens(current) + sum(turn_tokens(t) for t in kept)
+    # Drop the oldest verbatim turns into the summary until the recent window fits
+    while kept and used > budget:
+        moved = kept.pop(0)
+        used -= turn_tokens(moved)
+        older.append(previous[len(older)])
+    if used > budget:
+        # Only the current turn is left and it is still too big: squeeze its tool payloads as a last resort
+        current = [_squeeze_tool_message(m, max_tool_tokens) if m.get("role") == "tool" else m for m in current]
+        used = turn_tokens(current)
+
+    summary = []
+    if older:
+        summary_msg = {"role": "system", "content": _summarize_turns(older)}
+        summary_tokens = count_message_tokens(summary_msg)
+        remaining = max(budget - used, 0)
+        if summary_tokens > remaining:
+            # Keep the most recent summary lines
+            summary_msg["content"] = "..." + summary_msg["content"][-remaining * 4:] if remaining else ""
+            summary_tokens = count_message_tokens(summary_msg)
+        if summary_msg["content"]:
+            summary.append(summary_msg)
+            used += summary_tokens
+
+    snippets = []
+    for snippet in context_messages or []:
+        snippet_tokens = count_message_tokens(snippet)
+        if used + snippet_tokens > budget:
+            break
+        snippets.append(snippet)
+        used += snippet_tokens
+
+    dropped = len(context_messages or []) - len(snippets)
+    if older or dropped:
+        LOG.info(f"Context compacted: {len(older)} turns summarized, {dropped} snippets dropped, ~{used} tokens")
+
+    return head + summary + snippets + [m for turn in kept for m in turn] + current
+
+
+def build_llm_messages(messages: list, context_messages: list = None) -> list:
+    """Compact the history to the token budget and resolve the system prompt reference"""
+    return hydrate_messages(compact_messages(messages, context_messages))
@@ -1,22 +1,106 @@
-from socket import timeout
 from groq import Groq
 import json
-from modules.ai_agent.contacts.contact_tools import (get_contacts, create_contact, update_contact, delete_contact,search_by_identifier)
-from modules.crud_ops.contacts.schema import ContactProperties, UpdateContactArgs,Search_by_query
-from modules.ai_agent.system_Prompt import system_prompt
-from modules.ai_agent.intent import get_tools
+from modules.ai_agent.intent import get_tools, group_tool_calls
+from modules.ai_agent.tool_registry import TOOL_REGISTRY
+from modules.ai_agent.tool_results import shape_tool_result
+from modules.ai_agent.context_manager import build_llm_messages
 from config import CONFIG
 from core.logger.logger import LOG
 import time
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from modules.auth.user_id import get_user_id_from_token
 from modules.database.mongo_db.mongo_ops import MessageOperations
-from modules.database.redis.redis_client import (redis_client,get_converstaion_key,get_messages_from_redis,save_messages_to_redis)
+from modules.database.redis.redis_client import (get_messages_from_redis,append_messages_to_redis)
 from modules.celery.tasks import embed_and_store_task
 from modules.database.vector_db.vector_search import VectorSearchService
-from modules.database.vector_db.vector_utility import should_perform_vector_search
+from modules.ai_agent.retrieval import retrieve_context
+from modules.ai_agent.response_cache import get_cached_response, store_cached_response, is_cacheable_turn
 client = Groq()
 MODEL = CONFIG.model_name
+_tool_executor = ThreadPoolExecutor(max_workers=CONFIG.tool_parallelism, thread_name_prefix="agent-tool")
+
+
+def _execute_tool_call(tool_call):
+    """
+    Validate and run one tool call through the tool registry.
+    Returns (tool_message, tool_record) or None for an unknown function.
+    """
+    function_name = tool_call.function.name
+    tool_start = time.time()
+    
+    entry = TOOL_REGISTRY.get(function_name)
+    if entry is None or entry.handler is None:
+        LOG.error(f"Unknown function called: {function_name}")
+        return None
+    
+    LOG.info(f"function Called: {function_name}")
+    function_args = entry.parse_arguments(tool_call.function.arguments)
+    
+    function_response = entry.check(function_args)
+    if function_response is not None:
+        tool_status = "error"
+    else:
+        # Execute the function call
+        try:
+            function_response = entry.call(function_args)
+            LOG.info(f"Response from {function_name}: {function_response}")
+            tool_status = "success"
+                
+        except Exception as e:
+            LOG.error(f"Error running {function_name}: {e}")
+            function_response = {"error": str(e)}
+            tool_status = "error"
+    
+    # Budgeted copy for the LLM and the history; the full result is kept by reference when cut
+    function_response, response_ref = shape_tool_result(entry, function_response)
+    tool_message = {
+        "tool_call_id": tool_call.id,
+        "role": "tool", 
+        "name": function_name,
+        "content": json.dumps(function_response)
+    }
+    tool_execution_time = int((time.time() - tool_start) * 1000)
+    tool_record = {
+        "tool_call_id": tool_call.id,
+        "function_name": function_name,
+        "arguments": function_args,
+        "response": function_response,
+        "response_ref": response_ref,
+        "execution_time_ms": tool_execution_time,
+        "status": tool_status,
+        "timestamp": datetime.now().isoformat()
+    }
+    return tool_message, tool_record
+
+
+def _replay_cached_response(user_prompt, user_id: str, cached: dict, message_ops, start_time: float, phase_timings: dict):
+    """Answer from the response cache: record the turn in history and Mongo without calling the LLM"""
+    get_messages_from_redis(user_id)  # seeds the prompt reference for a fresh history
+    append_messages_to_redis(user_id,[
+        {"role": "user", "content": str(user_prompt)},
+        {"role": "assistant", "content": cached["response"]}
+    ])
+    response_time = time.time() - start_time
+    phase_timings["response_cache"] = cached["match"]
+    message_id = message_ops.save_message({
+        "user_id": user_id,
+        "user_query": user_prompt.query,
+        "ai_response": cached["response"],
+        "response_time_seconds": round(response_time, 2),
+        "model": MODEL,
+        "status": "completed",
+        "phase_timings": phase_timings
+    })
+    return {
+        "message_id": message_id,
+        "response": cached["response"],
+        "tokens_used": 0,
+        "tool_calls": 0,
+        "react_cycles": 0,
+        "response_time": round(response_time, 2)
+    }
+
 
 def run_convo(user_prompt: str):
     message_ops = MessageOperations()
@@ -25,35 +109,26 @@ def run_convo(user_prompt: str):
     user_id = get_user_id_from_token()
     LOG.info(f"User id : {user_id}")
     
-    messages = get_messages_from_redis(user_id)
-    redis_has_history = len(messages) > 0
-    # Determine if we need vector search using LLM-based intent detection
-    need_vector_search=should_perform_vector_search(user_prompt.query,messages)
-    print(f"need_vector_search: {need_vector_search}")
-    if need_vector_search:
-        LOG.info("Performing vector search for additional context which is not in current history")
-        vector_results = vector_search_service.search_conversations(
-            query=user_prompt.query,
-            user_id=user_id,
-            limit=20
-        )
-        LOG.info(f"Vector search results {vector_results}")
-        if vector_results:
-            LOG.info(f"Found {len(vector_results)} relevant conversations from vector search")
-            for result in reversed(vector_results): # Reverse to maintain chronological order
-                messages.insert(0,{
-                    "role":"system",
-                    "content":f"Previous conversation context: User asked '{result['user_query']}' and assistant responded '{result['ai_response']}'"
-                })
-
+    phase_timings = {}
+    phase_start = time.perf_counter()
+    cached, cache_generation = get_cached_response(user_prompt.query)
+    phase_timings["response_cache_ms"] = round((time.perf_counter() - phase_start) * 1000, 2)
+    if cached:
+        return _replay_cached_response(user_prompt, user_id, cached, message_ops, start_time, phase_timings)
 
+    phase_start = time.perf_counter()
+    messages = get_messages_from_redis(user_id)
+    phase_timings["history_ms"] = round((time.perf_counter() - phase_start) * 1000, 2)
+    # Search gate plus (speculative) vector search; snippets are sent to the LLM but never persisted
+    context_messages = retrieve_context(user_prompt.query, user_id, messages, vector_search_service, phase_timings)
 
-    messages.append({
-        "role": "user", 
+    user_message = {
+        "role": "user",
         "content": str(user_prompt)
-    })
+    }
+    messages.append(user_message)
 
-    save_messages_to_redis(user_id,messages)
+    append_messages_to_redis(user_id,[user_message])
     
     tools = get_tools()
     total_tokens = 0
@@ -62,6 +137,8 @@ def run_convo(user_prompt: str):
     final_response = ""
     status = "completed"
     error_msg = None
+    phase_timings["llm_ms"] = 0.0
+    phase_timings["tools_ms"] = 0.0
     
     try:
         max_iterations = 5  # Prevent infinite loops
@@ -71,15 +148,17 @@ def run_convo(user_prompt: str):
             iteration += 1
             
             # LLM call - agent can decide to call tools
+            llm_start = time.perf_counter()
             response = client.chat.completions.create(
                 model=MODEL,
                 temperature=0.3,
-                messages=messages,
+                messages=build_llm_messages(messages, context_messages),
                 stream=False,
                 tools=tools,
                 tool_choice="auto",
                 max_completion_tokens=4096
             )
+            phase_timings["llm_ms"] += (time.perf_counter() - llm_start) * 1000
             
             response_message = response.choices[0].message
             LOG.info(f"response of LLM call {iteration}: {response_message}")
@@ -91,7 +170,7 @@ def run_convo(user_prompt: str):
             LOG.info(f"tool calls in iteration {iteration}: {tool_calls}")
             
             messages.append(response_message)
-            save_messages_to_redis(user_id,messages)
+            append_messages_to_redis(user_id,[response_message])
 
             cycle_data = {
                 "cycle_number":iteration,
@@ -109,122 +188,45 @@ def run_convo(user_prompt: str):
                 react_cycles.append(cycle_data)
                 break
             
-            # Process tool calls
-            available_functions = {
-                "get_contacts": (get_contacts, None),
-                "create_contact": (create_contact, ContactProperties), 
-                "update_contact": (update_contact, UpdateContactArgs),
-                "delete_contact":(delete_contact,None),
-                "search_by_identifier": (search_by_identifier, Search_by_query)
-            }
-
             total_tool_calls +=len(tool_calls)
             
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                tool_start = time.time()
-                
-                if function_name not in available_functions:
-                    LOG.error(f"Unknown function called: {function_name}")
-                    continue
-                
-                LOG.info(f"function Called: {function_name}")
-                function_to_call, model_val = available_functions[function_name]
-                arguments_of_func = tool_call.function.arguments
-                
-                # Always empty for get_contacts
-                if function_name == "get_contacts":
-                    function_args = {}
+            tools_start = time.perf_counter()
+            for batch in group_tool_calls(tool_calls, lambda tc: tc.function.name):
+                if len(batch) > 1:
+                    # Read-only calls from the same turn run concurrently
+                    results = list(_tool_executor.map(_execute_tool_call, batch))
                 else:
-                    function_args = json.loads(arguments_of_func) if arguments_of_func != "null" else {}
-                
-                # VALIDATION FOR search_by_identifier 
-                if function_name == "search_by_identifier":
-                    query_value = function_args.get("query", "")
-                    
-                    # Check if it's a valid email or phone number
-                    is_email = "@" in query_value and "." in query_value
-                    is_phone = sum(c.isdigit() for c in query_value) >= 7
-                    
-                    if not (is_email or is_phone):
-                        LOG.warning(f"Invalid search query rejected: '{query_value}'")
-                        
-                        # Return error to force LLM to ask for proper identifier
-                        function_response = {
-                            "error": "Invalid identifier provided",
-                            "message": f"The query '{query_value}' is not a valid email or phone number. Please ask the user to provide a valid email address or phone number to search for this contact."
-                        }
-                        
-                        # Add the error response to messages
-                        messages.append({
-                            "tool_call_id": tool_call.id,
-                            "role": "tool",
-                            "name": function_name,
-                            "content": json.dumps(function_response)
-                        })
-                        save_messages_to_redis(user_id,messages)
-                        tool_execution_time = int((time.time() - tool_start) * 1000)
-                        cycle_data["tool_calls"].append({
-                            "tool_call_id": tool_call.id,
-                            "function_name": function_name,
-                            "arguments": function_args,
-                            "response": function_response,
-                            "execution_time_ms": tool_execution_time,
-                            "status": "error",
-                            "timestamp": datetime.now().isoformat()
-                        })
- 
-                        continue
-                
-                # Execute the function call
-                try:
-                    if model_val:
-                        validated_args = model_val(**function_args)
-                        function_response = function_to_call(validated_args)
-                    else:
-                        function_response = function_to_call(**function_args)
-                    
-                    LOG.info(f"Response from {function_name}: {function_response}")
-                    tool_status = "success"
-                        
-                except Exception as e:
-                    LOG.error(f"Error running {function_name}: {e}")
-                    function_response = {"error": str(e)}
-                    tool_status = "error"
-                
+                    results = [_execute_tool_call(batch[0])]
 
-                messages.append({
-                    "tool_call_id": tool_call.id,
-                    "role": "tool", 
-                    "name": function_name,
-                    "content": json.dumps(function_response)
-                })
-                save_messages_to_redis(user_id,messages)
-                tool_execution_time = int((time.time() - tool_start) * 1000)
-                cycle_data["tool_calls"].append({
-                    "tool_call_id": tool_call.id,
-                    "function_name": function_name,
-                    "arguments": function_args,
-                    "response": function_response,
-                    "execution_time_ms": tool_execution_time,
-                    "status": tool_status,
-                    "timestamp": datetime.now().isoformat()
-                })
+                # Append in the order the model issued the calls and persist once per batch
+                batch_messages = []
+                for result in results:
+                    if result is None:
+                        continue
+                    tool_message, tool_record = result
+                    batch_messages.append(tool_message)
+                    cycle_data["tool_calls"].append(tool_record)
+                messages.extend(batch_messages)
+                append_messages_to_redis(user_id,batch_messages)
+            phase_timings["tools_ms"] += (time.perf_counter() - tools_start) * 1000
             
             react_cycles.append(cycle_data)
         
             if iteration >= max_iterations and not final_response:
+                llm_start = time.perf_counter()
                 final_call = client.chat.completions.create(
                     model=MODEL,
-                    messages=messages,
+                    messages=build_llm_messages(messages, context_messages),
                     tool_choice="none",
                     max_completion_tokens=4096
                 )
+                phase_timings["llm_ms"] += (time.perf_counter() - llm_start) * 1000
                 
                 final_response = final_call.choices[0].message.content
                 total_tokens += final_call.usage.total_tokens if hasattr(final_call, 'usage') else 0
-                messages.append({"role":"assistant","content":final_response})
-                save_messages_to_redis(user_id,messages)
+                final_message = {"role":"assistant","content":final_response}
+                messages.append(final_message)
+                append_messages_to_redis(user_id,[final_message])
                 
                 react_cycles.append({
                     "cycle_number": iteration + 1,
@@ -240,7 +242,13 @@ def run_convo(user_prompt: str):
         status = "error"
         error_msg = str(e)
     
+    tool_names = [record["function_name"] for cycle in react_cycles for record in cycle["tool_calls"]]
+    if is_cacheable_turn(status, final_response, tool_names, TOOL_REGISTRY.is_read_only):
+        store_cached_response(user_prompt.query, final_response, cache_generation)
+
     response_time = time.time() - start_time
+    phase_timings["llm_ms"] = round(phase_timings["llm_ms"], 2)
+    phase_timings["tools_ms"] = round(phase_timings["tools_ms"], 2)
 
     message_data = {
         "user_id": user_id,
@@ -253,8 +261,10 @@ def run_convo(user_prompt: str):
         "response_time_seconds": round(response_time, 2),
         "model": MODEL,
         "status": status,
-        "error": error_msg
+        "error": error_msg,
+        "phase_timings": phase_timings
     }
+    LOG.info(f"Phase timings: {phase_timings}")
 
     message_id = message_ops.save_message(message_data)
     try:
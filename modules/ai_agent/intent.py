@@ -1,11 +1,19 @@
-import json
-import os
-TOOLS_DIR = os.path.join(os.path.dirname(__file__), "tools")
+from modules.ai_agent.tool_registry import TOOL_REGISTRY
 
 def get_tools():
-    tools = []
-    for file_name in os.listdir(TOOLS_DIR):
-        if file_name.endswith(".json"):
-            with open(os.path.join(TOOLS_DIR, file_name), "r", encoding="utf-8") as f:
-                tools.append(json.load(f))
-    return tools
+    return TOOL_REGISTRY.specs()
+
+def group_tool_calls(tool_calls: list, get_name) -> list:
+    """
+    Split one turn's tool calls into ordered batches.
+    Consecutive read-only calls share a batch, every write call gets its own,
+    so a read issued after a write still sees the write.
+    """
+    batches = []
+    for tool_call in tool_calls:
+        read_only = TOOL_REGISTRY.is_read_only(get_name(tool_call))
+        if read_only and batches and batches[-1][0]:
+            batches[-1][1].append(tool_call)
+        else:
+            batches.append((read_only, [tool_call]))
+    return [calls for _, calls in batches]
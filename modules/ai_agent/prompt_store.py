@@ -0,0 +1,45 @@
+import hashlib
+from modules.ai_agent.system_Prompt import system_prompt
+
+# Conversation histories persist a small reference instead of the ~25KB system prompt.
+# The text is injected back from this in-process table right before each LLM call.
+SYSTEM_PROMPT_VERSION = hashlib.sha256(system_prompt.encode()).hexdigest()[:12]
+SYSTEM_PROMPTS = {SYSTEM_PROMPT_VERSION: system_prompt}
+
+_PROMPT_PREFIX = system_prompt.split("\n", 1)[0]
+
+
+def system_prompt_reference() -> dict:
+    return {"role": "system", "prompt_version": SYSTEM_PROMPT_VERSION}
+
+
+def is_full_system_prompt(msg) -> bool:
+    """True for a system message that still carries the prompt text (pre-reference histories)"""
+    return (
+        isinstance(msg, dict)
+        and msg.get("role") == "system"
+        and isinstance(msg.get("content"), str)
+        and msg["content"].startswith(_PROMPT_PREFIX)
+    )
+
+
+def compact_system_prompt(msg):
+    """Replace an inlined system prompt with its reference, leave every other message untouched"""
+    return system_prompt_reference() if is_full_system_prompt(msg) else msg
+
+
+def hydrate_messages(messages: list) -> list:
+    """
+    Return the list to send to the LLM with prompt references resolved.
+    Unknown versions (written by an older deploy) fall back to the current prompt.
+    """
+    hydrated = []
+    for msg in messages:
+        if isinstance(msg, dict) and "prompt_version" in msg:
+            hydrated.append({
+                "role": "system",
+                "content": SYSTEM_PROMPTS.get(msg["prompt_version"], system_prompt)
+            })
+        else:
+            hydrated.append(msg)
+    return hydrated
@@ -0,0 +1,239 @@
+import re
+import json
+import asyncio
+import hashlib
+from typing import Optional, Tuple
+from config import CONFIG
+from core.logger.logger import LOG
+from modules.ai_agent.prompt_store import SYSTEM_PROMPT_VERSION
+from modules.database.redis.redis_client import redis_client, async_redis_client, get_user_namespace
+from modules.database.vector_db.vector_utility import is_context_dependent, embed_texts
+
+# Final answers of read-only agent turns, keyed by normalized query.
+#
+#   response_cache:{ns}:gen                     CRM data generation, INCR'd on every contact write
+#   response_cache:{ns}:{gen}:exact:{digest}    JSON {"query", "response"}
+#   response_cache:{ns}:{gen}:semantic          hash digest -> JSON {"query", "entities", "vector", "response"}
+#   response_cache:stats                        hit/miss/store/invalidation counters
+#
+# Bumping the generation orphans every entry of the namespace at once; the
+# orphans expire with their TTL, so invalidation is a single INCR. An answer is
+# stored under the generation its lookup read, so a write that lands while the
+# turn runs retires that answer too instead of it passing as current.
+STATS_KEY = "response_cache:stats"
+_SEMANTIC_MAX_ENTRIES = 500
+
+_PUNCT_RE = re.compile(r"[^\w@.+\s-]")
+_SPACE_RE = re.compile(r"\s+")
+# Values that must match exactly for a semantic hit: emails, numbers and capitalized names
+_ENTITY_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+|\d[\d\s().+-]{3,}\d|\b[A-Z][a-z]+\b")
+
+
+def normalize_query(query: str) -> str:
+    query = _PUNCT_RE.sub(" ", (query or "").lower())
+    return _SPACE_RE.sub(" ", query).strip(" .")
+
+
+def _entities(query: str) -> list:
+    words = (query or "").split(maxsplit=1)
+    rest = words[1] if len(words) > 1 else ""
+    return sorted({match.lower() for match in _ENTITY_RE.findall(rest)})
+
+
+def _digest(normalized: str) -> str:
+    # Prompt version and model are part of the key so a deploy never serves stale answers
+    return hashlib.sha256(f"{SYSTEM_PROMPT_VERSION}|{CONFIG.model_name}|{normalized}".encode()).hexdigest()[:32]
+
+
+def _gen_key(user_ns: str) -> str:
+    return f"response_cache:{user_ns}:gen"
+
+
+def _exact_key(user_ns: str, generation: str, digest: str) -> str:
+    return f"response_cache:{user_ns}:{generation}:exact:{digest}"
+
+
+def _semantic_key(user_ns: str, generation: str) -> str:
+    return f"response_cache:{user_ns}:{generation}:semantic"
+
+
+def _namespace() -> Optional[str]:
+    try:
+        return get_user_namespace()
+    except RuntimeError as e:
+        LOG.warning(f"Response cache disabled for this request: {e}")
+        return None
+
+
+def is_cacheable_query(query: str) -> bool:
+    return CONFIG.response_cache_enabled and bool(normalize_query(query)) and not is_context_dependent(query)
+
+
+def is_cacheable_turn(status: str, final_response: str, tool_names: list, is_read_only) -> bool:
+    """Only completed turns whose tools were all read-only are worth replaying"""
+    return status == "completed" and bool(final_response) and all(is_read_only(name) for name in tool_names)
+
+
+def _best_semantic_match(query: str, entries: dict) -> Optional[dict]:
+    if not entries:
+        return None
+    entities = _entities(query)
+    candidates = [json.loads(raw) for raw in entries.values()]
+    candidates = [c for c in candidates if c.get("entities") == entities]
+    if not candidates:
+        return None
+    query_vector = embed_texts([query])[0]
+    best, best_score = None, CONFIG.response_cache_similarity
+    for candidate in candidates:
+        score = float(sum(a * b for a, b in zip(query_vector, candidate["vector"])))
+        if score >= best_score:
+            best, best_score = candidate, score
+    return best
+
+
+def _stored_entry(query: str, response: str) -> dict:
+    return {"query": query, "response": response}
+
+
+def _semantic_entry(query: str, response: str) -> dict:
+    return {
+        "query": query,
+        "entities": _entities(query),
+        "vector": [round(float(x), 6) for x in embed_texts([query])[0]],
+        "response": response
+    }
+
+
+def get_cached_response(query: str) -> Tuple[Optional[dict], Optional[str]]:
+    """({"response", "match"} of a cached answer to `query` or None, generation to store the answer under)
+
+    The generation is None when the answer must not be stored.
+    """
+    if not is_cacheable_query(query):
+        return None, None
+    user_ns = _namespace()
+    if not user_ns:
+        return None, None
+    try:
+        generation = redis_client.get(_gen_key(user_ns)) or "0"
+        normalized = normalize_query(query)
+        data = redis_client.get(_exact_key(user_ns, generation, _digest(normalized)))
+        if data:
+            redis_client.hincrby(STATS_KEY, "exact_hits", 1)
+            LOG.info(f"Response cache exact hit for '{normalized}'")
+            return {"response": json.loads(data)["response"], "match": "exact"}, generation
+
+        if CONFIG.response_cache_semantic:
+            match = _best_semantic_match(query, redis_client.hgetall(_semantic_key(user_ns, generation)))
+            if match:
+                redis_client.hincrby(STATS_KEY, "semantic_hits", 1)
+                LOG.info(f"Response cache semantic hit for '{normalized}' (cached query '{match['query']}')")
+                return {"response": match["response"], "match": "semantic"}, generation
+
+        redis_client.hincrby(STATS_KEY, "misses", 1)
+        return None, generation
+    except Exception as e:
+        LOG.error(f"Response cache lookup failed: {e}")
+    return None, None
+
+
+def store_cached_response(query: str, response: str, generation: Optional[str]):
+    """`generation` is the one get_cached_response read before the turn ran"""
+    if generation is None or not is_cacheable_query(query):
+        return
+    user_ns = _namespace()
+    if not user_ns:
+        return
+    try:
+        digest = _digest(normalize_query(query))
+        ttl = CONFIG.response_cache_ttl_seconds
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(_exact_key(user_ns, generation, digest), json.dumps(_stored_entry(query, response)), ex=ttl)
+        if CONFIG.response_cache_semantic and redis_client.hlen(_semantic_key(user_ns, generation)) < _SEMANTIC_MAX_ENTRIES:
+            pipe.hset(_semantic_key(user_ns, generation), digest, json.dumps(_semantic_entry(query, response)))
+            pipe.expire(_semantic_key(user_ns, generation), ttl)
+        pipe.hincrby(STATS_KEY, "stores", 1)
+        pipe.execute()
+    except Exception as e:
+        LOG.error(f"Response cache store failed: {e}")
+
+
+def invalidate_response_cache(user_ns: str):
+    """Called after every contact write; one INCR retires the whole namespace"""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.incr(_gen_key(user_ns))
+        pipe.hincrby(STATS_KEY, "invalidations", 1)
+        pipe.execute()
+    except Exception as e:
+        LOG.error(f"Response cache invalidation failed: {e}")
+
+
+def get_response_cache_stats() -> dict:
+    raw = redis_client.hgetall(STATS_KEY)
+    stats = {name: int(raw.get(name, 0)) for name in ("exact_hits", "semantic_hits", "misses", "stores", "invalidations")}
+    lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+    stats["hit_rate"] = round((stats["exact_hits"] + stats["semantic_hits"]) / lookups, 4) if lookups else 0.0
+    return stats
+
+
+# ---------- Async variants (used by run_convo_async) ----------
+async def aget_cached_response(query: str) -> Tuple[Optional[dict], Optional[str]]:
+    if not is_cacheable_query(query):
+        return None, None
+    user_ns = await asyncio.to_thread(_namespace)
+    if not user_ns:
+        return None, None
+    try:
+        generation = await async_redis_client.get(_gen_key(user_ns)) or "0"
+        normalized = normalize_query(query)
+        data = await async_redis_client.get(_exact_key(user_ns, generation, _digest(normalized)))
+        if data:
+            await async_redis_client.hincrby(STATS_KEY, "exact_hits", 1)
+            LOG.info(f"Response cache exact hit for '{normalized}'")
+            return {"response": json.loads(data)["response"], "match": "exact"}, generation
+
+        if CONFIG.response_cache_semantic:
+            entries = await async_redis_client.hgetall(_semantic_key(user_ns, generation))
+            match = await asyncio.to_thread(_best_semantic_match, query, entries)
+            if match:
+                await async_redis_client.hincrby(STATS_KEY, "semantic_hits", 1)
+                LOG.info(f"Response cache semantic hit for '{normalized}' (cached query '{match['query']}')")
+                return {"response": match["response"], "match": "semantic"}, generation
+
+        await async_redis_client.hincrby(STATS_KEY, "misses", 1)
+        return None, generation
+    except Exception as e:
+        LOG.error(f"Response cache lookup failed: {e}")
+    return None, None
+
+
+async def astore_cached_response(query: str, response: str, generation: Optional[str]):
+    if generation is None or not is_cacheable_query(query):
+        return
+    user_ns = await asyncio.to_thread(_namespace)
+    if not user_ns:
+        return
+    try:
+        digest = _digest(normalize_query(query))
+        ttl = CONFIG.response_cache_ttl_seconds
+        pipe = async_redis_client.pipeline(transaction=False)
+        pipe.set(_exact_key(user_ns, generation, digest), json.dumps(_stored_entry(query, response)), ex=ttl)
+        if CONFIG.response_cache_semantic and await async_redis_client.hlen(_semantic_key(user_ns, generation)) < _SEMANTIC_MAX_ENTRIES:
+            entry = await asyncio.to_thread(_semantic_entry, query, response)
+            pipe.hset(_semantic_key(user_ns, generation), digest, json.dumps(entry))
+            pipe.expire(_semantic_key(user_ns, generation), ttl)
+        pipe.hincrby(STATS_KEY, "stores", 1)
+        await pipe.execute()
+    except Exception as e:
+        LOG.error(f"Response cache store failed: {e}")
+
+
+async def ainvalidate_response_cache(user_ns: str):
+    try:
+        pipe = async_redis_client.pipeline(transaction=False)
+        pipe.incr(_gen_key(user_ns))
+        pipe.hincrby(STATS_KEY, "invalidations", 1)
+        await pipe.execute()
+    except Exception as e:
+        LOG.error(f"Response cache invalidation failed: {e}")
@@ -0,0 +1,119 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from config import CONFIG
+from core.logger.logger import LOG
+from modules.database.vector_db.vector_utility import should_perform_vector_search, ashould_perform_vector_search
+
+VECTOR_SEARCH_LIMIT = 20
+
+# Speculative searches must not queue behind tool calls, so they get their own pool
+_retrieval_executor = ThreadPoolExecutor(max_workers=CONFIG.tool_parallelism, thread_name_prefix="agent-retrieval")
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def build_context_messages(vector_results: list) -> list:
+    """Vector search hits as system snippets, in the order Qdrant returned them"""
+    return [
+        {
+            "role": "system",
+            "content": f"Previous conversation context: User asked '{result['user_query']}' and assistant responded '{result['ai_response']}'"
+        }
+        for result in vector_results or []
+    ]
+
+
+def _timed_search(vector_search_service, query: str, user_id: str, timings: dict) -> list:
+    start = time.perf_counter()
+    try:
+        return vector_search_service.search_conversations(query=query, user_id=user_id, limit=VECTOR_SEARCH_LIMIT)
+    finally:
+        timings["vector_search_ms"] = _elapsed_ms(start)
+
+
+async def _atimed_search(vector_search_service, query: str, user_id: str, timings: dict) -> list:
+    start = time.perf_counter()
+    try:
+        return await vector_search_service.asearch_conversations(query=query, user_id=user_id, limit=VECTOR_SEARCH_LIMIT)
+    finally:
+        timings["vector_search_ms"] = _elapsed_ms(start)
+
+
+def _finish(need_vector_search: bool, vector_results: list, timings: dict, start: float) -> list:
+    timings["retrieval_ms"] = _elapsed_ms(start)
+    timings["vector_search_used"] = bool(need_vector_search)
+    LOG.info(f"need_vector_search: {need_vector_search}, retrieval timings: {timings}")
+    if vector_results:
+        LOG.info(f"Found {len(vector_results)} relevant conversations from vector search")
+    return build_context_messages(vector_results) if need_vector_search else []
+
+
+def retrieve_context(query: str, user_id: str, messages: list, vector_search_service, timings: dict) -> list:
+    """
+    Run the search gate and, when it asks for it, the vector search.
+
+    With CONFIG.speculative_retrieval the Qdrant search is started in a worker
+    thread before the gate runs, so its latency overlaps the gate decision;
+    the result is simply dropped when the gate says the history is enough.
+    Phase timings (ms) are written into `timings`.
+    """
+    start = time.perf_counter()
+    timings["speculative"] = CONFIG.speculative_retrieval
+    future = None
+    if CONFIG.speculative_retrieval:
+        future = _retrieval_executor.submit(_timed_search, vector_search_service, query, user_id, timings)
+
+    gate_start = time.perf_counter()
+    need_vector_search = should_perform_vector_search(query, messages)
+    timings["gate_ms"] = _elapsed_ms(gate_start)
+
+    vector_results = []
+    if future is not None:
+        if need_vector_search:
+            wait_start = time.perf_counter()
+            vector_results = future.result()
+            timings["vector_search_wait_ms"] = _elapsed_ms(wait_start)
+        else:
+            future.cancel()
+    elif need_vector_search:
+        LOG.info("Performing vector search for additional context which is not in current history")
+        vector_results = _timed_search(vector_search_service, query, user_id, timings)
+        timings["vector_search_wait_ms"] = timings["vector_search_ms"]
+
+    return _finish(need_vector_search, vector_results, timings, start)
+
+
+async def aretrieve_context(query: str, user_id: str, messages: list, vector_search_service, timings: dict) -> list:
+    """asyncio counterpart of retrieve_context; the speculative search runs as a task"""
+    start = time.perf_counter()
+    timings["speculative"] = CONFIG.speculative_retrieval
+    task = None
+    if CONFIG.speculative_retrieval:
+        task = asyncio.create_task(_atimed_search(vector_search_service, query, user_id, timings))
+
+    gate_start = time.perf_counter()
+    try:
+        need_vector_search = await ashould_perform_vector_search(query, messages)
+    except BaseException:
+        if task is not None:
+            task.cancel()
+        raise
+    timings["gate_ms"] = _elapsed_ms(gate_start)
+
+    vector_results = []
+    if task is not None:
+        if need_vector_search:
+            wait_start = time.perf_counter()
+            vector_results = await task
+            timings["vector_search_wait_ms"] = _elapsed_ms(wait_start)
+        else:
+            task.cancel()
+    elif need_vector_search:
+        LOG.info("Performing vector search for additional context which is not in current history")
+        vector_results = await _atimed_search(vector_search_service, query, user_id, timings)
+        timings["vector_search_wait_ms"] = timings["vector_search_ms"]
+
+    return _finish(need_vector_search, vector_results, timings, start)
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import asyncio
+import importlib
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel
+from config import CONFIG
+from core.logger.logger import LOG
+from modules.crud_ops.idempotency import run_idempotent, arun_idempotent, tool_key, REPLAYED_NOTE
+from modules.database.redis.redis_client import get_user_namespace
+
+TOOLS_DIR = os.path.join(os.path.dirname(__file__), "tools")
+
+# Modules whose decorated functions register handlers; imported once on first load
+TOOL_MODULES = [
+    "modules.ai_agent.contacts.contact_tools",
+    "modules.ai_agent.contacts.async_contact_tools",
+]
+
+
+@dataclass
+class ToolEntry:
+    name: str
+    spec: Optional[dict] = None
+    handler: Optional[Callable] = None
+    async_handler: Optional[Callable] = None
+    args_model: Optional[Type[BaseModel]] = None
+    read_only: bool = False
+    ignore_args: bool = False
+    guard: Optional[Callable[[dict], Optional[dict]]] = None
+    # Result budget for the LLM; None means CONFIG.tool_result_max_tokens / _max_bytes
+    max_result_tokens: Optional[int] = None
+    max_result_bytes: Optional[int] = None
+    # Write tools: identity (email, contact id) of the call's idempotency key, see crud_ops/idempotency.py
+    idempotency_key: Optional[Callable[[dict], str]] = None
+
+    @property
+    def result_budget(self) -> Tuple[int, int]:
+        return (
+            self.max_result_tokens or CONFIG.tool_result_max_tokens,
+            self.max_result_bytes or CONFIG.tool_result_max_bytes
+        )
+
+    def parse_arguments(self, raw_arguments: Optional[str]) -> dict:
+        if self.ignore_args or raw_arguments in (None, "", "null"):
+            return {}
+        return json.loads(raw_arguments)
+
+    def check(self, function_args: dict) -> Optional[dict]:
+        """Run the pre-dispatch guard; returns an error response to hand back to the LLM, or None"""
+        return self.guard(function_args) if self.guard else None
+
+    def _bind(self, function_args: dict):
+        if self.args_model:
+            return (self.args_model.model_validate(function_args),), {}
+        return (), function_args
+
+    def _key(self, function_args: dict) -> str:
+        return tool_key(self.name, self.idempotency_key(function_args), function_args)
+
+    @staticmethod
+    def _noted(response, replayed: bool):
+        if replayed and isinstance(response, dict):
+            return {**response, "note": REPLAYED_NOTE}
+        return response
+
+    def call(self, function_args: dict):
+        args, kwargs = self._bind(function_args)
+        if self.idempotency_key is None:
+            return self.handler(*args, **kwargs)
+        key = self._key(function_args)
+        response, replayed = run_idempotent(
+            get_user_namespace(), key, key, lambda: self.handler(*args, **kwargs), same_writes_only=True
+        )
+        return self._noted(response, replayed)
+
+    async def acall(self, function_args: dict):
+        args, kwargs = self._bind(function_args)
+        if self.idempotency_key is None:
+            return await self.async_handler(*args, **kwargs)
+        key = self._key(function_args)
+        response, replayed = await arun_idempotent(
+            await asyncio.to_thread(get_user_namespace), key, key,
+            lambda: self.async_handler(*args, **kwargs), same_writes_only=True
+        )
+        return self._noted(response, replayed)
+
+
+class ToolRegistry:
+    """
+    Tool specs and handlers, built once and looked up by name.
+
+    Specs come from tools/*.json (or a spec passed to the decorator); handlers
+    and their pydantic validators come from @tool / @async_tool. JSON files are
+    re-read only when their mtimes change, checked at most every
+    CONFIG.tool_reload_interval_seconds.
+    """
+    def __init__(self, tools_dir: str = TOOLS_DIR):
+        self.tools_dir = tools_dir
+        self._entries: Dict[str, ToolEntry] = {}
+        self._specs: List[dict] = []
+        self._mtimes: Dict[str, float] = {}
+        self._last_check = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _entry(self, name: str) -> ToolEntry:
+        if name not in self._entries:
+            self._entries[name] = ToolEntry(name=name)
+        return self._entries[name]
+
+    def tool(
+            self,
+            name: str,
+            args_model: Optional[Type[BaseModel]] = None,
+            read_only: bool = False,
+            ignore_args: bool = False,
+            guard: Optional[Callable[[dict], Optional[dict]]] = None,
+            spec: Optional[dict] = None,
+            max_result_tokens: Optional[int] = None,
+            max_result_bytes: Optional[int] = None,
+            idempotency_key: Optional[Callable[[dict], str]] = None
+    ):
+        """Register a sync tool handler together with its validator and metadata"""
+        def decorator(func):
+            entry = self._entry(name)
+            entry.handler = func
+            entry.args_model = args_model
+            entry.read_only = read_only
+            entry.ignore_args = ignore_args
+            entry.guard = guard
+            entry.max_result_tokens = max_result_tokens
+            entry.max_result_bytes = max_result_bytes
+            entry.idempotency_key = idempotency_key
+            if spec is not None:
+                entry.spec = spec
+            return func
+        return decorator
+
+    def async_tool(self, name: str):
+        """Register the asyncio handler for a tool declared with @tool"""
+        def decorator(func):
+            self._entry(name).async_handler = func
+            return func
+        return decorator
+
+    def _scan(self) -> Dict[str, float]:
+        return {
+            entry.path: entry.stat().st_mtime
+            for entry in os.scandir(self.tools_dir)
+            if entry.name.endswith(".json")
+        }
+
+    def _load_specs(self, mtimes: Dict[str, float]):
+        for entry in self._entries.values():
+            if entry.spec is not None and entry.spec.get("_source") in self._mtimes:
+                entry.spec = None
+        for path in sorted(mtimes):
+            with open(path, "r", encoding="utf-8") as f:
+                spec = json.load(f)
+            spec["_source"] = path
+            self._entry(spec["function"]["name"]).spec = spec
+        self._mtimes = mtimes
+        self._specs = [
+            {k: v for k, v in entry.spec.items() if k != "_source"}
+            for entry in self._entries.values()
+            if entry.spec is not None and (entry.handler or entry.async_handler)
+        ]
+        LOG.info(f"Tool registry loaded {len(self._specs)} tools")
+
+    def load(self):
+        with self._lock:
+            if not self._loaded:
+                for module in TOOL_MODULES:
+                    importlib.import_module(module)
+                self._loaded = True
+            self._load_specs(self._scan())
+            self._last_check = time.monotonic()
+
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if now - self._last_check < CONFIG.tool_reload_interval_seconds:
+            return
+        self._last_check = now
+        mtimes = self._scan()
+        if mtimes != self._mtimes:
+            LOG.info("Tool specs changed on disk, reloading")
+            with self._lock:
+                self._load_specs(mtimes)
+
+    def specs(self) -> List[dict]:
+        if not self._loaded:
+            self.load()
+        elif CONFIG.tool_hot_reload:
+            self.reload_if_changed()
+        return self._specs
+
+    def get(self, name: str) -> Optional[ToolEntry]:
+        if not self._loaded:
+            self.load()
+        return self._entries.get(name)
+
+    def is_read_only(self, name: str) -> bool:
+        entry = self.get(name)
+        return bool(entry and entry.read_only)
+
+
+TOOL_REGISTRY = ToolRegistry()
+tool = TOOL_REGISTRY.tool
+async_tool = TOOL_REGISTRY.async_tool
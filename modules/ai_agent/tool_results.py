@@ -0,0 +1,121 @@
+import json
+import uuid
+import asyncio
+from typing import Any, List, Optional, Tuple
+from config import CONFIG
+from core.logger.logger import LOG
+from modules.ai_agent.context_manager import estimate_tokens
+from modules.database.mongo_db.mongo_ops import ToolPayloadOperations, AsyncToolPayloadOperations
+
+# Shaping of tool results between the tool call and the tool message.
+#
+# What a tool returns goes into the LLM messages, the Redis history and the
+# Mongo react_cycles record, so it is cut to the tool's budget first:
+#   1. NOISE_FIELDS and null values are dropped at any depth (HubSpot's
+#      archived/createdAt/updatedAt/paging, the properties it adds unasked).
+#   2. While over budget, the longest list is halved; `<key>_omitted` says how
+#      many items were left out and `truncated` is set.
+#   3. If that is still not enough, the JSON text is cut to a `preview`.
+# The tool message and the history record carry the shaped result. When it
+# had to be truncated, the full result is saved to Mongo tool_payloads and the
+# record gets its id as `response_ref`.
+NOISE_FIELDS = frozenset({"archived", "archivedAt", "createdAt", "updatedAt", "paging", "hs_object_id", "lastmodifieddate"})
+# Room for the keys around a preview
+_PREVIEW_OVERHEAD = 64
+
+TOOL_PAYLOADS = ToolPayloadOperations()
+ASYNC_TOOL_PAYLOADS = AsyncToolPayloadOperations()
+_indexes_ready = False
+
+
+def strip_noise(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: strip_noise(v) for k, v in value.items() if k not in NOISE_FIELDS and v is not None}
+    if isinstance(value, list):
+        return [strip_noise(item) for item in value]
+    return value
+
+
+def _fits(text: str, max_tokens: int, max_bytes: int) -> bool:
+    return len(text.encode()) <= max_bytes and estimate_tokens(text) <= max_tokens
+
+
+def _lists(value: Any) -> List[Tuple[dict, str]]:
+    """(parent dict, key) of every list held under a dict key"""
+    found = []
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, list):
+                found.append((value, key))
+            found.extend(_lists(item))
+    elif isinstance(value, list):
+        for item in value:
+            found.extend(_lists(item))
+    return found
+
+
+def fit_result(value: Any, max_tokens: int, max_bytes: int) -> Tuple[Any, bool]:
+    """(value within the budget, whether anything beyond noise was cut)"""
+    text = json.dumps(value)
+    if _fits(text, max_tokens, max_bytes):
+        return value, False
+
+    if isinstance(value, dict):
+        while not _fits(text, max_tokens, max_bytes):
+            candidates = [(parent, key) for parent, key in _lists(value) if len(parent[key]) > 1]
+            if not candidates:
+                break
+            parent, key = max(candidates, key=lambda found: len(found[0][found[1]]))
+            items = parent[key]
+            keep = len(items) // 2
+            parent[key] = items[:keep]
+            parent[f"{key}_omitted"] = parent.get(f"{key}_omitted", 0) + len(items) - keep
+            value["truncated"] = True
+            text = json.dumps(value)
+        if _fits(text, max_tokens, max_bytes):
+            return value, True
+
+    limit = max(min(max_bytes, max_tokens * 4) - _PREVIEW_OVERHEAD, 0)
+    preview = text.encode()[:limit].decode(errors="ignore")
+    # Punctuation-heavy JSON runs well over 1 token per 4 characters
+    while preview and not _fits(preview, max_tokens, max_bytes):
+        preview = preview[:len(preview) // 2]
+    return {"truncated": True, "preview": preview}, True
+
+
+def shape_result(entry, response: Any) -> Tuple[Any, bool]:
+    max_tokens, max_bytes = entry.result_budget
+    return fit_result(strip_noise(response), max_tokens, max_bytes)
+
+
+def _ensure_indexes():
+    global _indexes_ready
+    if not _indexes_ready:
+        TOOL_PAYLOADS.ensure_indexes(CONFIG.tool_payload_retention_days * 86400)
+        _indexes_ready = True
+
+
+def shape_tool_result(entry, response: Any) -> Tuple[Any, Optional[str]]:
+    """(result for the tool message and history record, tool_payloads id of the full result or None)"""
+    shaped, truncated = shape_result(entry, response)
+    if not truncated or not CONFIG.tool_result_keep_full:
+        return shaped, None
+    try:
+        _ensure_indexes()
+        return shaped, TOOL_PAYLOADS.save_payload(uuid.uuid4().hex, entry.name, response)
+    except Exception as e:
+        LOG.error(f"Saving the full {entry.name} result failed: {e}")
+        return shaped, None
+
+
+async def ashape_tool_result(entry, response: Any) -> Tuple[Any, Optional[str]]:
+    shaped, truncated = shape_result(entry, response)
+    if not truncated or not CONFIG.tool_result_keep_full:
+        return shaped, None
+    try:
+        if not _indexes_ready:
+            await asyncio.to_thread(_ensure_indexes)
+        return shaped, await ASYNC_TOOL_PAYLOADS.save_payload(uuid.uuid4().hex, entry.name, response)
+    except Exception as e:
+        LOG.error(f"Saving the full {entry.name} result failed: {e}")
+        return shaped, None
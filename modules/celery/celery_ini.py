@@ -7,7 +7,7 @@ celery_app = Celery(
     "hubspot_agent",
     broker=CONFIG.celery_broker_url,
     backend=CONFIG.celery_result_backend,
-    include=["modules.celery.tasks"]
+    include=["modules.celery.tasks", "modules.celery.contact_sync_tasks"]
 )
 
 celery_app.conf.update(
@@ -20,4 +20,18 @@ celery_app.conf.update(
     broker_pool_limit=2,  # Max 2 connections to Redis
     worker_prefetch_multiplier=1,  # Take 1 task at a time
     worker_max_tasks_per_child=100,  # Restart worker after 100 tasks
-)
\ No newline at end of file
+)
+
+# Run with: celery -A modules.celery.celery_ini beat
+celery_app.conf.beat_schedule = {
+    "contacts-incremental-sync": {
+        "task": "modules.celery.contact_sync_tasks.sync_contacts_task",
+        "schedule": CONFIG.contacts_sync_interval_seconds,
+        "kwargs": {"full": False},
+    },
+    "contacts-full-reconcile": {
+        "task": "modules.celery.contact_sync_tasks.sync_contacts_task",
+        "schedule": CONFIG.contacts_reconcile_interval_seconds,
+        "kwargs": {"full": True},
+    },
+}
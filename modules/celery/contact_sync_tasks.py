@@ -0,0 +1,34 @@
+from typing import Optional
+from core.logger.logger import LOG
+from config import CONFIG
+from modules.celery.celery_ini import celery_app
+from modules.crud_ops.hubspot_client import HubSpotError
+from modules.crud_ops.contacts.contact_sync import run_sync
+from modules.crud_ops.contacts.contact_events import apply_pending_events
+from modules.database.redis.redis_client import get_user_namespace
+
+
+@celery_app.task(bind=True, max_retries=3)
+def sync_contacts_task(self, user_ns: Optional[str] = None, full: bool = False):
+    """
+    Incremental (lastmodifieddate window) or full sync of the local contact
+    mirror. Beat runs both on a schedule; reads and writes queue extra runs.
+    """
+    if not CONFIG.contacts_mirror_enabled:
+        return {"mode": "disabled"}
+    try:
+        user_ns = user_ns or get_user_namespace()
+        return run_sync(user_ns, full=full)
+    except HubSpotError as e:
+        LOG.error(f"Contact sync failed: {e}")
+        raise self.retry(exc=e, countdown=30)
+
+
+@celery_app.task(bind=True, max_retries=5)
+def apply_contact_events_task(self, user_ns: str):
+    """Apply the HubSpot webhook events queued for a namespace as one batch"""
+    try:
+        return apply_pending_events(user_ns)
+    except HubSpotError as e:
+        LOG.error(f"Applying contact webhook events failed: {e}")
+        raise self.retry(exc=e, countdown=30)
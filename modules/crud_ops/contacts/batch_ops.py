@@ -0,0 +1,172 @@
+from typing import Dict, List, Optional
+from core.logger.logger import LOG
+from modules.crud_ops.hubspot_client import HUBSPOT_CLIENT, HubSpotError
+from modules.crud_ops.contacts.schema import ContactProperties, UpdateContactArgs
+
+# HubSpot accepts at most 100 inputs per /crm/v3/objects/contacts/batch/* call
+BATCH_LIMIT = 100
+BATCH_OPERATIONS = ("create", "update", "read", "archive")
+DEFAULT_READ_PROPERTIES = ["email", "firstname", "lastname", "phone", "company"]
+
+
+def chunked(items: list, size: int = BATCH_LIMIT) -> List[list]:
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def create_inputs(contacts: List[ContactProperties]) -> List[dict]:
+    return [{"properties": contact.dict(exclude_unset=True)} for contact in contacts]
+
+
+def update_inputs(contacts: List[UpdateContactArgs]) -> List[dict]:
+    inputs = []
+    for contact in contacts:
+        properties = contact.dict(exclude_unset=True)
+        contact_id = properties.pop("contact_id")
+        inputs.append({"id": str(contact_id), "properties": properties})
+    return inputs
+
+
+def id_inputs(contact_ids: List[str]) -> List[dict]:
+    return [{"id": str(contact_id)} for contact_id in contact_ids]
+
+
+def _item_key(operation: str, item: dict, id_property: Optional[str]) -> str:
+    """What HubSpot echoes back for an input: its email on create, its id (or idProperty value) otherwise"""
+    if operation == "create":
+        return (item.get("properties", {}).get("email") or "").lower()
+    return str(item["id"]).lower()
+
+
+def _result_key(operation: str, result: dict, id_property: Optional[str]) -> str:
+    properties = result.get("properties", {})
+    if operation == "create":
+        return (properties.get("email") or "").lower()
+    if id_property:
+        return str(properties.get(id_property) or "").lower()
+    return str(result.get("id")).lower()
+
+
+def _error_keys(error: dict) -> List[str]:
+    context = error.get("context") or {}
+    keys = []
+    for values in context.values():
+        keys.extend(str(value).lower() for value in values or [])
+    return keys
+
+
+def _chunk_report(operation: str, inputs: List[dict], offset: int, status_code: int, body: Optional[dict],
+                  text: str, id_property: Optional[str]) -> List[dict]:
+    """One entry per input of the chunk, in input order"""
+    if status_code not in (200, 201, 204, 207):
+        return [
+            {"index": offset + i, "status": "error", "error": f"HubSpot {status_code}", "details": text}
+            for i in range(len(inputs))
+        ]
+
+    results: Dict[str, dict] = {}
+    errors: Dict[str, str] = {}
+    unmatched_errors = []
+    for result in (body or {}).get("results", []):
+        results[_result_key(operation, result, id_property)] = result
+    for error in (body or {}).get("errors", []):
+        message = error.get("message") or error.get("category") or "error"
+        keys = _error_keys(error)
+        if not keys:
+            unmatched_errors.append(message)
+        for key in keys:
+            errors[key] = message
+
+    report = []
+    for i, item in enumerate(inputs):
+        key = _item_key(operation, item, id_property)
+        entry = {"index": offset + i}
+        if key in errors:
+            entry.update(status="error", error=errors[key], input=item.get("id") or item.get("properties"))
+        elif operation == "archive":
+            entry.update(status="success", id=item["id"])
+        elif key in results:
+            result = results[key]
+            entry.update(status="success", id=result.get("id"))
+            if operation == "read":
+                entry["properties"] = result.get("properties", {})
+            else:
+                entry["email"] = result.get("properties", {}).get("email")
+        elif status_code in (200, 201) and operation == "create" and not key:
+            # No email to match on; HubSpot reports the chunk as complete
+            entry.update(status="success")
+        else:
+            entry.update(
+                status="error",
+                error="; ".join(unmatched_errors) or "not found in HubSpot response",
+                input=item.get("id") or item.get("properties")
+            )
+        report.append(entry)
+    return report
+
+
+def _summary(operation: str, report: List[dict]) -> dict:
+    succeeded = sum(1 for entry in report if entry["status"] == "success")
+    return {
+        "operation": operation,
+        "total": len(report),
+        "succeeded": succeeded,
+        "failed": len(report) - succeeded,
+        "chunks": len(chunked(report)),
+        "results": report
+    }
+
+
+def _request_body(operation: str, chunk: List[dict], properties: Optional[List[str]], id_property: Optional[str]) -> dict:
+    body = {"inputs": chunk}
+    if operation == "read":
+        body["properties"] = properties or DEFAULT_READ_PROPERTIES
+        if id_property:
+            body["idProperty"] = id_property
+            # Results are matched to inputs by this property, so it must come back
+            body["properties"] = list(dict.fromkeys([*body["properties"], id_property]))
+    return body
+
+
+def run_batch(operation: str, inputs: List[dict], properties: Optional[List[str]] = None,
+              id_property: Optional[str] = None) -> dict:
+    """
+    Send `inputs` to /crm/v3/objects/contacts/batch/{operation} in chunks of
+    BATCH_LIMIT and return a per-item report. A failed chunk marks only its
+    own items as failed; the remaining chunks still run.
+    """
+    report = []
+    for number, chunk in enumerate(chunked(inputs)):
+        offset = number * BATCH_LIMIT
+        try:
+            res = HUBSPOT_CLIENT.request(
+                "POST", f"/crm/v3/objects/contacts/batch/{operation}",
+                json=_request_body(operation, chunk, properties, id_property)
+            )
+            body = res.json() if res.status_code in (200, 201, 207) else None
+            report.extend(_chunk_report(operation, chunk, offset, res.status_code, body, res.text, id_property))
+        except HubSpotError as e:
+            report.extend(_chunk_report(operation, chunk, offset, e.status_code or 401, None, e.details, id_property))
+    LOG.info(f"Batch {operation}: {len(inputs)} inputs in {len(chunked(inputs))} chunks")
+    return _summary(operation, report)
+
+
+async def arun_batch(operation: str, inputs: List[dict], properties: Optional[List[str]] = None,
+                     id_property: Optional[str] = None) -> dict:
+    report = []
+    for number, chunk in enumerate(chunked(inputs)):
+        offset = number * BATCH_LIMIT
+        try:
+            res = await HUBSPOT_CLIENT.arequest(
+                "POST", f"/crm/v3/objects/contacts/batch/{operation}",
+                json=_request_body(operation, chunk, properties, id_property)
+            )
+            body = res.json() if res.status_code in (200, 201, 207) else None
+            report.extend(_chunk_report(operation, chunk, offset, res.status_code, body, res.text, id_property))
+        except HubSpotError as e:
+            report.extend(_chunk_report(operation, chunk, offset, e.status_code or 401, None, e.details, id_property))
+    LOG.info(f"Batch {operation}: {len(inputs)} inputs in {len(chunked(inputs))} chunks")
+    return _summary(operation, report)
+
+
+def succeeded_ids(summary: dict) -> List[str]:
+    return [entry["id"] for entry in summary["results"] if entry["status"] == "success" and entry.get("id")]
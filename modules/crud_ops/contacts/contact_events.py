@@ -0,0 +1,161 @@
+import json
+from typing import Dict, List, Tuple
+from config import CONFIG
+from core.logger.logger import LOG
+from modules.crud_ops.hubspot_client import HubSpotError
+from modules.crud_ops.contacts.batch_ops import run_batch, id_inputs
+from modules.crud_ops.contacts.contact_sync import (
+    MIRROR_PROPERTIES, write_through_upsert, write_through_remove, unindex_contacts
+)
+from modules.crud_ops.rate_limiter import rate_limit_priority
+from modules.database.redis.redis_client import redis_client
+from modules.database.redis.contact_cache import invalidate_contact_cache
+from modules.ai_agent.response_cache import invalidate_response_cache
+
+# HubSpot contact webhooks, applied in batches.
+#
+#   hubspot_webhook:{ns}:pending     list of JSON events waiting to be applied
+#   hubspot_webhook:{ns}:scheduled   set while an apply task is queued (NX)
+#   hubspot_webhook:event:{eventId}  seen marker, so HubSpot's redeliveries are dropped
+#
+# /webhooks/hubspot only verifies, dedupes and queues; the first event of a
+# burst schedules apply_contact_events_task CONFIG.hubspot_webhook_batch_seconds
+# later, and everything that arrived by then is applied together: one batch
+# read per 100 created/changed contacts, one mirror/index update, one cache
+# generation bump. The mirror write-through of the batch bumps the shared index
+# version (contact_sync.py), so the indexes of every API worker are rebuilt,
+# not just those of the Celery worker that applied it.
+UPSERT_EVENTS = ("contact.creation", "contact.propertyChange", "contact.restore")
+REMOVE_EVENTS = ("contact.deletion", "contact.privacyDeletion")
+MERGE_EVENT = "contact.merge"
+_SEEN_SECONDS = 86400
+
+
+def _pending_key(user_ns: str) -> str:
+    return f"hubspot_webhook:{user_ns}:pending"
+
+
+def _scheduled_key(user_ns: str) -> str:
+    return f"hubspot_webhook:{user_ns}:scheduled"
+
+
+def _seen_key(event_id) -> str:
+    return f"hubspot_webhook:event:{event_id}"
+
+
+def is_contact_event(event: dict) -> bool:
+    return event.get("subscriptionType") in UPSERT_EVENTS + REMOVE_EVENTS + (MERGE_EVENT,)
+
+
+def coalesce_events(events: List[dict]) -> Tuple[List[str], List[str]]:
+    """(ids to refetch, ids to drop); the latest event per contact wins"""
+    actions: Dict[str, str] = {}
+    for event in sorted(events, key=lambda e: e.get("occurredAt") or 0):
+        kind = event.get("subscriptionType")
+        if kind == MERGE_EVENT:
+            primary = str(event.get("primaryObjectId") or event.get("newObjectId") or event.get("objectId"))
+            for merged in event.get("mergedObjectIds") or []:
+                if str(merged) != primary:
+                    actions[str(merged)] = "remove"
+            actions[primary] = "upsert"
+        elif kind in UPSERT_EVENTS:
+            actions[str(event["objectId"])] = "upsert"
+        elif kind in REMOVE_EVENTS:
+            actions[str(event["objectId"])] = "remove"
+    upserts = [contact_id for contact_id, action in actions.items() if action == "upsert"]
+    removals = [contact_id for contact_id, action in actions.items() if action == "remove"]
+    return upserts, removals
+
+
+def enqueue_events(user_ns: str, events: List[dict]) -> int:
+    """Queue unseen contact events and schedule their batch; returns how many were queued"""
+    events = [event for event in events if is_contact_event(event)]
+    if not events:
+        return 0
+    # Events without an eventId cannot be recognised when redelivered, so they always go through
+    fresh = [event for event in events if event.get("eventId") is None]
+    identified = [event for event in events if event.get("eventId") is not None]
+    if identified:
+        pipe = redis_client.pipeline(transaction=False)
+        for event in identified:
+            pipe.set(_seen_key(event["eventId"]), "1", nx=True, ex=_SEEN_SECONDS)
+        fresh += [event for event, is_new in zip(identified, pipe.execute()) if is_new]
+    if not fresh:
+        return 0
+
+    # This process's indexes must not answer from the old values while the batch waits;
+    # applying the batch bumps the shared index version again, so every process rebuilds
+    upserts, removals = coalesce_events(fresh)
+    unindex_contacts(user_ns, upserts + removals)
+
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.rpush(_pending_key(user_ns), *[json.dumps(event) for event in fresh])
+    pipe.set(_scheduled_key(user_ns), "1", nx=True, ex=CONFIG.hubspot_webhook_batch_seconds + 60)
+    _, schedule = pipe.execute()
+    if schedule:
+        try:
+            from modules.celery.contact_sync_tasks import apply_contact_events_task
+            apply_contact_events_task.apply_async(
+                kwargs={"user_ns": user_ns}, countdown=CONFIG.hubspot_webhook_batch_seconds
+            )
+        except Exception as e:
+            redis_client.delete(_scheduled_key(user_ns))
+            LOG.error(f"Failed to queue contact webhook batch: {e}")
+    return len(fresh)
+
+
+def _take_pending(user_ns: str) -> List[dict]:
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.lrange(_pending_key(user_ns), 0, -1)
+    pipe.delete(_pending_key(user_ns), _scheduled_key(user_ns))
+    raw, _ = pipe.execute()
+    return [json.loads(item) for item in raw]
+
+
+def _requeue(user_ns: str, events: List[dict]):
+    redis_client.rpush(_pending_key(user_ns), *[json.dumps(event) for event in events])
+
+
+def _fetch_contacts(contact_ids: List[str]) -> Tuple[List[dict], List[str]]:
+    """(contacts as HubSpot returns them, ids HubSpot no longer has)"""
+    fetched, missing = [], []
+    if not contact_ids:
+        return fetched, missing
+    with rate_limit_priority("background"):
+        summary = run_batch("read", id_inputs(contact_ids), properties=MIRROR_PROPERTIES)
+    for entry in summary["results"]:
+        if entry["status"] == "success":
+            fetched.append({"id": entry["id"], "properties": entry.get("properties", {})})
+        elif "details" in entry:
+            # The whole chunk failed, not just this contact
+            raise HubSpotError(entry["error"], entry["details"])
+        else:
+            missing.append(str(entry["input"]))
+    return fetched, missing
+
+
+def apply_pending_events(user_ns: str) -> dict:
+    """
+    Apply every queued event of the namespace to the mirror, the local indexes
+    and the caches. On a HubSpot failure the events go back on the queue and
+    the HubSpotError propagates, so the Celery task retries.
+    """
+    events = _take_pending(user_ns)
+    if not events:
+        return {"events": 0}
+    upserts, removals = coalesce_events(events)
+    try:
+        fetched, missing = _fetch_contacts(upserts)
+    except HubSpotError:
+        _requeue(user_ns, events)
+        raise
+
+    if fetched:
+        write_through_upsert(user_ns, fetched)
+    if removals or missing:
+        write_through_remove(user_ns, removals + missing)
+    invalidate_contact_cache(user_ns)
+    invalidate_response_cache(user_ns)
+    removed = len(removals) + len(missing)
+    LOG.info(f"Applied {len(events)} contact webhook events for {user_ns}: {len(fetched)} refreshed, {removed} removed")
+    return {"events": len(events), "refreshed": len(fetched), "removed": removed}
@@ -0,0 +1,229 @@
+import json
+import base64
+from collections import Counter
+from typing import List, Optional
+from config import CONFIG
+from modules.crud_ops.contacts.schema import ContactFilter, QueryContactsArgs, GetContactsArgs
+from modules.crud_ops.contacts.batch_ops import DEFAULT_READ_PROPERTIES
+
+# Filters, projections, counts and group-bys evaluated locally over the cached
+# contact set, so the agent gets "42 contacts at Acme" instead of the whole
+# list in its context. Property values are compared case-insensitively;
+# gt/gte/lt/lte compare numerically when both sides are numbers and as
+# strings otherwise (ISO dates order correctly either way). Only properties
+# every contact cache holds can be queried; any other name is an error rather
+# than a silent "no matches".
+#
+# page_contacts serves the get_contacts tool the same table one page at a
+# time. Its next_after cursor is the sort key of the page's last row (the
+# sort value, then the id), so paging stays in place when contacts are added
+# or removed between calls.
+DEFAULT_QUERY_PROPERTIES = ["email", "firstname", "lastname", "company"]
+# The cache loaded from HubSpot holds DEFAULT_READ_PROPERTIES; the mirror holds a superset
+QUERYABLE_PROPERTIES = ["id"] + DEFAULT_READ_PROPERTIES
+_MISSING = object()
+
+
+def _value(contact: dict, name: str):
+    if name in ("id", "hs_object_id"):
+        return contact.get("id")
+    value = contact.get("properties", {}).get(name)
+    return _MISSING if value in (None, "") else value
+
+
+def _comparable(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value).lower()
+
+
+def _compare(left, right, operator: str) -> bool:
+    left, right = _comparable(left), _comparable(right)
+    if type(left) is not type(right):
+        left, right = str(left), str(right)
+    if operator == "gt":
+        return left > right
+    if operator == "gte":
+        return left >= right
+    if operator == "lt":
+        return left < right
+    return left <= right
+
+
+def matches(contact: dict, condition: ContactFilter) -> bool:
+    value = _value(contact, condition.property)
+    if condition.operator == "exists":
+        return value is not _MISSING
+    if condition.operator == "not_exists":
+        return value is _MISSING
+    if value is _MISSING:
+        return condition.operator in ("neq", "not_contains")
+
+    text = str(value).lower()
+    expected = condition.value
+    if condition.operator == "in":
+        options = expected if isinstance(expected, list) else str(expected or "").split(",")
+        return text in {str(option).strip().lower() for option in options}
+    expected_text = str(expected if expected is not None else "").lower()
+    if condition.operator == "eq":
+        return text == expected_text
+    if condition.operator == "neq":
+        return text != expected_text
+    if condition.operator == "contains":
+        return expected_text in text
+    if condition.operator == "not_contains":
+        return expected_text not in text
+    if condition.operator == "starts_with":
+        return text.startswith(expected_text)
+    return _compare(value, expected, condition.operator)
+
+
+def _group_counts(contacts: List[dict], group_by: str) -> dict:
+    counts = Counter()
+    for contact in contacts:
+        value = _value(contact, group_by)
+        counts["(none)" if value is _MISSING else str(value).strip()] += 1
+    groups = counts.most_common()
+    shown = groups[:CONFIG.query_contacts_max_groups]
+    return {
+        "group_by": group_by,
+        "groups": [{"value": value, "count": count} for value, count in shown],
+        "other_groups": len(groups) - len(shown)
+    }
+
+
+def _fit(result: dict, max_chars: int) -> dict:
+    """Drop trailing rows until the JSON result fits max_chars"""
+    rows = result.get("rows")
+    while rows and len(json.dumps(result)) > max_chars:
+        rows.pop()
+        result["returned"] = len(rows)
+        result["truncated"] = True
+    return result
+
+
+def _columns(properties: Optional[List[str]]) -> List[str]:
+    return ["id"] + [name for name in (properties or DEFAULT_QUERY_PROPERTIES) if name != "id"]
+
+
+def _rows(contacts: List[dict], columns: List[str]) -> List[list]:
+    return [[None if (v := _value(contact, name)) is _MISSING else v for name in columns] for contact in contacts]
+
+
+def _unknown_properties(names: List[Optional[str]]) -> Optional[dict]:
+    unknown = sorted({name for name in names if name and name not in QUERYABLE_PROPERTIES and name != "hs_object_id"})
+    if not unknown:
+        return None
+    return {
+        "error": "Unknown property",
+        "details": f"{', '.join(unknown)} cannot be queried; use one of {', '.join(QUERYABLE_PROPERTIES)}"
+    }
+
+
+def run_query(contacts: List[dict], args: QueryContactsArgs) -> dict:
+    error = _unknown_properties([f.property for f in args.filters] + (args.properties or []) + [args.group_by, args.sort_by])
+    if error:
+        return error
+    matched = [contact for contact in contacts if all(matches(contact, f) for f in args.filters)]
+    result = {"total_matched": len(matched)}
+    if args.count_only:
+        return result
+    if args.group_by:
+        result.update(_group_counts(matched, args.group_by))
+        return _fit(result, CONFIG.query_contacts_max_chars)
+
+    if args.sort_by:
+        present = [c for c in matched if _value(c, args.sort_by) is not _MISSING]
+        missing = [c for c in matched if _value(c, args.sort_by) is _MISSING]
+        # Numbers before strings, so mixed columns never compare float to str
+        present.sort(key=lambda c: (isinstance(v := _comparable(_value(c, args.sort_by)), str), v), reverse=args.descending)
+        matched = present + missing
+
+    columns = _columns(args.properties)
+    limit = max(0, min(args.limit, CONFIG.query_contacts_max_rows))
+    offset = max(args.offset, 0)
+    rows = _rows(matched[offset:offset + limit], columns)
+    result.update({
+        "offset": offset,
+        "returned": len(rows),
+        "columns": columns,
+        "rows": rows
+    })
+    result = _fit(result, CONFIG.query_contacts_max_chars)
+    if offset + result["returned"] < len(matched):
+        result["next_offset"] = offset + result["returned"]
+    return result
+
+
+def _typed(value) -> list:
+    value = _comparable(value)
+    return [isinstance(value, str), value]
+
+
+def _sort_key(contact: dict, sort_by: Optional[str]) -> list:
+    """[missing, sort value, id]: contacts without the sort property go last, ids break ties"""
+    value = _value(contact, sort_by) if sort_by else None
+    if value is _MISSING:
+        return [1, False, 0] + _typed(contact.get("id"))
+    return [0] + (_typed(value) if sort_by else [False, 0]) + _typed(contact.get("id"))
+
+
+def _is_after(key: list, cursor: list, descending: bool) -> bool:
+    if key[0] != cursor[0]:
+        return key[0] > cursor[0]
+    if key[0]:
+        # Contacts without the sort value are always in id order
+        return key[3:] > cursor[3:]
+    return key[1:] < cursor[1:] if descending else key[1:] > cursor[1:]
+
+
+def _encode_cursor(key: list, args: GetContactsArgs) -> str:
+    state = {"sort_by": args.sort_by, "descending": args.descending, "key": key}
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode()
+
+
+def _decode_cursor(after: str, args: GetContactsArgs) -> list:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(after.encode()))
+        key = state["key"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("after is not a get_contacts cursor")
+    if state.get("sort_by") != args.sort_by or bool(state.get("descending")) != args.descending:
+        raise ValueError("after belongs to a listing with a different sort_by/descending")
+    return key
+
+
+def page_contacts(contacts: List[dict], args: GetContactsArgs) -> dict:
+    """One page of the contact list as a table, with the total and the cursor of the next page"""
+    error = _unknown_properties((args.properties or []) + [args.sort_by])
+    if error:
+        return error
+    cursor = None
+    if args.after:
+        try:
+            cursor = _decode_cursor(args.after, args)
+        except ValueError as e:
+            return {"error": "Invalid cursor", "details": f"{e}; pass next_after from the previous page unchanged"}
+
+    keyed = [(_sort_key(contact, args.sort_by), contact) for contact in contacts]
+    present = sorted((item for item in keyed if not item[0][0]), key=lambda item: item[0], reverse=args.descending)
+    missing = sorted((item for item in keyed if item[0][0]), key=lambda item: item[0])
+    ordered = present + missing
+    start = 0
+    if cursor is not None:
+        start = next((i for i, (key, _) in enumerate(ordered) if _is_after(key, cursor, args.descending)), len(ordered))
+
+    columns = _columns(args.properties)
+    limit = max(1, min(args.limit, CONFIG.query_contacts_max_rows))
+    page = ordered[start:start + limit]
+    result = _fit({
+        "total": len(contacts),
+        "returned": len(page),
+        "columns": columns,
+        "rows": _rows([contact for _, contact in page], columns)
+    }, CONFIG.query_contacts_max_chars)
+    returned = result["returned"]
+    if returned and start + returned < len(ordered):
+        result["next_after"] = _encode_cursor(page[returned - 1][0], args)
+    return result
@@ -0,0 +1,424 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from config import CONFIG
+from core.logger.logger import LOG
+from modules.crud_ops.hubspot_client import HUBSPOT_CLIENT, HubSpotError
+from modules.crud_ops.rate_limiter import rate_limit_priority
+from modules.crud_ops.contacts.identifier_index import IDENTIFIER_INDEX
+from modules.crud_ops.contacts.name_index import NAME_INDEX
+from modules.database.mongo_db.mongo_ops import ContactMirrorOperations, AsyncContactMirrorOperations
+from modules.database.redis.redis_client import redis_client, async_redis_client
+
+# Local Mongo mirror of HubSpot contacts.
+#
+# A full reconcile pages through the contacts list, upserts everything and
+# drops what it did not see. Incremental syncs query the search API for
+# lastmodifieddate >= cursor, oldest first; the search API stops at 10,000
+# results per query, so a long backlog is walked in windows that restart at
+# the newest lastmodifieddate seen so far. Contact writes made through this
+# service are written through to the mirror immediately.
+#
+# The identifier and name indexes are per process. Every change that reaches
+# the mirror or the indexes (write-through, webhook batches, syncs) INCRs
+#   contacts_index:{ns}:version
+# and each process rebuilds its indexes once the version differs from the one
+# they were built at, so a write in one worker never leaves another answering
+# from the old values.
+MIRROR_PROPERTIES = ["email", "firstname", "lastname", "phone", "company", "website", "jobtitle", "lastmodifieddate"]
+SEARCH_RESULT_LIMIT = 10000
+PAGE_SIZE = 100
+# Re-read a minute before the cursor so clock skew between HubSpot nodes never drops an update
+_CURSOR_OVERLAP_MS = 60_000
+
+CONTACT_MIRROR = ContactMirrorOperations()
+ASYNC_CONTACT_MIRROR = AsyncContactMirrorOperations()
+# Shared index version the indexes of this process reflect, per namespace
+_indexed_versions: Dict[str, Optional[str]] = {}
+
+
+def _lock_key(user_ns: str) -> str:
+    return f"contacts_sync:{user_ns}:lock"
+
+
+def _requested_key(user_ns: str, full: bool) -> str:
+    # Per mode, so a queued incremental run does not swallow a full reconcile request
+    return f"contacts_sync:{user_ns}:requested:{'full' if full else 'incremental'}"
+
+
+def _full_pending_key(user_ns: str) -> str:
+    """Set when a full reconcile found another sync running; that sync queues it when done"""
+    return f"contacts_sync:{user_ns}:full_pending"
+
+
+def _to_ms(value) -> int:
+    if not value:
+        return 0
+    if str(value).isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp() * 1000)
+
+
+def _modified_ms(contact: dict) -> int:
+    return _to_ms(contact.get("properties", {}).get("lastmodifieddate") or contact.get("updatedAt"))
+
+
+def _search_window(user_ns: str, cursor_ms: int):
+    """Page through one search window; returns (contacts_synced, newest_modified_ms, window_exhausted)"""
+    synced, newest, after = 0, cursor_ms, None
+    while True:
+        body = {
+            "filterGroups": [{"filters": [
+                {"propertyName": "lastmodifieddate", "operator": "GTE", "value": str(cursor_ms)}
+            ]}],
+            "sorts": [{"propertyName": "lastmodifieddate", "direction": "ASCENDING"}],
+            "properties": MIRROR_PROPERTIES,
+            "limit": PAGE_SIZE
+        }
+        if after:
+            body["after"] = after
+        res = HUBSPOT_CLIENT.request("POST", "/crm/v3/objects/contacts/search", json=body)
+        if res.status_code != 200:
+            raise HubSpotError(res.status_code, res.text)
+        data = res.json()
+        results = data.get("results", [])
+        CONTACT_MIRROR.upsert_contacts(user_ns, results)
+        synced += len(results)
+        newest = max([newest] + [_modified_ms(contact) for contact in results])
+
+        after = data.get("paging", {}).get("next", {}).get("after")
+        if not after:
+            return synced, newest, True
+        if int(after) + PAGE_SIZE > SEARCH_RESULT_LIMIT:
+            return synced, newest, False
+
+
+def sync_incremental(user_ns: str) -> dict:
+    state = CONTACT_MIRROR.get_state(user_ns)
+    if not state or not state.get("last_full_sync_at"):
+        LOG.info(f"No contact mirror for {user_ns} yet, running a full reconcile")
+        return reconcile_full(user_ns)
+
+    started = datetime.now(timezone.utc)
+    cursor = max(state.get("modified_cursor_ms", 0) - _CURSOR_OVERLAP_MS, 0)
+    total = 0
+    while True:
+        synced, newest, exhausted = _search_window(user_ns, cursor)
+        total += synced
+        if exhausted or newest <= cursor:
+            if not exhausted:
+                LOG.warning(f"More than {SEARCH_RESULT_LIMIT} contacts share one lastmodifieddate; the next full reconcile will pick up the rest")
+            break
+        cursor = newest
+
+    CONTACT_MIRROR.update_state(
+        user_ns,
+        modified_cursor_ms=max(newest, state.get("modified_cursor_ms", 0)),
+        last_incremental_sync_at=started,
+        contact_count=CONTACT_MIRROR.count(user_ns)
+    )
+    LOG.info(f"Incremental contact sync for {user_ns}: {total} contacts changed")
+    return {"mode": "incremental", "synced": total}
+
+
+def reconcile_full(user_ns: str) -> dict:
+    started = datetime.now(timezone.utc)
+    total, newest = 0, 0
+    params = {"properties": ",".join(MIRROR_PROPERTIES), "archived": "false", "limit": PAGE_SIZE}
+    for results in HUBSPOT_CLIENT.iter_pages("/crm/v3/objects/contacts", params=params):
+        CONTACT_MIRROR.upsert_contacts(user_ns, results, synced_at=started)
+        total += len(results)
+        newest = max([newest] + [_modified_ms(contact) for contact in results])
+
+    removed = CONTACT_MIRROR.remove_not_synced_since(user_ns, started)
+    CONTACT_MIRROR.update_state(
+        user_ns,
+        modified_cursor_ms=newest,
+        last_full_sync_at=started,
+        last_incremental_sync_at=started,
+        contact_count=total
+    )
+    LOG.info(f"Full contact reconcile for {user_ns}: {total} contacts, {removed} removed")
+    return {"mode": "full", "synced": total, "removed": removed}
+
+
+def run_sync(user_ns: str, full: bool = False) -> dict:
+    """Entry point for the Celery tasks; one sync per namespace at a time"""
+    if not redis_client.set(_lock_key(user_ns), "1", nx=True, ex=CONFIG.contacts_sync_lock_seconds):
+        if full:
+            redis_client.set(_full_pending_key(user_ns), "1", ex=CONFIG.contacts_sync_lock_seconds)
+            redis_client.delete(_requested_key(user_ns, True))
+            LOG.info(f"Contact sync for {user_ns} already running, full reconcile deferred until it ends")
+            return {"mode": "deferred"}
+        LOG.info(f"Contact sync for {user_ns} already running, skipping")
+        return {"mode": "skipped"}
+    try:
+        CONTACT_MIRROR.ensure_indexes()
+        # Leaves the reserved share of the HubSpot budget to chat and REST calls
+        with rate_limit_priority("background"):
+            result = reconcile_full(user_ns) if full else sync_incremental(user_ns)
+        bump_index_version(user_ns)
+        return result
+    finally:
+        redis_client.delete(_lock_key(user_ns), _requested_key(user_ns, full))
+        if redis_client.delete(_full_pending_key(user_ns)) and not full:
+            request_sync(user_ns, full=True)
+
+
+def request_sync(user_ns: str, full: bool = False):
+    """Queue a sync unless one of the same mode was already queued for this namespace"""
+    if not CONFIG.contacts_mirror_enabled:
+        return
+    try:
+        if redis_client.set(_requested_key(user_ns, full), "1", nx=True, ex=CONFIG.contacts_sync_lock_seconds):
+            from modules.celery.contact_sync_tasks import sync_contacts_task
+            sync_contacts_task.delay(user_ns=user_ns, full=full)
+    except Exception as e:
+        LOG.error(f"Failed to queue contact sync: {e}")
+
+
+# ---------- Reads, local indexes and write-through ----------
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def mirror_status(state: dict) -> dict:
+    """Staleness indicator returned next to every mirrored read"""
+    synced_at = max(
+        _as_utc(state[field]) for field in ("last_full_sync_at", "last_incremental_sync_at") if state.get(field)
+    )
+    age = (datetime.now(timezone.utc) - synced_at).total_seconds()
+    return {
+        "source": "mirror",
+        "last_synced_at": synced_at.isoformat(),
+        "age_seconds": int(age),
+        "stale": age > CONFIG.contacts_mirror_max_age_seconds
+    }
+
+
+def read_mirrored_contacts(user_ns: str) -> Optional[dict]:
+    """{"results", "mirror"} from the local mirror, or None when it has not been built yet"""
+    if not CONFIG.contacts_mirror_enabled:
+        return None
+    try:
+        state = CONTACT_MIRROR.get_state(user_ns)
+        if not state or not state.get("last_full_sync_at"):
+            request_sync(user_ns, full=True)
+            return None
+        status = mirror_status(state)
+        if status["stale"]:
+            request_sync(user_ns)
+        version = index_version(user_ns)
+        results = CONTACT_MIRROR.read_contacts(user_ns)
+        refresh_contact_indexes(user_ns, results, version)
+        return {"results": results, "mirror": status}
+    except Exception as e:
+        LOG.error(f"Contact mirror read failed: {e}")
+        return None
+
+
+async def amirror_status(user_ns: str) -> Optional[dict]:
+    """mirror_status of a built mirror (queueing a sync if stale), or None with a full sync queued"""
+    if not CONFIG.contacts_mirror_enabled:
+        return None
+    state = await ASYNC_CONTACT_MIRROR.get_state(user_ns)
+    if not state or not state.get("last_full_sync_at"):
+        await asyncio.to_thread(request_sync, user_ns, True)
+        return None
+    status = mirror_status(state)
+    if status["stale"]:
+        await asyncio.to_thread(request_sync, user_ns)
+    return status
+
+
+async def aread_mirrored_contacts(user_ns: str, properties: Optional[List[str]] = None) -> Optional[dict]:
+    """Like read_mirrored_contacts; with `properties`, only those are returned and the indexes are left alone"""
+    try:
+        status = await amirror_status(user_ns)
+        if not status:
+            return None
+        version = await aindex_version(user_ns)
+        results = await ASYNC_CONTACT_MIRROR.read_contacts(user_ns, properties)
+        if not properties:
+            await arefresh_contact_indexes(user_ns, results, version)
+        return {"results": results, "mirror": status}
+    except Exception as e:
+        LOG.error(f"Contact mirror read failed: {e}")
+        return None
+
+
+def _index_version_key(user_ns: str) -> str:
+    return f"contacts_index:{user_ns}:version"
+
+
+def index_version(user_ns: str) -> Optional[str]:
+    """Current shared index version; read it before the contacts an index is built from. None if Redis is down"""
+    try:
+        return redis_client.get(_index_version_key(user_ns)) or "0"
+    except Exception as e:
+        LOG.error(f"Contact index version read failed: {e}")
+        return None
+
+
+async def aindex_version(user_ns: str) -> Optional[str]:
+    try:
+        return await async_redis_client.get(_index_version_key(user_ns)) or "0"
+    except Exception as e:
+        LOG.error(f"Contact index version read failed: {e}")
+        return None
+
+
+def _bumped(user_ns: str, version: int):
+    # This process applied the change itself; its indexes stay current unless another change came in between
+    if _indexed_versions.get(user_ns) == str(version - 1):
+        _indexed_versions[user_ns] = str(version)
+
+
+def bump_index_version(user_ns: str):
+    """Mark the indexes of every process stale after a contact change"""
+    try:
+        _bumped(user_ns, redis_client.incr(_index_version_key(user_ns)))
+    except Exception as e:
+        LOG.error(f"Contact index version bump failed: {e}")
+
+
+async def abump_index_version(user_ns: str):
+    try:
+        _bumped(user_ns, await async_redis_client.incr(_index_version_key(user_ns)))
+    except Exception as e:
+        LOG.error(f"Contact index version bump failed: {e}")
+
+
+def build_contact_indexes(user_ns: str, contacts: List[dict], version: Optional[str]):
+    """Rebuild the in-process identifier and name indexes from a full contact list read at `version`"""
+    IDENTIFIER_INDEX.build(user_ns, contacts)
+    NAME_INDEX.build(user_ns, contacts)
+    _indexed_versions[user_ns] = version
+
+
+def _clear_contact_indexes(user_ns: str, version: Optional[str]):
+    IDENTIFIER_INDEX.clear(user_ns)
+    NAME_INDEX.clear(user_ns)
+    _indexed_versions[user_ns] = version
+
+
+def index_contacts(user_ns: str, contacts: List[dict]):
+    IDENTIFIER_INDEX.upsert(user_ns, contacts)
+    NAME_INDEX.upsert(user_ns, contacts)
+
+
+def unindex_contacts(user_ns: str, contact_ids: List[str]):
+    """Drop changed contacts from the indexes of this process and mark the others stale"""
+    IDENTIFIER_INDEX.remove(user_ns, contact_ids)
+    NAME_INDEX.remove(user_ns, contact_ids)
+    bump_index_version(user_ns)
+
+
+async def aunindex_contacts(user_ns: str, contact_ids: List[str]):
+    IDENTIFIER_INDEX.remove(user_ns, contact_ids)
+    NAME_INDEX.remove(user_ns, contact_ids)
+    await abump_index_version(user_ns)
+
+
+def _indexes_fresh(user_ns: str, version: Optional[str]) -> bool:
+    """Within their max age and built at `version` (age only when Redis is down)"""
+    return (
+        IDENTIFIER_INDEX.is_fresh(user_ns) and NAME_INDEX.is_fresh(user_ns)
+        and (version is None or _indexed_versions.get(user_ns) == version)
+    )
+
+
+def refresh_contact_indexes(user_ns: str, contacts: List[dict], version: Optional[str]):
+    """Rebuild the indexes from a full contact list read at `version`, unless they are still fresh"""
+    if not _indexes_fresh(user_ns, version):
+        build_contact_indexes(user_ns, contacts, version)
+
+
+async def arefresh_contact_indexes(user_ns: str, contacts: List[dict], version: Optional[str]):
+    if not _indexes_fresh(user_ns, version):
+        await asyncio.to_thread(build_contact_indexes, user_ns, contacts, version)
+
+
+def _drop_outdated(user_ns: str, version: Optional[str]):
+    """Without a mirror to rebuild from, indexes from before another process's change must not answer"""
+    if version is not None and _indexed_versions.get(user_ns) != version:
+        _clear_contact_indexes(user_ns, version)
+
+
+def ensure_contact_indexes(user_ns: str):
+    """(Re)build the local indexes from the mirror once they are past their max age or contacts changed anywhere"""
+    version = index_version(user_ns)
+    if _indexes_fresh(user_ns, version):
+        return
+    if CONFIG.contacts_mirror_enabled:
+        try:
+            state = CONTACT_MIRROR.get_state(user_ns)
+            if state and state.get("last_full_sync_at"):
+                build_contact_indexes(user_ns, CONTACT_MIRROR.read_contacts(user_ns), version)
+                return
+        except Exception as e:
+            LOG.error(f"Contact index build failed: {e}")
+    _drop_outdated(user_ns, version)
+
+
+async def aensure_contact_indexes(user_ns: str):
+    version = await aindex_version(user_ns)
+    if _indexes_fresh(user_ns, version):
+        return
+    if CONFIG.contacts_mirror_enabled:
+        try:
+            state = await ASYNC_CONTACT_MIRROR.get_state(user_ns)
+            if state and state.get("last_full_sync_at"):
+                contacts = await ASYNC_CONTACT_MIRROR.read_contacts(user_ns)
+                await asyncio.to_thread(build_contact_indexes, user_ns, contacts, version)
+                return
+        except Exception as e:
+            LOG.error(f"Contact index build failed: {e}")
+    _drop_outdated(user_ns, version)
+
+
+def write_through_upsert(user_ns: str, contacts: List[dict]):
+    """
+    Apply a contact create/update to the local indexes and the mirror, merging
+    the returned properties into what the mirror already holds; the version
+    bump comes last, so other processes rebuild from the updated mirror
+    """
+    index_contacts(user_ns, contacts)
+    if CONFIG.contacts_mirror_enabled:
+        try:
+            CONTACT_MIRROR.upsert_contacts(user_ns, contacts, partial=True)
+        except Exception as e:
+            LOG.error(f"Contact mirror write-through failed: {e}")
+    bump_index_version(user_ns)
+
+
+def write_through_remove(user_ns: str, contact_ids: List[str]):
+    IDENTIFIER_INDEX.remove(user_ns, contact_ids)
+    NAME_INDEX.remove(user_ns, contact_ids)
+    if CONFIG.contacts_mirror_enabled:
+        try:
+            CONTACT_MIRROR.remove_contacts(user_ns, contact_ids)
+        except Exception as e:
+            LOG.error(f"Contact mirror write-through failed: {e}")
+    bump_index_version(user_ns)
+
+
+async def awrite_through_upsert(user_ns: str, contacts: List[dict]):
+    index_contacts(user_ns, contacts)
+    if CONFIG.contacts_mirror_enabled:
+        try:
+            await ASYNC_CONTACT_MIRROR.upsert_contacts(user_ns, contacts, partial=True)
+        except Exception as e:
+            LOG.error(f"Contact mirror write-through failed: {e}")
+    await abump_index_version(user_ns)
+
+
+async def awrite_through_remove(user_ns: str, contact_ids: List[str]):
+    IDENTIFIER_INDEX.remove(user_ns, contact_ids)
+    NAME_INDEX.remove(user_ns, contact_ids)
+    if CONFIG.contacts_mirror_enabled:
+        try:
+            await ASYNC_CONTACT_MIRROR.remove_contacts(user_ns, contact_ids)
+        except Exception as e:
+            LOG.error(f"Contact mirror write-through failed: {e}")
+    await abump_index_version(user_ns)
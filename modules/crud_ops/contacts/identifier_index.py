@@ -0,0 +1,172 @@
+import re
+import time
+import threading
+from typing import Dict, List, Optional, Set
+from config import CONFIG
+from core.logger.logger import LOG
+
+# In-process index from normalized identifiers to contacts, per user namespace.
+#
+#   "email:jane@example.com"  -> contact
+#   "phone:+15550100"         -> contact
+#
+# Built whenever a full contact list is loaded (get_contacts, /allcontacts or the
+# local mirror), rebuilt from a cached list once past its max age, and patched
+# by the write paths of this process. Writes, webhooks and syncs in any process
+# bump a shared version in Redis (contact_sync.py); an index built before the
+# current version is rebuilt from the mirror, or dropped when there is none.
+# A hit answers search_by_identifier without a HubSpot call; a miss still goes
+# to HubSpot, since contacts can be created elsewhere. Entries older than
+# CONFIG.identifier_index_max_age_seconds count as misses, which bounds how
+# long an edit made in HubSpot without a webhook can go unnoticed.
+_NON_DIGIT_RE = re.compile(r"\D")
+_PHONE_PROPERTIES = ("phone", "mobilephone")
+
+
+def normalize_email(value: str) -> Optional[str]:
+    value = (value or "").strip().lower()
+    return value if "@" in value else None
+
+
+def normalize_phone(value: str) -> Optional[str]:
+    """
+    E.164-style "+<country><number>". Numbers written without a "+" or "00"
+    prefix are taken as local to CONFIG.default_phone_country_code, so
+    "+1 555-0100" and "555 0100" give the same key.
+    """
+    value = (value or "").strip()
+    digits = _NON_DIGIT_RE.sub("", value)
+    if len(digits) < 7:
+        return None
+    if value.startswith("+"):
+        return f"+{digits}"
+    if value.startswith("00"):
+        return f"+{digits[2:]}"
+    country = CONFIG.default_phone_country_code
+    if len(digits) > 10 and digits.startswith(country):
+        return f"+{digits}"
+    return f"+{country}{digits}"
+
+
+def identifier_key(query: str) -> Optional[str]:
+    """Index key for a search_by_identifier query, or None if it is neither an email nor a phone number"""
+    if "@" in (query or ""):
+        email = normalize_email(query)
+        return f"email:{email}" if email else None
+    phone = normalize_phone(query)
+    return f"phone:{phone}" if phone else None
+
+
+def contact_keys(contact: dict) -> Set[str]:
+    properties = contact.get("properties", {})
+    keys = set()
+    email = normalize_email(properties.get("email"))
+    if email:
+        keys.add(f"email:{email}")
+    for name in _PHONE_PROPERTIES:
+        phone = normalize_phone(properties.get(name))
+        if phone:
+            keys.add(f"phone:{phone}")
+    return keys
+
+
+class _Namespace:
+    def __init__(self):
+        self.by_key: Dict[str, Set[str]] = {}
+        self.contacts: Dict[str, dict] = {}
+        self.indexed_at: Dict[str, float] = {}
+        self.built_at: Optional[float] = None
+
+
+class IdentifierIndex:
+    def __init__(self):
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, user_ns: str) -> _Namespace:
+        if user_ns not in self._namespaces:
+            self._namespaces[user_ns] = _Namespace()
+        return self._namespaces[user_ns]
+
+    def is_fresh(self, user_ns: str) -> bool:
+        space = self._namespaces.get(user_ns)
+        return bool(
+            space and space.built_at is not None
+            and time.monotonic() - space.built_at < CONFIG.identifier_index_max_age_seconds
+        )
+
+    def _add(self, space: _Namespace, contact: dict, now: float):
+        contact_id = str(contact["id"])
+        space.contacts[contact_id] = contact
+        space.indexed_at[contact_id] = now
+        for key in contact_keys(contact):
+            space.by_key.setdefault(key, set()).add(contact_id)
+
+    def _drop(self, space: _Namespace, contact_id: str) -> Optional[dict]:
+        contact = space.contacts.pop(contact_id, None)
+        space.indexed_at.pop(contact_id, None)
+        if contact:
+            for key in contact_keys(contact):
+                ids = space.by_key.get(key)
+                if ids:
+                    ids.discard(contact_id)
+                    if not ids:
+                        del space.by_key[key]
+        return contact
+
+    def build(self, user_ns: str, contacts: List[dict]):
+        """Replace the namespace with a full contact list"""
+        if not CONFIG.identifier_index_enabled:
+            return
+        space = _Namespace()
+        space.built_at = time.monotonic()
+        for contact in contacts:
+            self._add(space, contact, space.built_at)
+        with self._lock:
+            self._namespaces[user_ns] = space
+        LOG.info(f"Identifier index for {user_ns}: {len(space.contacts)} contacts, {len(space.by_key)} identifiers")
+
+    def upsert(self, user_ns: str, contacts: List[dict]):
+        """
+        Add or refresh contacts. Properties merge over the indexed copy, since
+        HubSpot's PATCH response omits properties the update did not touch.
+        """
+        if not CONFIG.identifier_index_enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            space = self._namespace(user_ns)
+            for contact in contacts:
+                previous = self._drop(space, str(contact["id"])) or {}
+                properties = {**previous.get("properties", {}), **contact.get("properties", {})}
+                self._add(space, {**previous, **contact, "properties": properties}, now)
+
+    def remove(self, user_ns: str, contact_ids: List[str]):
+        with self._lock:
+            space = self._namespaces.get(user_ns)
+            if space:
+                for contact_id in contact_ids:
+                    self._drop(space, str(contact_id))
+
+    def clear(self, user_ns: str):
+        """Forget the namespace; it is not fresh again until the next build"""
+        with self._lock:
+            self._namespaces.pop(user_ns, None)
+
+    def lookup(self, user_ns: str, query: str) -> Optional[List[dict]]:
+        """Contacts matching an email or phone query, or None on a miss"""
+        if not CONFIG.identifier_index_enabled:
+            return None
+        key = identifier_key(query)
+        space = self._namespaces.get(user_ns)
+        if not key or not space:
+            return None
+        oldest = time.monotonic() - CONFIG.identifier_index_max_age_seconds
+        with self._lock:
+            ids = space.by_key.get(key) or ()
+            if not ids or any(space.indexed_at[contact_id] < oldest for contact_id in ids):
+                return None
+            return [space.contacts[contact_id] for contact_id in ids]
+
+
+IDENTIFIER_INDEX = IdentifierIndex()
@@ -0,0 +1,158 @@
+import re
+import heapq
+import time
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Set
+from config import CONFIG
+from core.logger.logger import LOG
+
+# In-process trigram index over contact names and companies, per user namespace.
+#
+# Text is lowercased, accent-folded and split into words; each word is padded
+# pg_trgm style ("  taha ") before taking trigrams, so prefixes weigh more
+# than inner fragments. A posting list maps each trigram to the contacts that
+# contain it; a query only scores contacts sharing at least one trigram.
+#
+# Score per field (first name, last name, full name, company) is the mean of
+#   coverage   shared / query trigrams     ("taha" fully inside "taha mehboob")
+#   similarity shared / union of trigrams  (prefers the closest overall string)
+# and a contact scores its best field. Neither can exceed shared / query
+# trigrams, so candidates are visited by shared count and the scan stops once
+# that bound drops below the worst score already kept.
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(value: str) -> str:
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(c for c in value if not unicodedata.combining(c)).lower()
+    return " ".join(_WORD_RE.findall(value))
+
+
+def trigrams(value: str) -> Set[str]:
+    grams = set()
+    for word in normalize_text(value).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _field_texts(contact: dict) -> Dict[str, str]:
+    properties = contact.get("properties", {})
+    firstname, lastname = properties.get("firstname") or "", properties.get("lastname") or ""
+    return {
+        "firstname": firstname,
+        "lastname": lastname,
+        "name": f"{firstname} {lastname}".strip(),
+        "company": properties.get("company") or ""
+    }
+
+
+class _Namespace:
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+        self.fields: Dict[str, Dict[str, Set[str]]] = {}
+        self.contacts: Dict[str, dict] = {}
+        self.built_at: Optional[float] = None
+
+
+class NameIndex:
+    def __init__(self):
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+
+    def is_fresh(self, user_ns: str) -> bool:
+        space = self._namespaces.get(user_ns)
+        return bool(
+            space and space.built_at is not None
+            and time.monotonic() - space.built_at < CONFIG.identifier_index_max_age_seconds
+        )
+
+    def _add(self, space: _Namespace, contact: dict):
+        contact_id = str(contact["id"])
+        fields = {field: trigrams(text) for field, text in _field_texts(contact).items()}
+        space.contacts[contact_id] = contact
+        space.fields[contact_id] = fields
+        for gram in set().union(*fields.values()):
+            space.postings.setdefault(gram, set()).add(contact_id)
+
+    def _drop(self, space: _Namespace, contact_id: str) -> Optional[dict]:
+        contact = space.contacts.pop(contact_id, None)
+        for gram in set().union(*space.fields.pop(contact_id, {}).values()):
+            ids = space.postings.get(gram)
+            if ids:
+                ids.discard(contact_id)
+                if not ids:
+                    del space.postings[gram]
+        return contact
+
+    def build(self, user_ns: str, contacts: List[dict]):
+        """Replace the namespace with a full contact list"""
+        space = _Namespace()
+        for contact in contacts:
+            self._add(space, contact)
+        space.built_at = time.monotonic()
+        with self._lock:
+            self._namespaces[user_ns] = space
+        LOG.info(f"Name index for {user_ns}: {len(space.contacts)} contacts, {len(space.postings)} trigrams")
+
+    def upsert(self, user_ns: str, contacts: List[dict]):
+        """Add or refresh contacts; properties merge over the indexed copy like IdentifierIndex.upsert"""
+        with self._lock:
+            space = self._namespaces.setdefault(user_ns, _Namespace())
+            for contact in contacts:
+                previous = self._drop(space, str(contact["id"])) or {}
+                properties = {**previous.get("properties", {}), **contact.get("properties", {})}
+                self._add(space, {**previous, **contact, "properties": properties})
+
+    def remove(self, user_ns: str, contact_ids: List[str]):
+        with self._lock:
+            space = self._namespaces.get(user_ns)
+            if space:
+                for contact_id in contact_ids:
+                    self._drop(space, str(contact_id))
+
+    def clear(self, user_ns: str):
+        """Forget the namespace; it is not fresh again until the next build"""
+        with self._lock:
+            self._namespaces.pop(user_ns, None)
+
+    def search(self, user_ns: str, query: str, limit: int = 10, min_score: float = None) -> List[dict]:
+        """Best matches first, as {"id", "score", "properties"}"""
+        min_score = CONFIG.name_search_min_score if min_score is None else min_score
+        limit = max(limit, 1)
+        query_grams = trigrams(query)
+        space = self._namespaces.get(user_ns)
+        if not query_grams or not space:
+            return []
+        with self._lock:
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(space.postings.get(gram, ()))
+            top = []  # min-heap of (score, contact_id), at most `limit` long
+            for contact_id, count in shared.most_common():
+                bound = count / len(query_grams)
+                if bound < min_score or (len(top) == limit and bound <= top[0][0]):
+                    break
+                best = 0.0
+                for field_grams in space.fields[contact_id].values():
+                    common = len(query_grams & field_grams)
+                    if common:
+                        coverage = common / len(query_grams)
+                        similarity = common / len(query_grams | field_grams)
+                        best = max(best, (coverage + similarity) / 2)
+                if best < min_score:
+                    continue
+                if len(top) < limit:
+                    heapq.heappush(top, (best, contact_id))
+                elif best > top[0][0]:
+                    heapq.heapreplace(top, (best, contact_id))
+            ranked = sorted(top, key=lambda item: (-item[0], item[1]))
+            return [
+                {"id": contact_id, "score": round(score, 3), "properties": space.contacts[contact_id].get("properties", {})}
+                for score, contact_id in ranked
+            ]
+
+
+NAME_INDEX = NameIndex()
@@ -1,117 +1,208 @@
-from fastapi import APIRouter #type: ignore
-from modules.crud_ops.contacts.schema import ContactProperties,Search_by_query
-import requests
-from typing import Dict,Any
-from modules.auth.token_manager import refresh_access_token,get_valid_access_token
+import json
+import asyncio
+from fastapi import APIRouter, Header, Response #type: ignore
+from fastapi.responses import JSONResponse, StreamingResponse #type: ignore
+from modules.crud_ops.contacts.schema import (
+    ContactProperties,Search_by_query,
+    BatchCreateContactsArgs,BatchUpdateContactsArgs,BatchReadContactsArgs,BatchArchiveContactsArgs
+)
+from modules.crud_ops.contacts.batch_ops import (
+    arun_batch, create_inputs, update_inputs, id_inputs, succeeded_ids, DEFAULT_READ_PROPERTIES
+)
+from modules.crud_ops.contacts.contact_sync import (
+    aread_mirrored_contacts, amirror_status, aensure_contact_indexes, awrite_through_upsert, awrite_through_remove, request_sync,
+    build_contact_indexes, arefresh_contact_indexes, index_contacts, aunindex_contacts, aindex_version, ASYNC_CONTACT_MIRROR
+)
+from typing import Dict,Any,Optional
+from modules.crud_ops.contacts.identifier_index import IDENTIFIER_INDEX
+from modules.crud_ops.hubspot_client import HUBSPOT_CLIENT, HubSpotError
+from modules.crud_ops.idempotency import arun_idempotent, rest_key, payload_hash
 from core.logger.logger import LOG
+from modules.database.redis.redis_client import get_user_namespace
+from modules.database.redis.contact_cache import acached_load, ainvalidate_contact_cache
+from modules.ai_agent.response_cache import ainvalidate_response_cache
 
 contacts_router = APIRouter()
 
 
-@contacts_router.get("/allcontacts")
-async def get_contacts():
-    access_token = get_valid_access_token()
-    if not access_token:
-        return {"error": "No valid token available. Please authorize first at /"}
+async def _invalidate_caches(upserted: list = None, removed: list = None, resync: bool = False):
+    """Drop cached answers and keep the local contact mirror in step with a write"""
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    if upserted:
+        await awrite_through_upsert(user_ns, upserted)
+    if removed:
+        await awrite_through_remove(user_ns, removed)
+    if resync:
+        await asyncio.to_thread(request_sync, user_ns)
+    await ainvalidate_contact_cache(user_ns)
+    await ainvalidate_response_cache(user_ns)
 
-    url = "https://api.hubapi.com/crm/v3/objects/contacts"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    params = {
-        "properties": "email,firstname,lastname,phone,company",
-        "archived": "false",
-        "limit": 100
+
+async def _once(idempotency_key: Optional[str], response: Response, route: str, payload, write):
+    """
+    Run a write once per Idempotency-Key header: repeats within
+    CONFIG.idempotency_ttl_seconds get the stored result, marked with an
+    Idempotent-Replayed header. Without the header the write just runs.
+    """
+    if not idempotency_key:
+        return await write()
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    fingerprint = payload_hash({"route": route, "payload": payload})
+    result, replayed = await arun_idempotent(user_ns, rest_key(idempotency_key), fingerprint, write)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+def _property_list(properties: Optional[str]) -> Optional[list]:
+    names = [name.strip() for name in (properties or "").split(",") if name.strip()]
+    return names or None
+
+
+async def _ndjson_lines(pages):
+    """One contact per line, flushed page by page; a HubSpot failure mid-export becomes a final error line"""
+    try:
+        async for page in pages:
+            yield "".join(json.dumps(contact) + "\n" for contact in page)
+    except HubSpotError as e:
+        LOG.error(f"Contact export stopped: {e}")
+        yield json.dumps(e.as_dict()) + "\n"
+
+
+def _mirror_headers(status: dict) -> dict:
+    """The mirror's staleness, sent as headers so the body keeps HubSpot's shape"""
+    return {
+        "X-Contacts-Source": "mirror",
+        "X-Mirror-Last-Synced-At": status["last_synced_at"],
+        "X-Mirror-Stale": str(status["stale"]).lower()
     }
 
-    all_results = []
 
-    res = requests.get(url, headers=headers, params=params)
+async def _stream_contacts(user_ns: str, properties: Optional[list]) -> StreamingResponse:
+    try:
+        status = await amirror_status(user_ns)
+    except Exception as e:
+        LOG.error(f"Contact mirror read failed: {e}")
+        status = None
+    if status:
+        pages = ASYNC_CONTACT_MIRROR.iter_contacts(user_ns, properties)
+        headers = _mirror_headers(status)
+    else:
+        params = {"properties": ",".join(properties or DEFAULT_READ_PROPERTIES), "archived": "false", "limit": 100}
+        pages = HUBSPOT_CLIENT.aiter_pages("/crm/v3/objects/contacts", params=params)
+        headers = {"X-Contacts-Source": "hubspot"}
+    return StreamingResponse(_ndjson_lines(pages), media_type="application/x-ndjson", headers=headers)
 
-    # Handle expired token
-    if res.status_code == 401:
-        LOG.info("Got 401, attempting token refresh...")
-        access_token_data = refresh_access_token()
-        if access_token_data:
-            headers["Authorization"] = f"Bearer {access_token_data['access_token']}"
-            res = requests.get(url, headers=headers, params=params)
-        else:
-            return {"error": "Failed to refresh token"}
 
-    if res.status_code != 200:
-        return {"error": res.status_code, "details": res.text}
+async def _aload_all(user_ns: str, params: dict, full: bool) -> list:
+    version = await aindex_version(user_ns)
+    results = await HUBSPOT_CLIENT.aget_all_pages("/crm/v3/objects/contacts", params=params)
+    if full:
+        await asyncio.to_thread(build_contact_indexes, user_ns, results, version)
+    return results
 
-    data = res.json()
 
-    # Pagination loop
-    while True:
-        all_results.extend(data.get("results", []))
-        try:
-            url = data["paging"]["next"]["link"]  # Full URL from HubSpot
-        except KeyError:
-            break  # No more pages
+@contacts_router.get("/allcontacts")
+async def get_contacts(stream: bool = False, properties: Optional[str] = None):
+    """
+    All contacts as {"results": [...]}. `properties` is a comma-separated list
+    (default email,firstname,lastname,phone,company). With `stream=true` the
+    contacts are sent as NDJSON, one per line, page by page as they are read.
+    """
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    property_list = _property_list(properties)
+    if stream:
+        return await _stream_contacts(user_ns, property_list)
+
+    # Served from the Mongo mirror (with its staleness in X-Mirror-* headers) once it has been built
+    mirrored = await aread_mirrored_contacts(user_ns, property_list)
+    if mirrored:
+        return JSONResponse({"results": mirrored["results"]}, headers=_mirror_headers(mirrored["mirror"]))
 
-        res = requests.get(url, headers=headers)
-        if res.status_code != 200:
-            return {"error": res.status_code, "details": res.text}
+    params = {
+        "properties": ",".join(property_list or DEFAULT_READ_PROPERTIES),
+        "archived": "false",
+        "limit": 100
+    }
 
-        data = res.json()
+    # HubSpot's objects as they come (createdAt, archived and all), cached apart from the agent's
+    # projected list under the same generation and single-flight refresh
+    version = await aindex_version(user_ns)
+    try:
+        all_results = await acached_load(
+            user_ns, "all", lambda: _aload_all(user_ns, params, not property_list), name=f"raw:{params['properties']}"
+        )
+    except HubSpotError as e:
+        return e.as_dict()
 
+    if not property_list:
+        await arefresh_contact_indexes(user_ns, all_results, version)
     return {"results": all_results}
 
 @contacts_router.patch("/{contact_id}")
-def update_contact(contact_id:str,contact:ContactProperties):
-    access_token = get_valid_access_token()
-    if not access_token:
-        return {"error":"No Valid token. Please authenticate at root"}
-    
-    url = f"https://api.hubapi.com/crm/v3/objects/contacts/{contact_id}"
-    headers = {"Authorization":f"Bearer {access_token}","Content-Type": "application/json"}
+async def update_contact(
+        contact_id:str, contact:ContactProperties, response: Response, idempotency_key: Optional[str] = Header(None)
+):
     data = {"properties": contact.dict(exclude_unset=True)}
-    res = requests.patch(url, headers=headers, json=data)
-    
-    if res.status_code == 200:
-        return {"message": "Contact updated", "data": res.json()}
-    return {"error": res.status_code, "details": res.text}
+
+    async def write():
+        try:
+            res = await HUBSPOT_CLIENT.arequest("PATCH", f"/crm/v3/objects/contacts/{contact_id}", json=data)
+        except HubSpotError as e:
+            return e.as_dict()
+
+        if res.status_code == 200:
+            await _invalidate_caches(upserted=[res.json()])
+            return {"message": "Contact updated", "data": res.json()}
+        return {"error": res.status_code, "details": res.text}
+
+    return await _once(idempotency_key, response, f"update:{contact_id}", data, write)
 
 @contacts_router.post("/create_contact")
-async def create_contact(contact:ContactProperties) ->Dict[str,Any]:
+async def create_contact(
+        contact:ContactProperties, response: Response, idempotency_key: Optional[str] = Header(None)
+) ->Dict[str,Any]:
     LOG.info("Into create func")
-    access_token = get_valid_access_token()
-    if not access_token:
-        return {"error":"No valid access token"}
-    
-    url  = "https://api.hubapi.com/crm/v3/objects/contacts"
-    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
     data = {"properties":contact.dict(exclude_unset=True)}
-    res = requests.post(url,json=data,headers=headers)
-    if res.status_code == 201:
-        LOG.info(f"status code of creating contact {res.status_code}")
-        return {"message":"contact_created","data":res.json()}
-    LOG.info({"error":res.status_code,"details":res.text})
-    return {"error":res.status_code,"details":res.text}
+
+    async def write():
+        try:
+            res = await HUBSPOT_CLIENT.arequest("POST", "/crm/v3/objects/contacts", json=data)
+        except HubSpotError as e:
+            return e.as_dict()
+        if res.status_code == 201:
+            LOG.info(f"status code of creating contact {res.status_code}")
+            await _invalidate_caches(upserted=[res.json()])
+            return {"message":"contact_created","data":res.json()}
+        LOG.info({"error":res.status_code,"details":res.text})
+        return {"error":res.status_code,"details":res.text}
+
+    return await _once(idempotency_key, response, "create", data, write)
 
 @contacts_router.delete("/{contact_id}")
-def delete_contact(contact_id:str):
+async def delete_contact(contact_id:str, response: Response, idempotency_key: Optional[str] = Header(None)):
     LOG.info("Into delete contact func")
-    access_token = get_valid_access_token()
-    if not access_token:
-        return {"error":"No Valid token. Please authenticate at root"}
-    url  = f"https://api.hubapi.com/crm/v3/objects/contacts/{contact_id}"
-    headers = {"Authorization":f"Bearer {access_token}","Content-Type":"application/json"}
-    res = requests.delete(url,headers=headers) 
-    if res.status_code == 204:
-        return {"message":"contact deleted"}
-    return {"error": res.status_code, "details": res.text}
+
+    async def write():
+        try:
+            res = await HUBSPOT_CLIENT.arequest("DELETE", f"/crm/v3/objects/contacts/{contact_id}")
+        except HubSpotError as e:
+            return e.as_dict()
+        if res.status_code == 204:
+            await _invalidate_caches(removed=[contact_id])
+            return {"message":"contact deleted"}
+        return {"error": res.status_code, "details": res.text}
+
+    return await _once(idempotency_key, response, f"delete:{contact_id}", None, write)
 
 @contacts_router.post("/search_by_email")
-def search_by_identifier(query:Search_by_query):
+async def search_by_identifier(query:Search_by_query):
     LOG.info(f"Searching for contant email {query}")
-
-    access_token = get_valid_access_token()
-    if not access_token:
-        return {"error":"No valid token available. Please authorize first"}
-    
-    url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
-    headers = {"Authorization":f"Bearer {access_token}","Content-Type":"application/json"}
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    await aensure_contact_indexes(user_ns)
+    indexed = IDENTIFIER_INDEX.lookup(user_ns, query.query)
+    if indexed:
+        return {"message":"contact fetched (indexed)","data":{"total":len(indexed),"results":indexed}}
 
     payload = {
         "query": query.query,
@@ -126,10 +217,56 @@ def search_by_identifier(query:Search_by_query):
         ]
     }
 
-    res = requests.post(url,headers=headers,json=payload)
+    try:
+        res = await HUBSPOT_CLIENT.arequest("POST", "/crm/v3/objects/contacts/search", json=payload)
+    except HubSpotError as e:
+        return e.as_dict()
     if res.status_code ==200:
         LOG.info(f"Contact Fetched Successfully: {query.query}")
+        index_contacts(user_ns, res.json().get("results", []))
         return {"message":"contact fetched","data":res.json()}
     return {"error": res.status_code, "details": res.text}
 
 
+# Batch endpoints: inputs are chunked to HubSpot's 100-per-call limit and
+# the response reports success or failure for every input by index.
+@contacts_router.post("/batch/create")
+async def batch_create_contacts(
+        args: BatchCreateContactsArgs, response: Response, idempotency_key: Optional[str] = Header(None)
+):
+    async def write():
+        summary = await arun_batch("create", create_inputs(args.contacts))
+        if summary["succeeded"]:
+            await _invalidate_caches(resync=True)
+        return summary
+
+    return await _once(idempotency_key, response, "batch/create", args.dict(), write)
+
+@contacts_router.post("/batch/update")
+async def batch_update_contacts(
+        args: BatchUpdateContactsArgs, response: Response, idempotency_key: Optional[str] = Header(None)
+):
+    async def write():
+        summary = await arun_batch("update", update_inputs(args.contacts))
+        if summary["succeeded"]:
+            await aunindex_contacts(await asyncio.to_thread(get_user_namespace), succeeded_ids(summary))
+            await _invalidate_caches(resync=True)
+        return summary
+
+    return await _once(idempotency_key, response, "batch/update", args.dict(), write)
+
+@contacts_router.post("/batch/read")
+async def batch_read_contacts(args: BatchReadContactsArgs):
+    return await arun_batch("read", id_inputs(args.ids), properties=args.properties, id_property=args.id_property)
+
+@contacts_router.post("/batch/archive")
+async def batch_archive_contacts(
+        args: BatchArchiveContactsArgs, response: Response, idempotency_key: Optional[str] = Header(None)
+):
+    async def write():
+        summary = await arun_batch("archive", id_inputs(args.contact_ids))
+        if summary["succeeded"]:
+            await _invalidate_caches(removed=succeeded_ids(summary))
+        return summary
+
+    return await _once(idempotency_key, response, "batch/archive", args.dict(), write)
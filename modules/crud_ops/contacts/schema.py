@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Union
+from typing import List, Literal, Optional, Union
 class ContactProperties(BaseModel):
     email: str
     firstname: Optional[str] = None
@@ -22,4 +22,51 @@ class UpdateContactArgs(BaseModel):
         extra = "ignore"
 
 class Search_by_query(BaseModel):
-    query:str
\ No newline at end of file
+    query:str
+
+class SearchByNameArgs(BaseModel):
+    query: str
+    limit: Optional[int] = None
+
+# Batch operations; batch_ops splits the lists into chunks of 100 for HubSpot
+class BatchCreateContactsArgs(BaseModel):
+    contacts: List[ContactProperties]
+
+class BatchUpdateContactsArgs(BaseModel):
+    contacts: List[UpdateContactArgs]
+
+class BatchReadContactsArgs(BaseModel):
+    ids: List[str]
+    properties: Optional[List[str]] = None
+    # e.g. "email" to look contacts up by email instead of HubSpot ID
+    id_property: Optional[str] = None
+
+class BatchArchiveContactsArgs(BaseModel):
+    contact_ids: List[str]
+
+# query_contacts: filtering and aggregation over the cached contact set
+class ContactFilter(BaseModel):
+    property: str
+    operator: Literal[
+        "eq", "neq", "contains", "not_contains", "starts_with", "in", "gt", "gte", "lt", "lte", "exists", "not_exists"
+    ] = "eq"
+    value: Optional[Union[str, int, float, List[str]]] = None
+
+class QueryContactsArgs(BaseModel):
+    filters: List[ContactFilter] = []
+    properties: Optional[List[str]] = None
+    count_only: bool = False
+    group_by: Optional[str] = None
+    sort_by: Optional[str] = None
+    descending: bool = False
+    limit: int = 20
+    offset: int = 0
+
+# get_contacts: one page of the contact list
+class GetContactsArgs(BaseModel):
+    limit: int = 20
+    # next_after of the previous page
+    after: Optional[str] = None
+    properties: Optional[List[str]] = None
+    sort_by: Optional[str] = None
+    descending: bool = False
@@ -0,0 +1,196 @@
+import time
+import asyncio
+import threading
+import httpx
+from typing import AsyncIterator, Iterator, Optional
+from config import CONFIG
+from core.logger.logger import LOG
+from modules.auth.token_manager import get_valid_access_token, refresh_access_token
+from modules.crud_ops.rate_limiter import RATE_LIMITER, RateLimitExceeded
+
+DEFAULT_BASE_URL = "https://api.hubapi.com"
+# get_valid_access_token refreshes 5 minutes before expiry, so re-reading token.json once a minute is enough
+_TOKEN_RECHECK_SECONDS = 60
+
+
+class HubSpotError(Exception):
+    """Non-success HubSpot response, rendered the way routes and tools already report errors"""
+    def __init__(self, status_code, details: str = ""):
+        super().__init__(f"HubSpot error {status_code}: {details}")
+        self.status_code = status_code
+        self.details = details
+
+    def as_dict(self) -> dict:
+        return {"error": self.status_code, "details": self.details}
+
+
+class HubSpotAuthError(HubSpotError):
+    def __init__(self, message: str):
+        super().__init__(None, message)
+        self.message = message
+
+    def as_dict(self) -> dict:
+        return {"error": self.message}
+
+
+class HubSpotClient:
+    """
+    One place for every HubSpot API call.
+
+    Keeps a pooled keep-alive session per flavour (httpx.Client for the sync
+    agent tools, httpx.AsyncClient for routes and async tools), attaches the
+    bearer token, and on a 401 refreshes the token once and retries. Every
+    call first takes a token from the cluster-wide RATE_LIMITER; a 429 is
+    retried after its Retry-After, up to CONFIG.hubspot_max_retries times.
+    Paths are relative to CONFIG.hubspot_base_url; absolute URLs (paging
+    links) pass through.
+    """
+    def __init__(self, base_url: str = None):
+        self.base_url = (base_url or CONFIG.hubspot_base_url or DEFAULT_BASE_URL).rstrip("/")
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._token: Optional[str] = None
+        self._token_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _options(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "timeout": httpx.Timeout(CONFIG.hubspot_timeout_seconds, connect=CONFIG.hubspot_connect_timeout_seconds),
+            "limits": httpx.Limits(
+                max_connections=CONFIG.hubspot_max_connections,
+                max_keepalive_connections=CONFIG.hubspot_max_connections
+            ),
+            "headers": {"Content-Type": "application/json"}
+        }
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._options())
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(**self._options())
+        return self._async_client
+
+    # ---------- Token handling ----------
+    def _access_token(self) -> str:
+        if self._token is None or time.monotonic() - self._token_checked_at > _TOKEN_RECHECK_SECONDS:
+            self._token = get_valid_access_token()
+            self._token_checked_at = time.monotonic()
+        if not self._token:
+            raise HubSpotAuthError("No valid token available. Please authorize first at /")
+        return self._token
+
+    def _refreshed_token(self, rejected_token: str) -> str:
+        with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if self._token and self._token != rejected_token:
+                return self._token
+            LOG.info("Got 401, attempting token refresh...")
+            token_data = refresh_access_token()
+            self._token = token_data["access_token"] if token_data else None
+            self._token_checked_at = time.monotonic()
+        if not self._token:
+            raise HubSpotAuthError("Failed to refresh token")
+        return self._token
+
+    @staticmethod
+    def _auth(token: str, headers: Optional[dict]) -> dict:
+        return {**(headers or {}), "Authorization": f"Bearer {token}"}
+
+    # ---------- Requests ----------
+    def _send(self, method: str, path: str, token: str, headers: Optional[dict], **kwargs) -> httpx.Response:
+        try:
+            RATE_LIMITER.acquire()
+        except RateLimitExceeded as e:
+            raise HubSpotError(429, e.message)
+        return self.client.request(method, path, headers=self._auth(token, headers), **kwargs)
+
+    async def _asend(self, method: str, path: str, token: str, headers: Optional[dict], **kwargs) -> httpx.Response:
+        try:
+            await RATE_LIMITER.aacquire()
+        except RateLimitExceeded as e:
+            raise HubSpotError(429, e.message)
+        return await self.async_client.request(method, path, headers=self._auth(token, headers), **kwargs)
+
+    def request(self, method: str, path: str, headers: dict = None, **kwargs) -> httpx.Response:
+        token = self._access_token()
+        attempt = 0
+        while True:
+            res = self._send(method, path, token, headers, **kwargs)
+            if res.status_code == 401:
+                token = self._refreshed_token(token)
+                res = self._send(method, path, token, headers, **kwargs)
+            delay = RATE_LIMITER.retry_delay(res, attempt)
+            if delay is None:
+                return res
+            time.sleep(delay)
+            attempt += 1
+
+    async def arequest(self, method: str, path: str, headers: dict = None, **kwargs) -> httpx.Response:
+        # token.json is read/written synchronously, keep it off the event loop
+        token = await asyncio.to_thread(self._access_token)
+        attempt = 0
+        while True:
+            res = await self._asend(method, path, token, headers, **kwargs)
+            if res.status_code == 401:
+                token = await asyncio.to_thread(self._refreshed_token, token)
+                res = await self._asend(method, path, token, headers, **kwargs)
+            delay = await RATE_LIMITER.aretry_delay(res, attempt)
+            if delay is None:
+                return res
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def iter_pages(self, path: str, params: dict = None) -> Iterator[list]:
+        """GET a list endpoint and yield each page's results as it arrives, following paging.next.link"""
+        res = self.request("GET", path, params=params)
+        while True:
+            if res.status_code != 200:
+                raise HubSpotError(res.status_code, res.text)
+            data = res.json()
+            yield data.get("results", [])
+            try:
+                next_link = data["paging"]["next"]["link"]  # Full URL from HubSpot
+            except KeyError:
+                return
+            res = self.request("GET", next_link)
+
+    async def aiter_pages(self, path: str, params: dict = None) -> AsyncIterator[list]:
+        res = await self.arequest("GET", path, params=params)
+        while True:
+            if res.status_code != 200:
+                raise HubSpotError(res.status_code, res.text)
+            data = res.json()
+            yield data.get("results", [])
+            try:
+                next_link = data["paging"]["next"]["link"]
+            except KeyError:
+                return
+            res = await self.arequest("GET", next_link)
+
+    def get_all_pages(self, path: str, params: dict = None) -> list:
+        return [result for page in self.iter_pages(path, params) for result in page]
+
+    async def aget_all_pages(self, path: str, params: dict = None) -> list:
+        return [result async for page in self.aiter_pages(path, params) for result in page]
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self.close()
+
+
+HUBSPOT_CLIENT = HubSpotClient()
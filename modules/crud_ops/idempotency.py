@@ -0,0 +1,189 @@
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Optional, Tuple
+from config import CONFIG
+from core.logger.logger import LOG
+from modules.database.redis.redis_client import redis_client, async_redis_client
+
+# Contact writes that run once per idempotency key.
+#
+#   idempotency:{ns}:{key}     {"state": "pending"|"done", "fingerprint", "token"|"response", "writes"}
+#   idempotency:{ns}:writes    count of writes completed through here
+#
+# REST writes use the client's Idempotency-Key header (key "rest:<header>");
+# agent tool writes get "tool:<name>:<email or id>:<payload hash>" from the
+# call itself. The first call claims the key (SET NX for
+# CONFIG.idempotency_lock_seconds) and keeps its response for
+# CONFIG.idempotency_ttl_seconds. A repeat gets that response without a
+# HubSpot call, and a repeat arriving while the first still runs waits for it.
+# Error responses, and batch summaries with any failed input, are not kept,
+# so a retry after a failure reaches HubSpot.
+#
+# A tool key is replayed only while no other write went through here in the
+# namespace since: setting a phone number to A, then B, then A again must
+# reach HubSpot all three times. A REST key sent with a different body is
+# rejected, as the client reused it by mistake.
+_POLL_SECONDS = 0.1
+REPLAYED_NOTE = "Identical to an earlier call that already succeeded; HubSpot was not called again"
+
+
+def payload_hash(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+def tool_key(tool_name: str, identity: str, arguments: dict) -> str:
+    return f"tool:{tool_name}:{str(identity or '').strip().lower()}:{payload_hash(arguments)}"
+
+
+def rest_key(idempotency_key: str) -> str:
+    return f"rest:{idempotency_key}"
+
+
+def _redis_key(user_ns: str, key: str) -> str:
+    return f"idempotency:{user_ns}:{key}"
+
+
+def _writes_key(user_ns: str) -> str:
+    return f"idempotency:{user_ns}:writes"
+
+
+def _succeeded(response: Any) -> bool:
+    """Error dicts, and batch summaries (batch_ops) with failed inputs, are not kept"""
+    if not isinstance(response, dict) or "error" in response:
+        return False
+    return not response.get("failed")
+
+
+def _pending(fingerprint: str, token: str) -> str:
+    return json.dumps({"state": "pending", "fingerprint": fingerprint, "token": token})
+
+
+def _done(fingerprint: str, response: Any, writes: int) -> str:
+    return json.dumps({"state": "done", "fingerprint": fingerprint, "response": response, "writes": writes})
+
+
+def _mismatch() -> dict:
+    return {"error": 422, "details": "This idempotency key was already used for a different request"}
+
+
+def _in_progress() -> dict:
+    return {"error": 409, "details": "A request with this idempotency key is still in progress, retry later"}
+
+
+def _replay(entry: dict, current_writes: Optional[str], same_writes_only: bool) -> bool:
+    return not same_writes_only or entry.get("writes") == int(current_writes or 0)
+
+
+def run_idempotent(
+        user_ns: str, key: str, fingerprint: str, call: Callable[[], Any], same_writes_only: bool = False
+) -> Tuple[Any, bool]:
+    """(response, whether it is the stored response of an earlier call with this key)"""
+    redis_key = _redis_key(user_ns, key)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + CONFIG.idempotency_lock_seconds
+    while True:
+        try:
+            if redis_client.set(redis_key, _pending(fingerprint, token), nx=True, ex=CONFIG.idempotency_lock_seconds):
+                break
+            raw = redis_client.get(redis_key)
+            if raw is None:
+                continue
+            entry = json.loads(raw)
+            if entry["fingerprint"] != fingerprint:
+                return _mismatch(), False
+            if entry["state"] == "done":
+                if _replay(entry, redis_client.get(_writes_key(user_ns)), same_writes_only):
+                    LOG.info(f"Replaying stored response of {key}")
+                    return entry["response"], True
+                # Other writes happened since; this is a new request that happens to match
+                if redis_client.get(redis_key) == raw:
+                    redis_client.delete(redis_key)
+                continue
+        except Exception as e:
+            LOG.error(f"Idempotency store unavailable, running {key} unguarded: {e}")
+            return call(), False
+        if time.monotonic() >= deadline:
+            return _in_progress(), False
+        time.sleep(_POLL_SECONDS)
+
+    try:
+        response = call()
+    except BaseException:
+        _release(redis_key, token)
+        raise
+    if _succeeded(response):
+        try:
+            writes = redis_client.incr(_writes_key(user_ns))
+            redis_client.set(redis_key, _done(fingerprint, response, writes), ex=CONFIG.idempotency_ttl_seconds)
+        except Exception as e:
+            LOG.error(f"Storing the response of {key} failed: {e}")
+    else:
+        _release(redis_key, token)
+    return response, False
+
+
+def _release(redis_key: str, token: str):
+    try:
+        raw = redis_client.get(redis_key)
+        if raw and json.loads(raw).get("token") == token:
+            redis_client.delete(redis_key)
+    except Exception as e:
+        LOG.error(f"Releasing {redis_key} failed: {e}")
+
+
+async def arun_idempotent(
+        user_ns: str, key: str, fingerprint: str, call: Callable[[], Awaitable], same_writes_only: bool = False
+) -> Tuple[Any, bool]:
+    redis_key = _redis_key(user_ns, key)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + CONFIG.idempotency_lock_seconds
+    while True:
+        try:
+            if await async_redis_client.set(redis_key, _pending(fingerprint, token), nx=True, ex=CONFIG.idempotency_lock_seconds):
+                break
+            raw = await async_redis_client.get(redis_key)
+            if raw is None:
+                continue
+            entry = json.loads(raw)
+            if entry["fingerprint"] != fingerprint:
+                return _mismatch(), False
+            if entry["state"] == "done":
+                if _replay(entry, await async_redis_client.get(_writes_key(user_ns)), same_writes_only):
+                    LOG.info(f"Replaying stored response of {key}")
+                    return entry["response"], True
+                if await async_redis_client.get(redis_key) == raw:
+                    await async_redis_client.delete(redis_key)
+                continue
+        except Exception as e:
+            LOG.error(f"Idempotency store unavailable, running {key} unguarded: {e}")
+            return await call(), False
+        if time.monotonic() >= deadline:
+            return _in_progress(), False
+        await asyncio.sleep(_POLL_SECONDS)
+
+    try:
+        response = await call()
+    except BaseException:
+        await _arelease(redis_key, token)
+        raise
+    if _succeeded(response):
+        try:
+            writes = await async_redis_client.incr(_writes_key(user_ns))
+            await async_redis_client.set(redis_key, _done(fingerprint, response, writes), ex=CONFIG.idempotency_ttl_seconds)
+        except Exception as e:
+            LOG.error(f"Storing the response of {key} failed: {e}")
+    else:
+        await _arelease(redis_key, token)
+    return response, False
+
+
+async def _arelease(redis_key: str, token: str):
+    try:
+        raw = await async_redis_client.get(redis_key)
+        if raw and json.loads(raw).get("token") == token:
+            await async_redis_client.delete(redis_key)
+    except Exception as e:
+        LOG.error(f"Releasing {redis_key} failed: {e}")
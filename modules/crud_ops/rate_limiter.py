@@ -0,0 +1,273 @@
+import time
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import httpx
+from config import CONFIG
+from core.logger.logger import LOG
+from modules.database.redis.redis_client import redis_client, async_redis_client
+
+# Cluster-wide budget for HubSpot calls, shared through Redis by every API and
+# Celery worker (they all use the one HubSpot account behind token.json).
+#
+#   hubspot_rate:bucket            token bucket {tokens, ts}: HUBSPOT_RATE_LIMIT_PER_10S, refilled continuously
+#   hubspot_rate:daily:{YYYYMMDD}  calls made today (UTC)
+#   hubspot_rate:blocked_until     epoch ms set from Retry-After when HubSpot answers 429
+#   hubspot_rate:stats             request/throttle counters per priority
+#
+# Calls run as "interactive" (chat, REST) unless wrapped in
+# rate_limit_priority("background"), which the contact sync does. Background
+# calls leave CONFIG.hubspot_interactive_reserve of both budgets untouched, so
+# a bulk sync slows down before a user's request has to wait.
+#
+# If Redis is unreachable the limiter lets calls through and 429s are still
+# retried after Retry-After.
+PRIORITIES = ("interactive", "background")
+STATS_KEY = "hubspot_rate:stats"
+_BUCKET_KEY = "hubspot_rate:bucket"
+_BLOCKED_KEY = "hubspot_rate:blocked_until"
+_WINDOW_MS = 10_000
+_MAX_POLL_SECONDS = 1.0
+# Below this an acquire counts as unthrottled (it is just the script round trip)
+_MIN_RECORDED_WAIT = 0.05
+_DAILY_POLICY = "DAILY"
+
+_PRIORITY: ContextVar[str] = ContextVar("hubspot_priority", default="interactive")
+
+# Returns {1, 0} when a token was taken, {0, wait_ms} when the caller must wait
+# and {-1, 0} when today's budget for its priority is spent.
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local daily_limit = tonumber(ARGV[4])
+local daily_reserve = tonumber(ARGV[5])
+local rate = capacity / tonumber(ARGV[6])
+
+local blocked = tonumber(redis.call('GET', KEYS[3]) or '0')
+if blocked > now then
+    return {0, blocked - now}
+end
+if tonumber(redis.call('GET', KEYS[2]) or '0') >= daily_limit - daily_reserve then
+    return {-1, 0}
+end
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+if tokens - 1 < reserve then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    return {0, math.ceil((reserve + 1 - tokens) / rate)}
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], 2 * tonumber(ARGV[6]))
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], 172800)
+redis.call('HINCRBY', KEYS[4], 'requests_' .. ARGV[7], 1)
+return {1, 0}
+"""
+
+# Pushes blocked_until out to ARGV[1] (epoch ms), never back: concurrent 429s
+# with different Retry-After values keep the longest pause.
+_BLOCK_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tonumber(ARGV[1]) > current then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+@contextmanager
+def rate_limit_priority(priority: str):
+    """Run the HubSpot calls of a block at the given priority"""
+    token = _PRIORITY.set(priority)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def current_priority() -> str:
+    return _PRIORITY.get()
+
+
+def _daily_key() -> str:
+    return f"hubspot_rate:daily:{datetime.now(timezone.utc):%Y%m%d}"
+
+
+def _script_args(priority: str) -> list:
+    capacity = CONFIG.hubspot_rate_limit_per_10s
+    share = CONFIG.hubspot_interactive_reserve if priority == "background" else 0.0
+    return [
+        int(time.time() * 1000),
+        capacity,
+        capacity * share,
+        CONFIG.hubspot_daily_limit,
+        int(CONFIG.hubspot_daily_limit * share),
+        _WINDOW_MS,
+        priority
+    ]
+
+
+def _is_daily_policy(res: httpx.Response) -> bool:
+    try:
+        return res.json().get("policyName") == _DAILY_POLICY
+    except ValueError:
+        return False
+
+
+def retry_after_seconds(res: httpx.Response, attempt: int) -> float:
+    """Retry-After as seconds or an HTTP date; exponential from 1s when HubSpot sends none"""
+    value = res.headers.get("Retry-After")
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            try:
+                return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    return float(min(2 ** attempt, 10))
+
+
+class HubSpotRateLimiter:
+    def __init__(self):
+        self._script = redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._async_script = async_redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._block_script = redis_client.register_script(_BLOCK_SCRIPT)
+
+    @staticmethod
+    def _keys() -> list:
+        return [_BUCKET_KEY, _daily_key(), _BLOCKED_KEY, STATS_KEY]
+
+    @staticmethod
+    def _exhausted(priority: str) -> RateLimitExceeded:
+        return RateLimitExceeded(f"HubSpot daily API budget for {priority} calls is used up")
+
+    def _record(self, priority: str, waited: float, **counters):
+        """Throttle counters; requests_<priority> is counted by the acquire script itself"""
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            if waited:
+                pipe.hincrby(STATS_KEY, f"throttled_{priority}", 1)
+                pipe.hincrbyfloat(STATS_KEY, f"throttled_seconds_{priority}", round(waited, 3))
+            for name, value in counters.items():
+                pipe.hincrby(STATS_KEY, name, value)
+            pipe.execute()
+        except Exception as e:
+            LOG.error(f"HubSpot rate limit stats update failed: {e}")
+
+    def acquire(self):
+        """Block until the shared budget allows one more HubSpot call"""
+        if not CONFIG.hubspot_rate_limit_enabled:
+            return
+        priority = current_priority()
+        started = time.monotonic()
+        while True:
+            try:
+                allowed, wait_ms = self._script(keys=self._keys(), args=_script_args(priority))
+            except Exception as e:
+                LOG.error(f"HubSpot rate limiter unavailable, not throttling: {e}")
+                return
+            if allowed == 1:
+                break
+            if allowed == -1:
+                self._record(priority, 0.0, daily_exhausted=1)
+                raise self._exhausted(priority)
+            if time.monotonic() - started + wait_ms / 1000 > CONFIG.hubspot_rate_limit_max_wait_seconds:
+                self._record(priority, time.monotonic() - started, wait_timeouts=1)
+                raise RateLimitExceeded(f"Waited too long for the HubSpot rate limit ({priority})")
+            time.sleep(min(wait_ms / 1000, _MAX_POLL_SECONDS))
+        waited = time.monotonic() - started
+        if waited > _MIN_RECORDED_WAIT:
+            self._record(priority, waited)
+
+    async def aacquire(self):
+        if not CONFIG.hubspot_rate_limit_enabled:
+            return
+        priority = current_priority()
+        started = time.monotonic()
+        while True:
+            try:
+                allowed, wait_ms = await self._async_script(keys=self._keys(), args=_script_args(priority))
+            except Exception as e:
+                LOG.error(f"HubSpot rate limiter unavailable, not throttling: {e}")
+                return
+            if allowed == 1:
+                break
+            if allowed == -1:
+                await asyncio.to_thread(self._record, priority, 0.0, daily_exhausted=1)
+                raise self._exhausted(priority)
+            if time.monotonic() - started + wait_ms / 1000 > CONFIG.hubspot_rate_limit_max_wait_seconds:
+                await asyncio.to_thread(self._record, priority, time.monotonic() - started, wait_timeouts=1)
+                raise RateLimitExceeded(f"Waited too long for the HubSpot rate limit ({priority})")
+            await asyncio.sleep(min(wait_ms / 1000, _MAX_POLL_SECONDS))
+        waited = time.monotonic() - started
+        if waited > _MIN_RECORDED_WAIT:
+            await asyncio.to_thread(self._record, priority, waited)
+
+    def retry_delay(self, res: httpx.Response, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying a 429, or None when the response should
+        be returned as is. The pause is written to Redis so every worker holds off.
+        """
+        if res.status_code != 429:
+            return None
+        if attempt >= CONFIG.hubspot_max_retries or _is_daily_policy(res):
+            LOG.warning(f"HubSpot 429 not retried (attempt {attempt}): {res.text[:200]}")
+            self._record_429(current_priority(), None)
+            return None
+        delay = retry_after_seconds(res, attempt)
+        LOG.warning(f"HubSpot 429, retrying in {delay:.1f}s")
+        self._record_429(current_priority(), delay)
+        return delay
+
+    async def aretry_delay(self, res: httpx.Response, attempt: int) -> Optional[float]:
+        if res.status_code != 429:
+            return None
+        return await asyncio.to_thread(self.retry_delay, res, attempt)
+
+    def _record_429(self, priority: str, delay: Optional[float]):
+        try:
+            if delay is not None:
+                until_ms = int((time.time() + delay) * 1000)
+                self._block_script(keys=[_BLOCKED_KEY], args=[until_ms, max(int(delay * 1000), 1)])
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hincrby(STATS_KEY, "responses_429", 1)
+            if delay is not None:
+                pipe.hincrby(STATS_KEY, "retries_429", 1)
+                pipe.hincrbyfloat(STATS_KEY, f"throttled_seconds_{priority}", round(delay, 3))
+            pipe.execute()
+        except Exception as e:
+            LOG.error(f"HubSpot rate limit stats update failed: {e}")
+
+
+def get_rate_limit_stats() -> dict:
+    raw = redis_client.hgetall(STATS_KEY)
+    stats = {}
+    for priority in PRIORITIES:
+        stats[priority] = {
+            "requests": int(raw.get(f"requests_{priority}", 0)),
+            "throttled": int(raw.get(f"throttled_{priority}", 0)),
+            "throttled_seconds": round(float(raw.get(f"throttled_seconds_{priority}", 0)), 3)
+        }
+    for name in ("responses_429", "retries_429", "wait_timeouts", "daily_exhausted"):
+        stats[name] = int(raw.get(name, 0))
+    stats["calls_today"] = int(redis_client.get(_daily_key()) or 0)
+    stats["daily_limit"] = CONFIG.hubspot_daily_limit
+    return stats
+
+
+RATE_LIMITER = HubSpotRateLimiter()
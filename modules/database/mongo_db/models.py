@@ -8,6 +8,8 @@ class ToolCall(BaseModel):
     function_name:str
     arguments:Dict[str,Any]
     response:Dict[str,Any]
+    # tool_payloads id of the full result when `response` had to be shortened
+    response_ref:Optional[str] = None
     execution_time_ms:Optional[int] = None
     status:str = "success"
     timestamp:datetime = Field(default_factory=datetime.now)
@@ -38,6 +40,8 @@ class Message(BaseModel):
     total_react_cycle:int = 0 
     response_time_Seconds:float = 0.0
     model:str = ""
+    # Per-phase latency in ms (history, gate, vector search, llm, tools)
+    phase_timings:Dict[str,Any] = {}
 
     #status
     status:str = "completed"
@@ -1,4 +1,4 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient
 from core.logger.logger import LOG
 from config import CONFIG
 
@@ -12,5 +12,11 @@ def get_mongo_db():
         LOG.error(f"MongoDB connection failed: {e}")
         raise e
 
-db = get_mongo_db()
+def get_async_mongo_db():
+    # AsyncMongoClient connects lazily on the first awaited operation,
+    # so there is no server_info() round trip here.
+    client = AsyncMongoClient(CONFIG.mongo_uri,serverSelectionTimeoutMS=5000)
+    return client[CONFIG.mongo_db]
 
+db = get_mongo_db()
+async_db = get_async_mongo_db()
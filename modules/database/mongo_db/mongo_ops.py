@@ -1,8 +1,10 @@
-from modules.database.mongo_db.mongo_client import db
+from modules.database.mongo_db.mongo_client import db, async_db
 from modules.database.mongo_db.models import Message
 from core.logger.logger import LOG
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from bson import ObjectId
+from datetime import datetime, timezone
+from pymongo import UpdateOne
 
 class MessageOperations:
     def __init__(self):
@@ -132,4 +134,198 @@ class MessageOperations:
             return messages
         except Exception as e:
             LOG.error(f"Error fetching high-token messages: {e}")
-            return []
\ No newline at end of file
+            return []
+
+
+class AsyncMessageOperations:
+    """Async counterpart of MessageOperations for the asyncio agent loop"""
+    def __init__(self):
+        self.collection = async_db["user_history"]
+
+    async def save_message(self, message_data: dict) -> str:
+        try:
+            message = Message(**message_data)
+            result = await self.collection.insert_one(message.dict())
+            LOG.info(f"Message saved to MongoDB with _id: {result.inserted_id}")
+            return str(result.inserted_id)
+        except Exception as e:
+            LOG.error(f"Error saving message to MongoDB: {e}")
+            raise
+
+
+# ---------- Contact mirror (see modules/crud_ops/contacts/contact_sync.py) ----------
+def _mirror_id(user_ns: str, contact_id) -> str:
+    return f"{user_ns}:{contact_id}"
+
+
+def _mirror_document(user_ns: str, contact: dict, synced_at: datetime) -> dict:
+    properties = contact.get("properties", {})
+    return {
+        "namespace": user_ns,
+        "hubspot_id": str(contact["id"]),
+        "properties": properties,
+        "updated_at": contact.get("updatedAt") or properties.get("lastmodifieddate"),
+        "synced_at": synced_at
+    }
+
+
+def _mirror_update(user_ns: str, contact: dict, synced_at: datetime, partial: bool) -> dict:
+    """
+    $set of a mirror upsert. Sync pages carry every mirrored property and replace
+    the subdocument; write-through results (a PATCH response, say) only carry what
+    the write touched, so with partial=True each property is set on its own.
+    """
+    document = _mirror_document(user_ns, contact, synced_at)
+    if partial:
+        properties = document.pop("properties")
+        document.update({f"properties.{name}": value for name, value in properties.items()})
+        if document["updated_at"] is None:
+            document.pop("updated_at")
+    return {"$set": document}
+
+
+def _mirror_projection(properties: Optional[List[str]]) -> dict:
+    projection = {"_id": 0, "hubspot_id": 1, "updated_at": 1}
+    if properties:
+        projection.update({f"properties.{name}": 1 for name in properties})
+    else:
+        projection["properties"] = 1
+    return projection
+
+
+def _mirror_contact(doc: dict) -> dict:
+    """Mirror document in the shape HubSpot returns contacts"""
+    return {"id": doc["hubspot_id"], "properties": doc.get("properties", {}), "updatedAt": doc.get("updated_at")}
+
+
+class ContactMirrorOperations:
+    """Local copy of the HubSpot contacts of each user namespace, plus its sync state"""
+    def __init__(self):
+        self.collection = db["contacts_mirror"]
+        self.state = db["contacts_sync_state"]
+
+    def ensure_indexes(self):
+        self.collection.create_index([("namespace", 1), ("updated_at", -1)])
+
+    def upsert_contacts(
+            self, user_ns: str, contacts: List[Dict], synced_at: Optional[datetime] = None, partial: bool = False
+    ) -> int:
+        if not contacts:
+            return 0
+        synced_at = synced_at or datetime.now(timezone.utc)
+        result = self.collection.bulk_write([
+            UpdateOne(
+                {"_id": _mirror_id(user_ns, contact["id"])},
+                _mirror_update(user_ns, contact, synced_at, partial),
+                upsert=True
+            )
+            for contact in contacts
+        ], ordered=False)
+        return result.upserted_count + result.modified_count
+
+    def remove_contacts(self, user_ns: str, contact_ids: List[str]) -> int:
+        if not contact_ids:
+            return 0
+        ids = [_mirror_id(user_ns, contact_id) for contact_id in contact_ids]
+        return self.collection.delete_many({"_id": {"$in": ids}}).deleted_count
+
+    def remove_not_synced_since(self, user_ns: str, synced_at: datetime) -> int:
+        """Drop contacts a full reconcile did not see (deleted or archived in HubSpot)"""
+        return self.collection.delete_many({"namespace": user_ns, "synced_at": {"$lt": synced_at}}).deleted_count
+
+    def read_contacts(self, user_ns: str, properties: Optional[List[str]] = None) -> List[Dict]:
+        cursor = self.collection.find({"namespace": user_ns}, _mirror_projection(properties))
+        return [_mirror_contact(doc) for doc in cursor]
+
+    def count(self, user_ns: str) -> int:
+        return self.collection.count_documents({"namespace": user_ns})
+
+    def get_state(self, user_ns: str) -> Optional[Dict]:
+        return self.state.find_one({"_id": user_ns})
+
+    def update_state(self, user_ns: str, **fields):
+        self.state.update_one({"_id": user_ns}, {"$set": fields}, upsert=True)
+
+
+class AsyncContactMirrorOperations:
+    """Read side of ContactMirrorOperations for async routes and tools"""
+    def __init__(self):
+        self.collection = async_db["contacts_mirror"]
+        self.state = async_db["contacts_sync_state"]
+
+    async def upsert_contacts(
+            self, user_ns: str, contacts: List[Dict], synced_at: Optional[datetime] = None, partial: bool = False
+    ) -> int:
+        if not contacts:
+            return 0
+        synced_at = synced_at or datetime.now(timezone.utc)
+        result = await self.collection.bulk_write([
+            UpdateOne(
+                {"_id": _mirror_id(user_ns, contact["id"])},
+                _mirror_update(user_ns, contact, synced_at, partial),
+                upsert=True
+            )
+            for contact in contacts
+        ], ordered=False)
+        return result.upserted_count + result.modified_count
+
+    async def remove_contacts(self, user_ns: str, contact_ids: List[str]) -> int:
+        if not contact_ids:
+            return 0
+        ids = [_mirror_id(user_ns, contact_id) for contact_id in contact_ids]
+        return (await self.collection.delete_many({"_id": {"$in": ids}})).deleted_count
+
+    async def read_contacts(self, user_ns: str, properties: Optional[List[str]] = None) -> List[Dict]:
+        cursor = self.collection.find({"namespace": user_ns}, _mirror_projection(properties))
+        return [_mirror_contact(doc) async for doc in cursor]
+
+    async def iter_contacts(self, user_ns: str, properties: Optional[List[str]] = None, batch_size: int = 500):
+        """Yield lists of at most batch_size contacts straight off the cursor"""
+        cursor = self.collection.find({"namespace": user_ns}, _mirror_projection(properties), batch_size=batch_size)
+        batch = []
+        async for doc in cursor:
+            batch.append(_mirror_contact(doc))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def get_state(self, user_ns: str) -> Optional[Dict]:
+        return await self.state.find_one({"_id": user_ns})
+
+
+# ---------- Full tool results (see modules/ai_agent/tool_results.py) ----------
+class ToolPayloadOperations:
+    """Tool results as the tool returned them, when the LLM and the history only got a shortened copy"""
+    def __init__(self):
+        self.collection = db["tool_payloads"]
+
+    def ensure_indexes(self, retention_seconds: int):
+        self.collection.create_index("created_at", expireAfterSeconds=retention_seconds)
+
+    def save_payload(self, payload_id: str, function_name: str, response: Any) -> str:
+        self.collection.insert_one({
+            "_id": payload_id,
+            "function_name": function_name,
+            "response": response,
+            "created_at": datetime.now(timezone.utc)
+        })
+        return payload_id
+
+    def get_payload(self, payload_id: str) -> Optional[Dict]:
+        return self.collection.find_one({"_id": payload_id})
+
+
+class AsyncToolPayloadOperations:
+    def __init__(self):
+        self.collection = async_db["tool_payloads"]
+
+    async def save_payload(self, payload_id: str, function_name: str, response: Any) -> str:
+        await self.collection.insert_one({
+            "_id": payload_id,
+            "function_name": function_name,
+            "response": response,
+            "created_at": datetime.now(timezone.utc)
+        })
+        return payload_id
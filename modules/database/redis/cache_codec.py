@@ -0,0 +1,100 @@
+import json
+import zlib
+from typing import Dict, Optional
+from config import CONFIG
+from core.logger.logger import LOG
+
+# Byte encodings for cached payloads.
+#
+#   json          UTF-8 JSON text, what redis_set_json always wrote (no header)
+#   json-zlib     b"\0jz" + zlib(JSON), standard library only
+#   msgpack-zstd  b"\0mz" + zstd(msgpack), needs the optional msgpack and zstandard packages
+#
+# CONFIG.cache_codec picks the codec for writes ("auto" is msgpack-zstd when
+# both packages import, json-zlib otherwise). Reads go by the header, so
+# entries written by any codec, including plain JSON from before codecs
+# existed, keep decoding after the setting changes.
+
+
+class JsonCodec:
+    name = "json"
+    header = b""
+
+    def encode(self, value) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def decode(self, data: bytes):
+        return json.loads(data)
+
+
+class JsonZlibCodec:
+    name = "json-zlib"
+    header = b"\0jz"
+
+    def encode(self, value) -> bytes:
+        return self.header + zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 1)
+
+    def decode(self, data: bytes):
+        return json.loads(zlib.decompress(data[len(self.header):]))
+
+
+class MsgpackZstdCodec:
+    name = "msgpack-zstd"
+    header = b"\0mz"
+
+    def __init__(self):
+        import msgpack
+        import zstandard
+        self._msgpack = msgpack
+        self._compressor = zstandard.ZstdCompressor(level=3)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def encode(self, value) -> bytes:
+        return self.header + self._compressor.compress(self._msgpack.packb(value, use_bin_type=True))
+
+    def decode(self, data: bytes):
+        return self._msgpack.unpackb(self._decompressor.decompress(data[len(self.header):]), raw=False)
+
+
+def _available_codecs() -> Dict[str, object]:
+    codecs = {JsonCodec.name: JsonCodec(), JsonZlibCodec.name: JsonZlibCodec()}
+    try:
+        codecs[MsgpackZstdCodec.name] = MsgpackZstdCodec()
+    except ImportError:
+        pass
+    return codecs
+
+
+CODECS = _available_codecs()
+
+
+def _write_codec():
+    name = CONFIG.cache_codec
+    if name == "auto":
+        return CODECS.get(MsgpackZstdCodec.name) or CODECS[JsonZlibCodec.name]
+    if name not in CODECS:
+        LOG.warning(f"Cache codec '{name}' is not available, using json-zlib")
+        return CODECS[JsonZlibCodec.name]
+    return CODECS[name]
+
+
+WRITE_CODEC = _write_codec()
+
+
+def encode_value(value) -> bytes:
+    return WRITE_CODEC.encode(value)
+
+
+def decode_value(data) -> Optional[object]:
+    """Decode an entry written by any codec; None when it cannot be read here"""
+    if data is None:
+        return None
+    if isinstance(data, str):
+        data = data.encode()
+    if not data.startswith(b"\0"):
+        return CODECS[JsonCodec.name].decode(data)
+    for codec in CODECS.values():
+        if codec.header and data.startswith(codec.header):
+            return codec.decode(data)
+    LOG.warning(f"Cache entry with header {data[:3]!r} has no codec in this process, treating it as a miss")
+    return None
@@ -0,0 +1,275 @@
+import time
+import uuid
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional
+from config import CONFIG
+from core.logger.logger import LOG
+from modules.database.redis.redis_client import (
+    redis_client, async_redis_client, redis_binary_client, async_redis_binary_client
+)
+from modules.database.redis.cache_codec import encode_value, decode_value
+
+# Versioned contact cache keys, per user namespace.
+#
+#   contacts:{ns}:gen                        generation, INCR'd on every contact write
+#   contacts:{ns}:{gen}:all[:{properties}]   contact list (get_contacts, /allcontacts)
+#   contacts:{ns}:{gen}:contact:{id}         a contact as returned by create/update
+#   contacts:{ns}:{gen}:search:{query}       search_by_identifier results from HubSpot
+#   <key>:lock                               held by the one caller rebuilding <key>
+#
+# Every key embeds the generation read at the start of the request. A write
+# bumps the generation, so readers stop seeing the old entries at once and the
+# orphans expire with their TTL: invalidation is one INCR instead of a SCAN
+# over the keyspace. A reader that fetched from HubSpot while a write landed
+# stores its result under the old generation, where no one will read it.
+#
+# Entries are {"value", "fresh_until"}, encoded by cache_codec, and live for
+# CONFIG.contacts_cache_ttl_seconds + CONFIG.contacts_cache_stale_seconds.
+# Past fresh_until, cached_load still returns the value and refreshes it in
+# the background. Only expiry is served stale; a write moves the generation
+# and the next read is a miss. Misses are single-flight: callers in one
+# process share one load, and across workers the <key>:lock holder loads
+# while the others wait for its entry.
+#
+# The agent's contact lists are cached through project_contacts, which keeps
+# only the id, updatedAt and the requested, non-empty properties of each
+# contact; /allcontacts caches HubSpot's objects unchanged under a "raw:" name.
+_POLL_SECONDS = 0.2
+
+
+def generation_key(user_ns: str) -> str:
+    return f"contacts:{user_ns}:gen"
+
+
+def contact_cache_key(user_ns: str, generation: str, kind: str, name: str = "") -> str:
+    key = f"contacts:{user_ns}:{generation}:{kind}"
+    return f"{key}:{name}" if name else key
+
+
+def _lock_key(key: str) -> str:
+    return f"{key}:lock"
+
+
+def _encode(value) -> bytes:
+    return encode_value({"value": value, "fresh_until": time.time() + CONFIG.contacts_cache_ttl_seconds})
+
+
+def _decode(data: Optional[bytes]) -> Optional[dict]:
+    return decode_value(data) if data else None
+
+
+def _is_fresh(entry: dict) -> bool:
+    return entry["fresh_until"] > time.time()
+
+
+def _entry_ttl() -> int:
+    return CONFIG.contacts_cache_ttl_seconds + CONFIG.contacts_cache_stale_seconds
+
+
+def project_contacts(contacts: List[dict], properties: List[str]) -> List[dict]:
+    """Contacts in the mirror's shape, without createdAt, archived and the properties HubSpot adds unasked"""
+    projected = []
+    for contact in contacts:
+        values = contact.get("properties") or {}
+        projected.append({
+            "id": contact["id"],
+            "properties": {name: values[name] for name in properties if values.get(name) not in (None, "")},
+            "updatedAt": contact.get("updatedAt")
+        })
+    return projected
+
+
+def contact_generation(user_ns: str) -> str:
+    return redis_client.get(generation_key(user_ns)) or "0"
+
+
+def contact_cache_get(user_ns: str, generation: str, kind: str, name: str = ""):
+    """Fresh cached value, or None"""
+    entry = _decode(redis_binary_client.get(contact_cache_key(user_ns, generation, kind, name)))
+    return entry["value"] if entry and _is_fresh(entry) else None
+
+
+def contact_cache_set(user_ns: str, generation: str, kind: str, value, name: str = ""):
+    redis_binary_client.set(contact_cache_key(user_ns, generation, kind, name), _encode(value), ex=_entry_ttl())
+
+
+def invalidate_contact_cache(user_ns: str):
+    """Retire every cached contact read of the namespace"""
+    try:
+        redis_client.incr(generation_key(user_ns))
+    except Exception as e:
+        LOG.error(f"Contact cache invalidation failed: {e}")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+_flights: Dict[str, _Flight] = {}
+_flights_lock = threading.Lock()
+
+
+def _single_flight(key: str, load: Callable):
+    """Run load once per key at a time in this process; concurrent callers get its result"""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error:
+            raise flight.error
+        return flight.value
+    try:
+        flight.value = load()
+        return flight.value
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _wait_for_entry(key: str):
+    """Poll for the lock holder's entry; None once its lock is gone without one or the wait runs out"""
+    deadline = time.monotonic() + CONFIG.contacts_cache_wait_seconds
+    while time.monotonic() < deadline:
+        time.sleep(_POLL_SECONDS)
+        entry = _decode(redis_binary_client.get(key))
+        if entry and _is_fresh(entry):
+            return entry
+        if not redis_client.exists(_lock_key(key)):
+            return _decode(redis_binary_client.get(key))
+    return None
+
+
+def _load_and_store(key: str, loader: Callable, wait: bool):
+    token = uuid.uuid4().hex
+    if not redis_client.set(_lock_key(key), token, nx=True, ex=CONFIG.contacts_cache_lock_seconds):
+        if not wait:
+            return None
+        entry = _wait_for_entry(key)
+        if entry:
+            return entry["value"]
+        LOG.warning(f"No contact cache entry from the lock holder of {key}, loading it here")
+    try:
+        value = loader()
+        redis_binary_client.set(key, _encode(value), ex=_entry_ttl())
+        return value
+    finally:
+        if redis_client.get(_lock_key(key)) == token:
+            redis_client.delete(_lock_key(key))
+
+
+def _refresh(key: str, loader: Callable):
+    try:
+        _single_flight(key, lambda: _load_and_store(key, loader, wait=False))
+    except Exception as e:
+        LOG.error(f"Background refresh of {key} failed: {e}")
+
+
+def cached_load(user_ns: str, kind: str, loader: Callable, name: str = ""):
+    """
+    Cached value of the key, loading it with `loader` on a miss. Errors raised
+    by the loader reach every caller waiting on that load and are not cached.
+    """
+    key = contact_cache_key(user_ns, contact_generation(user_ns), kind, name)
+    entry = _decode(redis_binary_client.get(key))
+    if entry:
+        if not _is_fresh(entry) and key not in _flights:
+            LOG.info(f"Serving stale {key} while it refreshes")
+            threading.Thread(target=_refresh, args=(key, loader), daemon=True).start()
+        return entry["value"]
+    return _single_flight(key, lambda: _load_and_store(key, loader, wait=True))
+
+
+# ---------- Async variants (used by run_convo_async) ----------
+_aflights: Dict[str, asyncio.Task] = {}
+_background: set = set()
+
+
+async def acontact_generation(user_ns: str) -> str:
+    return await async_redis_client.get(generation_key(user_ns)) or "0"
+
+
+async def acontact_cache_get(user_ns: str, generation: str, kind: str, name: str = ""):
+    entry = _decode(await async_redis_binary_client.get(contact_cache_key(user_ns, generation, kind, name)))
+    return entry["value"] if entry and _is_fresh(entry) else None
+
+
+async def acontact_cache_set(user_ns: str, generation: str, kind: str, value, name: str = ""):
+    await async_redis_binary_client.set(contact_cache_key(user_ns, generation, kind, name), _encode(value), ex=_entry_ttl())
+
+
+async def ainvalidate_contact_cache(user_ns: str):
+    try:
+        await async_redis_client.incr(generation_key(user_ns))
+    except Exception as e:
+        LOG.error(f"Contact cache invalidation failed: {e}")
+
+
+async def _asingle_flight(key: str, load: Callable[[], Awaitable]):
+    task = _aflights.get(key)
+    if task is None:
+        task = asyncio.ensure_future(load())
+        _aflights[key] = task
+        task.add_done_callback(lambda done: _aflights.pop(key, None) if _aflights.get(key) is done else None)
+    # A cancelled caller must not cancel the load the others are waiting on
+    return await asyncio.shield(task)
+
+
+async def _await_entry(key: str):
+    deadline = time.monotonic() + CONFIG.contacts_cache_wait_seconds
+    while time.monotonic() < deadline:
+        await asyncio.sleep(_POLL_SECONDS)
+        entry = _decode(await async_redis_binary_client.get(key))
+        if entry and _is_fresh(entry):
+            return entry
+        if not await async_redis_client.exists(_lock_key(key)):
+            return _decode(await async_redis_binary_client.get(key))
+    return None
+
+
+async def _aload_and_store(key: str, loader: Callable[[], Awaitable], wait: bool):
+    token = uuid.uuid4().hex
+    if not await async_redis_client.set(_lock_key(key), token, nx=True, ex=CONFIG.contacts_cache_lock_seconds):
+        if not wait:
+            return None
+        entry = await _await_entry(key)
+        if entry:
+            return entry["value"]
+        LOG.warning(f"No contact cache entry from the lock holder of {key}, loading it here")
+    try:
+        value = await loader()
+        await async_redis_binary_client.set(key, _encode(value), ex=_entry_ttl())
+        return value
+    finally:
+        if await async_redis_client.get(_lock_key(key)) == token:
+            await async_redis_client.delete(_lock_key(key))
+
+
+async def _arefresh(key: str, loader: Callable[[], Awaitable]):
+    try:
+        await _asingle_flight(key, lambda: _aload_and_store(key, loader, wait=False))
+    except Exception as e:
+        LOG.error(f"Background refresh of {key} failed: {e}")
+
+
+async def acached_load(user_ns: str, kind: str, loader: Callable[[], Awaitable], name: str = ""):
+    key = contact_cache_key(user_ns, await acontact_generation(user_ns), kind, name)
+    entry = _decode(await async_redis_binary_client.get(key))
+    if entry:
+        if not _is_fresh(entry) and key not in _aflights:
+            LOG.info(f"Serving stale {key} while it refreshes")
+            task = asyncio.create_task(_arefresh(key, loader))
+            _background.add(task)
+            task.add_done_callback(_background.discard)
+        return entry["value"]
+    return await _asingle_flight(key, lambda: _aload_and_store(key, loader, wait=True))
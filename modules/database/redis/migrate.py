@@ -0,0 +1,22 @@
+"""
+Move every conversation still stored under the legacy
+conversation:{user_id}:messages string key into the list layout.
+
+    uv run python -m modules.database.redis.migrate
+
+Conversations left unmigrated are still moved lazily on their next read; run
+this once before or after a deploy to convert them all up front. Safe to
+run again: migrated keys are gone, so a second run finds nothing.
+"""
+from core.logger.logger import LOG
+from modules.database.redis.redis_client import migrate_legacy_conversations
+
+
+def main() -> int:
+    migrated = migrate_legacy_conversations()
+    LOG.info(f"migrated {migrated} legacy conversations to list storage")
+    return migrated
+
+
+if __name__ == "__main__":
+    print(f"Migrated {main()} legacy conversations")
@@ -1,10 +1,11 @@
 import redis
+import redis.asyncio as aioredis
 from core.logger.logger import LOG
 import json
 import hashlib
 from core.utils import jsonload
 from config import CONFIG
-from modules.ai_agent.system_Prompt import system_prompt
+from modules.ai_agent.prompt_store import system_prompt_reference, compact_system_prompt, is_full_system_prompt
 # redis_client = redis.Redis(host = "localhost",port = 6379,db=0,decode_responses = True)
 from core.utils.utils import message_to_dict
 redis_client = redis.Redis(
@@ -14,6 +15,26 @@ redis_client = redis.Redis(
     username = CONFIG.redis_username,
     password = CONFIG.redis_pass
 )
+async_redis_client = aioredis.Redis(
+    host = CONFIG.redis_host,
+    port = CONFIG.redis_port,
+    decode_responses = True,
+    username = CONFIG.redis_username,
+    password = CONFIG.redis_pass
+)
+# Raw bytes, for values written through modules/database/redis/cache_codec.py
+redis_binary_client = redis.Redis(
+    host = CONFIG.redis_host,
+    port = CONFIG.redis_port,
+    username = CONFIG.redis_username,
+    password = CONFIG.redis_pass
+)
+async_redis_binary_client = aioredis.Redis(
+    host = CONFIG.redis_host,
+    port = CONFIG.redis_port,
+    username = CONFIG.redis_username,
+    password = CONFIG.redis_pass
+)
 
 def get_user_namespace(token_file: str = "modules/auth/token.json") -> str:
     try:
@@ -38,35 +59,136 @@ def redis_get_json(key:str):
         return json.loads(data)
     return None
 
-def redis_delete_pattern(pattern:str):
-    for key in redis_client.scan_iter(pattern):
-        redis_client.delete(key)
+CONVERSATION_TTL = 3600
 
 def get_converstaion_key(user_id: str):
+    # Legacy key: whole history as one JSON string (see migrate_legacy_conversation)
     return f"conversation:{user_id}:messages"
 
+def get_conversation_list_key(user_id: str):
+    # One JSON-encoded message per list element, appended with RPUSH
+    return f"conversation:{user_id}:history"
+
+def _encode_messages(messages:list) -> list:
+    # Inlined system prompts are stored as a version reference (see prompt_store)
+    return [json.dumps(compact_system_prompt(message_to_dict(msg))) for msg in messages]
+
+def migrate_legacy_conversation(user_id:str) -> bool:
+    """Move a conversation:{user_id}:messages string key into the list layout, keeping its TTL"""
+    legacy_key = get_converstaion_key(user_id)
+    data = redis_client.get(legacy_key)
+    if not data:
+        return False
+    messages = json.loads(data)
+    ttl = redis_client.ttl(legacy_key)
+    list_key = get_conversation_list_key(user_id)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(list_key)
+    if messages:
+        pipe.rpush(list_key,*_encode_messages(messages))
+        pipe.expire(list_key,ttl if ttl > 0 else CONVERSATION_TTL)
+    pipe.delete(legacy_key)
+    pipe.execute()
+    LOG.info(f"migrated {len(messages)} legacy messages to list storage for user {user_id}")
+    return True
+
+def migrate_legacy_conversations() -> int:
+    """One-off bulk migration of every legacy conversation key, e.g. before a deploy"""
+    migrated = 0
+    for key in redis_client.scan_iter("conversation:*:messages"):
+        user_id = key[len("conversation:"):-len(":messages")]
+        if migrate_legacy_conversation(user_id):
+            migrated += 1
+    return migrated
+
 def get_messages_from_redis(user_id:str):
-    key = get_converstaion_key(user_id)
+    key = get_conversation_list_key(user_id)
+    try:
+        data = redis_client.lrange(key,0,-1)
+        if not data and migrate_legacy_conversation(user_id):
+            data = redis_client.lrange(key,0,-1)
+        if data:
+            messages = [json.loads(item) for item in data]
+            if is_full_system_prompt(messages[0]):
+                # History written before prompt references: shrink it in place
+                messages[0] = system_prompt_reference()
+                redis_client.lset(key,0,json.dumps(messages[0]))
+            LOG.info(f"loaded {len(messages)} messages from Redis for user {user_id}")
+            return messages
+        else:
+            messages = [system_prompt_reference()]
+            append_messages_to_redis(user_id,messages)
+            return messages
+    except Exception as e:
+        LOG.error(f"Error loading from redis:{e}")
+        return [system_prompt_reference()]
+
+def append_messages_to_redis(user_id:str,new_messages:list,ttl:int = CONVERSATION_TTL):
+    """Append only the new messages and refresh the TTL in a single pipelined round trip"""
+    if not new_messages:
+        return
+    key = get_conversation_list_key(user_id)
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.rpush(key,*_encode_messages(new_messages))
+        pipe.expire(key,ttl)
+        length, _ = pipe.execute()
+        LOG.info(f"appended {len(new_messages)} messages to redis for user {user_id} (total {length})")
+
+    except Exception as e:
+        LOG.error(f"Error saving to redis: {e}")
+
+# ---------- Async variants (used by run_convo_async) ----------
+async def amigrate_legacy_conversation(user_id:str) -> bool:
+    legacy_key = get_converstaion_key(user_id)
+    data = await async_redis_client.get(legacy_key)
+    if not data:
+        return False
+    messages = json.loads(data)
+    ttl = await async_redis_client.ttl(legacy_key)
+    list_key = get_conversation_list_key(user_id)
+    pipe = async_redis_client.pipeline(transaction=True)
+    pipe.delete(list_key)
+    if messages:
+        pipe.rpush(list_key,*_encode_messages(messages))
+        pipe.expire(list_key,ttl if ttl > 0 else CONVERSATION_TTL)
+    pipe.delete(legacy_key)
+    await pipe.execute()
+    LOG.info(f"migrated {len(messages)} legacy messages to list storage for user {user_id}")
+    return True
+
+async def aget_messages_from_redis(user_id:str):
+    key = get_conversation_list_key(user_id)
     try:
-        data = redis_client.get(key)
+        data = await async_redis_client.lrange(key,0,-1)
+        if not data and await amigrate_legacy_conversation(user_id):
+            data = await async_redis_client.lrange(key,0,-1)
         if data:
-            messages = json.loads(data)
+            messages = [json.loads(item) for item in data]
+            if is_full_system_prompt(messages[0]):
+                # History written before prompt references: shrink it in place
+                messages[0] = system_prompt_reference()
+                await async_redis_client.lset(key,0,json.dumps(messages[0]))
             LOG.info(f"loaded {len(messages)} messages from Redis for user {user_id}")
             return messages
         else:
-            messages = [{"role":"system","content":system_prompt}]
-            save_messages_to_redis(user_id,messages)
+            messages = [system_prompt_reference()]
+            await aappend_messages_to_redis(user_id,messages)
             return messages
     except Exception as e:
         LOG.error(f"Error loading from redis:{e}")
+        return [system_prompt_reference()]
 
-def save_messages_to_redis(user_id:str,messages:list,ttl:int = 3600):
-    key = get_converstaion_key(user_id)
+async def aappend_messages_to_redis(user_id:str,new_messages:list,ttl:int = CONVERSATION_TTL):
+    if not new_messages:
+        return
+    key = get_conversation_list_key(user_id)
     try:
-        messages_dict = [message_to_dict(msg) for msg in messages]
-        redis_client.set(key,json.dumps(messages_dict))
-        redis_client.expire(key,ttl)
-        LOG.info(f"saved {len(messages_dict)} messages to redis for user {user_id}")
+        pipe = async_redis_client.pipeline(transaction=False)
+        pipe.rpush(key,*_encode_messages(new_messages))
+        pipe.expire(key,ttl)
+        length, _ = await pipe.execute()
+        LOG.info(f"appended {len(new_messages)} messages to redis for user {user_id} (total {length})")
 
     except Exception as e:
-        LOG.error(f"Error saving to redis: {e}")
\ No newline at end of file
+        LOG.error(f"Error saving to redis: {e}")
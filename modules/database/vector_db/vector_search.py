@@ -1,3 +1,4 @@
+import asyncio
 from qdrant_client.http import models
 from modules.database.vector_db.Qdrant import qdrant_cleint,embedding_model,collection_name
 from core.logger.logger import LOG
@@ -64,4 +65,16 @@ class VectorSearchService:
             return results
         except Exception as e:
             LOG.error(f"Error in vector search: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    async def asearch_conversations(
+            self,
+            query:str,
+            user_id:str,
+            limit:int = 20
+    ) -> List[Dict]:
+        """
+        Run search_conversations in a worker thread so the embedding model
+        and the Qdrant round trip do not block the event loop
+        """
+        return await asyncio.to_thread(self.search_conversations, query, user_id, limit)
@@ -1,19 +1,19 @@
+import re
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 from core.logger.logger import LOG
-from groq import Groq
+from groq import Groq, AsyncGroq
 from config import CONFIG
 client = Groq()
+async_client = AsyncGroq()
 # MODEL = CONFIG.model_name
 MODEL = "llama-3.1-8b-instant"
 
 
-def should_perform_vector_search(query: str, redis_messages: list) -> bool:
-    """
-    Use LLM to determine if vector search is needed based on query and Redis messages
-    """
-    if not redis_messages:
-        LOG.info("No Redis messages, performing vector search")
-        return True
-    
+def _build_gate_prompt(query: str, redis_messages: list) -> str:
     # Prepare the context for the LLM
     redis_context = ""
     if redis_messages:
@@ -22,7 +22,7 @@ def should_perform_vector_search(query: str, redis_messages: list) -> bool:
         redis_context = "\n".join([f"{msg.get('role', '')}: {msg.get('content', '')}" for msg in recent_messages])
     
     # Simplified, more direct prompt
-    prompt = f"""Current conversation:
+    return f"""Current conversation:
 redis data: {redis_context}
 
 User's new query: "{query}"
@@ -33,49 +33,334 @@ Answer with exactly one word: YES (information is present) or NO (need to search
 if information is empty and there is only user query and redis data is empty , return NO
 
 Answer:"""
+
+
+def _gate_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": "You are a helpful assistant that answers only with YES or NO."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _parse_gate_decision(response) -> bool:
+    # Log the full response object for debugging
+    LOG.info(f"Full LLM response object: {response}")
+    
+    # Check if we got a response
+    if not response.choices or len(response.choices) == 0:
+        LOG.warning("No choices in LLM response, defaulting to YES")
+        return True
+    
+    content = response.choices[0].message.content
+    LOG.info(f"Raw LLM response content: '{content}'")
+    
+    if not content:
+        LOG.warning("Empty content in LLM response, defaulting to YES")
+        return True
+        
+    decision = content.strip().upper()
+    LOG.info(f"LLM decision for vector search: '{decision}'")
+    
+    # More flexible matching
+    if "YES" in decision:
+        # YES means info IS present, so NO vector search needed
+        return False
+    elif "NO" in decision:
+        # NO means info NOT present, so YES vector search needed
+        return True
+    else:
+        LOG.warning(f"Unclear LLM response: '{decision}', defaulting to YES")
+        return True
+
+
+def llm_should_perform_vector_search(query: str, redis_messages: list) -> bool:
+    """
+    Use LLM to determine if vector search is needed based on query and Redis messages
+    """
+    if not redis_messages:
+        LOG.info("No Redis messages, performing vector search")
+        return True
+    
+    prompt = _build_gate_prompt(query, redis_messages)
     
     try:
         # Make a call to the LLM
         response = client.chat.completions.create(
             model=MODEL,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that answers only with YES or NO."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=_gate_messages(prompt),
             temperature=0,  # Zero temperature for deterministic output
             max_tokens=50  # Only need 1-2 tokens for YES/NO
         )
-        
-        # Log the full response object for debugging
-        LOG.info(f"Full LLM response object: {response}")
-        
-        # Check if we got a response
-        if not response.choices or len(response.choices) == 0:
-            LOG.warning("No choices in LLM response, defaulting to YES")
-            return True
-        
-        content = response.choices[0].message.content
-        LOG.info(f"Raw LLM response content: '{content}'")
-        
-        if not content:
-            LOG.warning("Empty content in LLM response, defaulting to YES")
-            return True
-            
-        decision = content.strip().upper()
-        LOG.info(f"LLM decision for vector search: '{decision}'")
-        
-        # More flexible matching
-        if "YES" in decision:
-            # YES means info IS present, so NO vector search needed
-            return False
-        elif "NO" in decision:
-            # NO means info NOT present, so YES vector search needed
-            return True
-        else:
-            LOG.warning(f"Unclear LLM response: '{decision}', defaulting to YES")
-            return True
+        return _parse_gate_decision(response)
             
     except Exception as e:
         LOG.error(f"Error determining vector search need: {e}", exc_info=True)
         # Default to performing vector search if there's an error
-        return True
\ No newline at end of file
+        return True
+
+
+async def allm_should_perform_vector_search(query: str, redis_messages: list) -> bool:
+    """
+    Async variant of llm_should_perform_vector_search using AsyncGroq
+    """
+    if not redis_messages:
+        LOG.info("No Redis messages, performing vector search")
+        return True
+
+    prompt = _build_gate_prompt(query, redis_messages)
+
+    try:
+        response = await async_client.chat.completions.create(
+            model=MODEL,
+            messages=_gate_messages(prompt),
+            temperature=0,
+            max_tokens=50
+        )
+        return _parse_gate_decision(response)
+
+    except Exception as e:
+        LOG.error(f"Error determining vector search need: {e}", exc_info=True)
+        return True
+
+
+# ---------------------------------------------------------------------------
+# Pluggable search gate
+#
+# True means "search past conversations in Qdrant", False means the recent
+# history already covers the query. The local gate answers from heuristics
+# and embedding similarity; when it is unsure it returns None and the
+# configured fallback (the LLM gate in "hybrid" mode) decides.
+# ---------------------------------------------------------------------------
+
+_RECALL_RE = re.compile(
+    r"\b(earlier|before|previous(ly)?|last time|yesterday|last (week|month)|ago|"
+    r"remember|recall|history|again|already|did (i|we|you)|have (i|we|you)|"
+    r"we (talked|discussed|spoke)|you (said|told|mentioned)|i (said|told|mentioned|asked))\b",
+    re.IGNORECASE
+)
+_FOLLOW_UP_RE = re.compile(
+    r"\b(him|her|them|it|his|their|its|that|this|those|these|same|above|he|she|they)\b",
+    re.IGNORECASE
+)
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_NUMBER_RE = re.compile(r"\+?\d[\d\s().-]{5,}\d")
+
+_GATE_HISTORY_MESSAGES = 6
+_GATE_TEXT_CHARS = 500
+_FOLLOW_UP_MAX_WORDS = 8
+_EMBEDDING_CACHE_SIZE = 2048
+
+
+def _history_texts(redis_messages: list) -> List[str]:
+    """User/assistant text of the most recent messages; tool payloads and prompts are skipped"""
+    texts = []
+    for msg in reversed(redis_messages or []):
+        if not isinstance(msg, dict) or msg.get("role") not in ("user", "assistant"):
+            continue
+        content = msg.get("content")
+        if isinstance(content, str) and content.strip():
+            texts.append(content[:_GATE_TEXT_CHARS])
+            if len(texts) >= _GATE_HISTORY_MESSAGES:
+                break
+    texts.reverse()
+    return texts
+
+
+def _digits(text: str) -> str:
+    return re.sub(r"\D", "", text)
+
+
+class _EmbeddingCache:
+    """
+    LRU of normalized sentence embeddings keyed by text hash, so history
+    messages are embedded once per process instead of on every turn.
+    """
+    def __init__(self, max_size: int = _EMBEDDING_CACHE_SIZE):
+        self.max_size = max_size
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, texts: List[str]):
+        from modules.database.vector_db.Qdrant import embedding_model
+
+        keys = [hashlib.sha1(text.encode()).hexdigest() for text in texts]
+        vectors = {}
+        with self._lock:
+            for key in keys:
+                if key in self._vectors:
+                    self._vectors.move_to_end(key)
+                    vectors[key] = self._vectors[key]
+        missing = [(key, text) for key, text in zip(keys, texts) if key not in vectors]
+        if missing:
+            encoded = embedding_model.encode(
+                [text for _, text in missing],
+                normalize_embeddings=True,
+                convert_to_numpy=True
+            )
+            with self._lock:
+                for (key, _), vector in zip(missing, encoded):
+                    vectors[key] = vector
+                    self._vectors[key] = vector
+                while len(self._vectors) > self.max_size:
+                    self._vectors.popitem(last=False)
+        return [vectors[key] for key in keys]
+
+
+EMBEDDING_CACHE = _EmbeddingCache()
+
+
+def embed_texts(texts: List[str]):
+    """Normalized embeddings for `texts`, served from the shared process-wide LRU"""
+    return EMBEDDING_CACHE.encode(texts)
+
+
+def is_follow_up(query: str) -> bool:
+    """Short query leaning on something said just before ("update his phone")"""
+    return len(query.split()) <= _FOLLOW_UP_MAX_WORDS and bool(_FOLLOW_UP_RE.search(query))
+
+
+def is_context_dependent(query: str) -> bool:
+    """True when the answer depends on the conversation, not only on the query and CRM data"""
+    return bool(_RECALL_RE.search(query)) or is_follow_up(query)
+
+
+class SearchGate:
+    """Decides whether a turn needs vector search over past conversations"""
+    name = "base"
+
+    def decide(self, query: str, redis_messages: list) -> Optional[bool]:
+        raise NotImplementedError
+
+    async def adecide(self, query: str, redis_messages: list) -> Optional[bool]:
+        return await asyncio.to_thread(self.decide, query, redis_messages)
+
+
+class LLMSearchGate(SearchGate):
+    """The original YES/NO prompt against llama-3.1-8b-instant"""
+    name = "llm"
+
+    def decide(self, query: str, redis_messages: list) -> Optional[bool]:
+        return llm_should_perform_vector_search(query, redis_messages)
+
+    async def adecide(self, query: str, redis_messages: list) -> Optional[bool]:
+        return await allm_should_perform_vector_search(query, redis_messages)
+
+
+class LocalSearchGate(SearchGate):
+    """
+    Heuristics first, then cosine similarity between the query and the
+    recent history. Similarity >= high means the history covers the query,
+    <= low means it does not; anything in between is reported as unsure (None).
+    """
+    name = "local"
+
+    def __init__(self, high: float = None, low: float = None, cache: _EmbeddingCache = None):
+        self.high = high if high is not None else CONFIG.search_gate_high
+        self.low = low if low is not None else CONFIG.search_gate_low
+        self.cache = cache or EMBEDDING_CACHE
+
+    def _heuristics(self, query: str, texts: List[str]) -> Tuple[Optional[bool], str]:
+        if not texts:
+            return True, "empty_history"
+        if _RECALL_RE.search(query):
+            return True, "recall_cue"
+
+        history = "\n".join(texts).lower()
+        emails = _EMAIL_RE.findall(query)
+        numbers = [_digits(n) for n in _NUMBER_RE.findall(query)]
+        if emails or numbers:
+            history_digits = _digits(history)
+            present = all(e.lower() in history for e in emails) and all(n in history_digits for n in numbers)
+            return (False, "identifier_in_history") if present else (True, "identifier_not_in_history")
+
+        if is_follow_up(query):
+            return False, "follow_up"
+        return None, ""
+
+    def _similarity(self, query: str, texts: List[str]) -> Tuple[Optional[bool], str]:
+        vectors = self.cache.encode([query] + texts)
+        score = max(float(vectors[0] @ vector) for vector in vectors[1:])
+        if score >= self.high:
+            return False, f"similar:{score:.2f}"
+        if score <= self.low:
+            return True, f"dissimilar:{score:.2f}"
+        return None, f"unsure:{score:.2f}"
+
+    def classify(self, query: str, redis_messages: list) -> Tuple[Optional[bool], str]:
+        """Return (decision, reason); decision is None when the gate is unsure"""
+        texts = _history_texts(redis_messages)
+        decision, reason = self._heuristics(query, texts)
+        if reason:
+            return decision, reason
+        return self._similarity(query, texts)
+
+    def decide(self, query: str, redis_messages: list) -> Optional[bool]:
+        decision, reason = self.classify(query, redis_messages)
+        LOG.info(f"Local search gate: {decision} ({reason})")
+        return decision
+
+    async def adecide(self, query: str, redis_messages: list) -> Optional[bool]:
+        texts = _history_texts(redis_messages)
+        decision, reason = self._heuristics(query, texts)
+        if not reason:
+            # Only the embedding step touches the model; keep it off the event loop
+            decision, reason = await asyncio.to_thread(self._similarity, query, texts)
+        LOG.info(f"Local search gate: {decision} ({reason})")
+        return decision
+
+
+class FallbackSearchGate(SearchGate):
+    """Ask `primary`; when it is unsure, ask `fallback` (or default to searching)"""
+    def __init__(self, primary: SearchGate, fallback: Optional[SearchGate] = None):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}" if fallback else primary.name
+
+    def decide(self, query: str, redis_messages: list) -> bool:
+        try:
+            decision = self.primary.decide(query, redis_messages)
+        except Exception as e:
+            LOG.error(f"Search gate {self.primary.name} failed: {e}", exc_info=True)
+            decision = None
+        if decision is None:
+            decision = self.fallback.decide(query, redis_messages) if self.fallback else True
+        return decision
+
+    async def adecide(self, query: str, redis_messages: list) -> bool:
+        try:
+            decision = await self.primary.adecide(query, redis_messages)
+        except Exception as e:
+            LOG.error(f"Search gate {self.primary.name} failed: {e}", exc_info=True)
+            decision = None
+        if decision is None:
+            decision = await self.fallback.adecide(query, redis_messages) if self.fallback else True
+        return decision
+
+
+def build_search_gate(mode: str = None) -> SearchGate:
+    """
+    CONFIG.search_gate:
+      "local"  - local gate only, unsure cases search
+      "hybrid" - local gate, unsure cases go to the LLM gate
+      "llm"    - LLM gate on every turn (previous behaviour)
+    """
+    mode = (mode or CONFIG.search_gate).lower()
+    if mode == "llm":
+        return FallbackSearchGate(LLMSearchGate())
+    if mode == "local":
+        return FallbackSearchGate(LocalSearchGate())
+    if mode != "hybrid":
+        LOG.warning(f"Unknown SEARCH_GATE '{mode}', using hybrid")
+    return FallbackSearchGate(LocalSearchGate(), LLMSearchGate())
+
+
+SEARCH_GATE = build_search_gate()
+
+
+def should_perform_vector_search(query: str, redis_messages: list) -> bool:
+    """Ask the configured search gate whether past conversations should be searched"""
+    return SEARCH_GATE.decide(query, redis_messages)
+
+
+async def ashould_perform_vector_search(query: str, redis_messages: list) -> bool:
+    return await SEARCH_GATE.adecide(query, redis_messages)
@@ -1,8 +1,14 @@
 from fastapi import APIRouter
+from modules.crud_ops.rate_limiter import get_rate_limit_stats
 
 
 health_router = APIRouter()
 
 @health_router.get('/healthcheck')
 async def health_check() -> dict:
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@health_router.get('/hubspot/rate_limit')
+async def hubspot_rate_limit() -> dict:
+    """Requests, time spent throttled and 429s per priority, shared by all workers"""
+    return {"hubspot_rate_limit": get_rate_limit_stats()}
@@ -0,0 +1,33 @@
+import json
+import asyncio
+from fastapi import APIRouter, HTTPException, Request #type: ignore
+from core.logger.logger import LOG
+from modules.crud_ops.contacts.contact_events import enqueue_events
+from modules.database.redis.redis_client import get_user_namespace
+from modules.webhooks.signature import verify_signature
+
+webhooks_router = APIRouter()
+
+
+@webhooks_router.post("/hubspot")
+async def hubspot_webhook(request: Request):
+    """
+    Contact creation, property change, deletion and merge events from a
+    HubSpot webhook subscription. They are queued and applied in batches, so
+    HubSpot gets its answer well within its timeout.
+    """
+    body = await request.body()
+    if not verify_signature(request.method, str(request.url), body, request.headers):
+        LOG.warning("Rejected HubSpot webhook with an invalid signature")
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    try:
+        events = json.loads(body or b"[]")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body is not JSON")
+    if isinstance(events, dict):
+        events = [events]
+
+    user_ns = await asyncio.to_thread(get_user_namespace)
+    queued = await asyncio.to_thread(enqueue_events, user_ns, events)
+    LOG.info(f"HubSpot webhook: {len(events)} events, {queued} queued")
+    return {"received": len(events), "queued": queued}
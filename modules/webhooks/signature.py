@@ -0,0 +1,54 @@
+import hmac
+import time
+import base64
+import hashlib
+from typing import Mapping
+from urllib.parse import unquote
+from config import CONFIG
+
+# HubSpot request signatures, keyed by the app's client secret.
+#
+#   v3  X-HubSpot-Signature-v3: base64 HMAC-SHA256 of method + uri + body + timestamp,
+#       with X-HubSpot-Request-Timestamp (ms) no older than five minutes
+#   v2  X-HubSpot-Signature: hex SHA-256 of secret + method + uri + body
+#   v1  X-HubSpot-Signature: hex SHA-256 of secret + body
+#
+# v3 is checked whenever HubSpot sends it; otherwise X-HubSpot-Signature-Version
+# picks v1 or v2. Behind a proxy the URL HubSpot called is not the one the app
+# sees, so CONFIG.hubspot_webhook_url can name it.
+MAX_TIMESTAMP_AGE_MS = 300_000
+
+
+def _request_uri(url: str) -> str:
+    if CONFIG.hubspot_webhook_url:
+        query = url.partition("?")[2]
+        url = f"{CONFIG.hubspot_webhook_url}?{query}" if query else CONFIG.hubspot_webhook_url
+    return url
+
+
+def _v3_valid(secret: str, method: str, uri: str, body: bytes, headers: Mapping[str, str]) -> bool:
+    timestamp = headers.get("x-hubspot-request-timestamp", "")
+    try:
+        if abs(time.time() * 1000 - int(timestamp)) > MAX_TIMESTAMP_AGE_MS:
+            return False
+    except ValueError:
+        return False
+    source = f"{method}{unquote(uri)}".encode() + body + timestamp.encode()
+    expected = base64.b64encode(hmac.new(secret.encode(), source, hashlib.sha256).digest()).decode()
+    return hmac.compare_digest(expected, headers.get("x-hubspot-signature-v3", ""))
+
+
+def verify_signature(method: str, url: str, body: bytes, headers: Mapping[str, str]) -> bool:
+    secret = CONFIG.hubspot_client_secret or ""
+    if not secret:
+        return False
+    uri = _request_uri(url)
+    if headers.get("x-hubspot-signature-v3"):
+        return _v3_valid(secret, method, uri, body, headers)
+
+    signature = headers.get("x-hubspot-signature", "")
+    if headers.get("x-hubspot-signature-version", "v1").lower() == "v2":
+        source = f"{secret}{method}{uri}".encode() + body
+    else:
+        source = secret.encode() + body
+    return bool(signature) and hmac.compare_digest(hashlib.sha256(source).hexdigest(), signature)
@@ -0,0 +1,6 @@
+from fastapi import APIRouter
+from modules.webhooks.routes import webhooks_router
+# Router for incoming webhooks (HubSpot)
+API_ROUTER = APIRouter(prefix="/webhooks", tags=["webhooks"])
+
+API_ROUTER.include_router(webhooks_router)
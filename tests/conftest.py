@@ -0,0 +1,75 @@
+import os
+import sys
+import types
+import fakeredis
+import mongomock
+import pymongo
+import pytest
+
+# config.py validates these at import; the tests never reach the services behind them
+for name, value in {
+    "GROQ_API_KEY": "test", "MODEL_NAME": "test", "HUBSPOT_CLIENT_ID": "test", "HUBSPOT_CLIENT_SECRET": "test",
+    "HUBSPOT_REDIRECT_URI": "http://localhost", "HUBSPOT_BASE_URL": "https://api.hubapi.com",
+    "API_BASE_URL": "http://localhost", "EMAIL_SMTP_SERVER": "localhost", "EMAIL_SMTP_PORT": "587",
+    "EMAIL_USERNAME": "test", "EMAIL_PASSWORD": "test", "MONGO_URI": "mongodb://localhost:27017", "MONGO_DB": "test",
+    "REDIS_HOST": "localhost", "REDIS_PORT": "6379", "REDIS_USERNAME": "", "REDIS_PASSWORD": "",
+    "REDIS_URL": "redis://localhost:6379", "VECTOR_DB_URL": "http://localhost:6333", "VECTOR_DB_API": "",
+    "QDRANT_COLLECTION": "test", "EMBEDING_MODEL": "test", "CELERY_BROKER_URL": "memory://",
+    "CELERY_RESULT_BACKEND": "cache+memory://",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def contact_cache(monkeypatch):
+    """contact_cache with its Redis clients on one in-memory fakeredis server"""
+    from modules.database.redis import contact_cache as module
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(module, "redis_client", fakeredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(module, "redis_binary_client", fakeredis.FakeRedis(server=server))
+    monkeypatch.setattr(module, "async_redis_client", fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(module, "async_redis_binary_client", fakeredis.FakeAsyncRedis(server=server))
+    monkeypatch.setattr(module, "_POLL_SECONDS", 0.01)
+    module._flights.clear()
+    module._aflights.clear()
+    return module
+
+
+@pytest.fixture
+def idempotency(monkeypatch):
+    """idempotency with its Redis clients on one in-memory fakeredis server"""
+    from modules.crud_ops import idempotency as module
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(module, "redis_client", fakeredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(module, "async_redis_client", fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(module, "_POLL_SECONDS", 0.01)
+    return module
+
+
+@pytest.fixture
+def rate_limiter(monkeypatch):
+    """rate_limiter on an in-memory fakeredis server (Lua via lupa), with a fresh RATE_LIMITER"""
+    from modules.crud_ops import rate_limiter as module
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(module, "redis_client", fakeredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(module, "async_redis_client", fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(module, "RATE_LIMITER", module.HubSpotRateLimiter())
+    return module
+
+
+@pytest.fixture
+def contact_events(monkeypatch):
+    """
+    contact_events on fakeredis, with the index drop and the Celery task recorded
+    in `unindexed` and `scheduled`. Importing it reaches the mirror's database,
+    which is mongomock here.
+    """
+    monkeypatch.setattr(pymongo, "MongoClient", mongomock.MongoClient)
+    from modules.crud_ops.contacts import contact_events as module
+    monkeypatch.setattr(module, "redis_client", fakeredis.FakeRedis(decode_responses=True))
+    module.unindexed, module.scheduled = [], []
+    monkeypatch.setattr(module, "unindex_contacts", lambda user_ns, ids: module.unindexed.extend(ids))
+    task = types.SimpleNamespace(apply_async=lambda **kwargs: module.scheduled.append(kwargs))
+    monkeypatch.setitem(sys.modules, "modules.celery.contact_sync_tasks", types.SimpleNamespace(apply_contact_events_task=task))
+    yield module
+    del module.unindexed, module.scheduled
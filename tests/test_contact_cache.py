@@ -0,0 +1,187 @@
+import time
+import asyncio
+import threading
+from config import CONFIG
+
+NS = "user:test"
+
+
+class Loader:
+    """Counts its calls; each call returns the next value after `delay` seconds"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return [{"id": str(self.calls)}]
+
+    async def aload(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return [{"id": str(self.calls)}]
+
+
+def _stored(contact_cache, kind: str = "all"):
+    key = contact_cache.contact_cache_key(NS, contact_cache.contact_generation(NS), kind)
+    entry = contact_cache._decode(contact_cache.redis_binary_client.get(key))
+    return entry["value"] if entry else None
+
+
+def _wait_until(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+# ---------- Single-flight ----------
+def test_concurrent_misses_share_one_load(contact_cache):
+    loader = Loader(delay=0.2)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(contact_cache.cached_load(NS, "all", loader)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loader.calls == 1
+    assert results == [[{"id": "1"}]] * 8
+    assert not contact_cache.redis_client.exists(contact_cache._lock_key(contact_cache.contact_cache_key(NS, "0", "all")))
+
+
+def test_miss_waits_for_the_lock_holder_of_another_worker(contact_cache):
+    key = contact_cache.contact_cache_key(NS, "0", "all")
+    contact_cache.redis_client.set(contact_cache._lock_key(key), "other-worker", ex=30)
+
+    def other_worker():
+        time.sleep(0.1)
+        contact_cache.redis_binary_client.set(key, contact_cache._encode([{"id": "theirs"}]))
+        contact_cache.redis_client.delete(contact_cache._lock_key(key))
+
+    threading.Thread(target=other_worker).start()
+    loader = Loader()
+
+    assert contact_cache.cached_load(NS, "all", loader) == [{"id": "theirs"}]
+    assert loader.calls == 0
+
+
+def test_loader_error_reaches_every_waiter_and_is_not_cached(contact_cache):
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("HubSpot down")
+
+    errors = []
+
+    def call():
+        try:
+            contact_cache.cached_load(NS, "all", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ["HubSpot down"] * 4
+    assert _stored(contact_cache) is None
+
+
+def test_async_concurrent_misses_share_one_load(contact_cache):
+    loader = Loader(delay=0.1)
+
+    async def run():
+        return await asyncio.gather(*(contact_cache.acached_load(NS, "all", loader.aload) for _ in range(8)))
+
+    results = asyncio.run(run())
+
+    assert loader.calls == 1
+    assert results == [[{"id": "1"}]] * 8
+
+
+# ---------- Stale-while-revalidate ----------
+def test_expired_entry_is_served_while_it_refreshes(contact_cache, monkeypatch):
+    monkeypatch.setattr(CONFIG, "contacts_cache_ttl_seconds", 0)
+    monkeypatch.setattr(CONFIG, "contacts_cache_stale_seconds", 60)
+    loader = Loader(delay=0.1)
+    assert contact_cache.cached_load(NS, "all", loader) == [{"id": "1"}]
+
+    # Past fresh_until: the old value comes back at once and one refresh runs behind it
+    assert contact_cache.cached_load(NS, "all", loader) == [{"id": "1"}]
+    assert contact_cache.cached_load(NS, "all", loader) == [{"id": "1"}]
+
+    assert _wait_until(lambda: _stored(contact_cache) == [{"id": "2"}])
+    assert _wait_until(lambda: not contact_cache._flights)
+    assert loader.calls == 2
+
+
+def test_fresh_entry_is_not_reloaded(contact_cache):
+    loader = Loader()
+    contact_cache.cached_load(NS, "all", loader)
+    contact_cache.cached_load(NS, "all", loader)
+
+    assert loader.calls == 1
+
+
+def test_async_expired_entry_is_served_while_it_refreshes(contact_cache, monkeypatch):
+    monkeypatch.setattr(CONFIG, "contacts_cache_ttl_seconds", 0)
+    monkeypatch.setattr(CONFIG, "contacts_cache_stale_seconds", 60)
+    loader = Loader(delay=0.05)
+
+    async def run():
+        first = await contact_cache.acached_load(NS, "all", loader.aload)
+        stale = await contact_cache.acached_load(NS, "all", loader.aload)
+        await asyncio.gather(*contact_cache._background)
+        return first, stale
+
+    first, stale = asyncio.run(run())
+
+    assert first == stale == [{"id": "1"}]
+    assert _stored(contact_cache) == [{"id": "2"}]
+    assert loader.calls == 2
+
+
+# ---------- Generation bump after writes ----------
+def test_write_bumps_the_generation_and_retires_cached_reads(contact_cache):
+    loader = Loader()
+    contact_cache.contact_cache_set(NS, "0", "contact", {"id": "7"}, "7")
+    assert contact_cache.cached_load(NS, "all", loader) == [{"id": "1"}]
+
+    contact_cache.invalidate_contact_cache(NS)
+
+    assert contact_cache.contact_generation(NS) == "1"
+    assert contact_cache.contact_cache_get(NS, "1", "contact", "7") is None
+    assert contact_cache.cached_load(NS, "all", loader) == [{"id": "2"}]
+    assert loader.calls == 2
+
+
+def test_load_overlapping_a_write_is_stored_under_the_old_generation(contact_cache):
+    def load_during_write():
+        contact_cache.invalidate_contact_cache(NS)
+        return [{"id": "before-write"}]
+
+    assert contact_cache.cached_load(NS, "all", load_during_write) == [{"id": "before-write"}]
+
+    loader = Loader()
+    assert contact_cache.cached_load(NS, "all", loader) == [{"id": "1"}]
+    assert loader.calls == 1
+
+
+def test_async_write_bumps_the_generation(contact_cache):
+    loader = Loader()
+
+    async def run():
+        before = await contact_cache.acached_load(NS, "all", loader.aload)
+        await contact_cache.ainvalidate_contact_cache(NS)
+        return before, await contact_cache.acontact_generation(NS), await contact_cache.acached_load(NS, "all", loader.aload)
+
+    before, generation, after = asyncio.run(run())
+
+    assert (before, generation, after) == ([{"id": "1"}], "1", [{"id": "2"}])
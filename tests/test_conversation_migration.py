@@ -0,0 +1,26 @@
+import json
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    from modules.database.redis import redis_client as module
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(module, "redis_client", client)
+    return client
+
+
+def test_migrate_moves_every_legacy_conversation(redis_client):
+    from modules.database.redis import migrate
+    messages = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    redis_client.set("conversation:a:messages", json.dumps(messages), ex=120)
+    redis_client.set("conversation:b:messages", json.dumps(messages[:1]))
+
+    assert migrate.main() == 2
+
+    assert not redis_client.exists("conversation:a:messages", "conversation:b:messages")
+    assert [json.loads(item) for item in redis_client.lrange("conversation:a:history", 0, -1)] == messages
+    assert 0 < redis_client.ttl("conversation:a:history") <= 120
+    assert redis_client.llen("conversation:b:history") == 1
+    assert migrate.main() == 0
@@ -0,0 +1,135 @@
+import time
+import asyncio
+import threading
+
+NS = "user:test"
+
+
+class Write:
+    """Counts its calls and returns `response` after `delay` seconds"""
+
+    def __init__(self, response=None, delay: float = 0.0):
+        self.response = response if response is not None else {"message": "contact_created", "data": {"id": "1"}}
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.response
+
+    async def acall(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.response
+
+
+def _tool_call(idempotency, write, arguments: dict):
+    key = idempotency.tool_key("create_contact", arguments.get("email"), arguments)
+    return idempotency.run_idempotent(NS, key, idempotency.payload_hash(arguments), write, same_writes_only=True)
+
+
+# ---------- Agent tool keys ----------
+def test_same_tool_call_is_replayed(idempotency):
+    write = Write()
+    arguments = {"email": "jane@example.com", "firstname": "Jane"}
+
+    first = _tool_call(idempotency, write, arguments)
+    second = _tool_call(idempotency, write, arguments)
+
+    assert first == (write.response, False)
+    assert second == (write.response, True)
+    assert write.calls == 1
+
+
+def test_write_in_between_invalidates_a_tool_key(idempotency):
+    set_a, set_b = Write({"message": "Contact updated", "data": {"phone": "A"}}), Write({"message": "Contact updated", "data": {"phone": "B"}})
+    to_a, to_b = {"contact_id": "7", "phone": "A"}, {"contact_id": "7", "phone": "B"}
+
+    _tool_call(idempotency, set_a, to_a)
+    _tool_call(idempotency, set_b, to_b)
+    response, replayed = _tool_call(idempotency, set_a, to_a)
+
+    assert (response, replayed) == (set_a.response, False)
+    assert (set_a.calls, set_b.calls) == (2, 1)
+
+
+def test_repeat_while_the_first_runs_waits_for_its_response(idempotency):
+    write = Write(delay=0.2)
+    arguments = {"email": "jane@example.com"}
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(_tool_call(idempotency, write, arguments))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert write.calls == 1
+    assert sorted(replayed for _, replayed in results) == [False, True, True]
+
+
+# ---------- Failures are not kept ----------
+def test_failed_batch_is_not_stored(idempotency):
+    write = Write({"succeeded": 1, "failed": 1, "results": [{"index": 0}, {"index": 1, "error": 409}]})
+    arguments = {"contacts": [{"email": "a@example.com"}, {"email": "b@example.com"}]}
+
+    _tool_call(idempotency, write, arguments)
+    response, replayed = _tool_call(idempotency, write, arguments)
+
+    assert not replayed
+    assert write.calls == 2
+    assert not idempotency.redis_client.exists(idempotency._writes_key(NS))
+
+
+def test_error_response_is_not_stored(idempotency):
+    write = Write({"error": 500, "details": "HubSpot down"})
+
+    _tool_call(idempotency, write, {"email": "jane@example.com"})
+    _tool_call(idempotency, write, {"email": "jane@example.com"})
+
+    assert write.calls == 2
+
+
+def test_exception_releases_the_key(idempotency):
+    def failing():
+        raise RuntimeError("timeout")
+
+    key = idempotency.tool_key("delete_contact", "7", {"contact_id": "7"})
+    try:
+        idempotency.run_idempotent(NS, key, "fp", failing)
+    except RuntimeError:
+        pass
+
+    assert not idempotency.redis_client.exists(idempotency._redis_key(NS, key))
+
+
+# ---------- REST Idempotency-Key header ----------
+def _rest_call(idempotency, write, header: str, payload: dict):
+    # Same key and fingerprint as routes._once
+    fingerprint = idempotency.payload_hash({"route": "create_contact", "payload": payload})
+    return asyncio.run(idempotency.arun_idempotent(NS, idempotency.rest_key(header), fingerprint, write.acall))
+
+
+def test_rest_key_replays_the_first_response(idempotency):
+    write = Write()
+    payload = {"email": "jane@example.com"}
+
+    first = _rest_call(idempotency, write, "key-1", payload)
+    # Writes through other keys do not retire a REST key
+    _rest_call(idempotency, Write(), "key-2", {"email": "john@example.com"})
+    second = _rest_call(idempotency, write, "key-1", payload)
+
+    assert first == (write.response, False)
+    assert second == (write.response, True)
+    assert write.calls == 1
+
+
+def test_rest_key_reused_with_another_body_is_rejected(idempotency):
+    write = Write()
+    _rest_call(idempotency, write, "key-1", {"email": "jane@example.com"})
+
+    response, replayed = _rest_call(idempotency, write, "key-1", {"email": "john@example.com"})
+
+    assert response["error"] == 422
+    assert not replayed
+    assert write.calls == 1
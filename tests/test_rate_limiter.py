@@ -0,0 +1,108 @@
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import httpx
+import pytest
+from config import CONFIG
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """10 calls per 10s (one token a second), 30% kept for interactive calls, no waiting"""
+    monkeypatch.setattr(CONFIG, "hubspot_rate_limit_enabled", True)
+    monkeypatch.setattr(CONFIG, "hubspot_rate_limit_per_10s", 10)
+    monkeypatch.setattr(CONFIG, "hubspot_interactive_reserve", 0.3)
+    monkeypatch.setattr(CONFIG, "hubspot_daily_limit", 250000)
+    monkeypatch.setattr(CONFIG, "hubspot_rate_limit_max_wait_seconds", 0)
+    monkeypatch.setattr(CONFIG, "hubspot_max_retries", 3)
+
+
+def _acquired(rate_limiter, priority: str, attempts: int) -> int:
+    """How many of `attempts` acquires got a token before the first one had to wait"""
+    with rate_limiter.rate_limit_priority(priority):
+        for count in range(attempts):
+            try:
+                rate_limiter.RATE_LIMITER.acquire()
+            except rate_limiter.RateLimitExceeded:
+                return count
+    return attempts
+
+
+def _429(retry_after: str = None, policy: str = "TEN_SECONDLY_ROLLING") -> httpx.Response:
+    headers = {"Retry-After": retry_after} if retry_after else {}
+    return httpx.Response(429, headers=headers, json={"status": "error", "policyName": policy})
+
+
+def _blocked_for(rate_limiter) -> float:
+    return (int(rate_limiter.redis_client.get("hubspot_rate:blocked_until") or 0) - time.time() * 1000) / 1000
+
+
+# ---------- Priorities ----------
+def test_background_calls_leave_the_interactive_reserve(rate_limiter, budget):
+    assert _acquired(rate_limiter, "background", 10) == 7
+    assert _acquired(rate_limiter, "interactive", 10) == 3
+
+    stats = rate_limiter.get_rate_limit_stats()
+    assert stats["background"]["requests"] == 7
+    assert stats["interactive"]["requests"] == 3
+    assert stats["wait_timeouts"] == 2
+
+
+def test_background_daily_budget_stops_before_interactive(rate_limiter, budget, monkeypatch):
+    monkeypatch.setattr(CONFIG, "hubspot_rate_limit_per_10s", 1000)
+    monkeypatch.setattr(CONFIG, "hubspot_daily_limit", 10)
+
+    with pytest.raises(rate_limiter.RateLimitExceeded, match="daily"):
+        with rate_limiter.rate_limit_priority("background"):
+            for _ in range(10):
+                rate_limiter.RATE_LIMITER.acquire()
+
+    assert rate_limiter.get_rate_limit_stats()["calls_today"] == 7
+    assert _acquired(rate_limiter, "interactive", 3) == 3
+
+
+def test_async_acquire_shares_the_bucket(rate_limiter, budget):
+    async def run():
+        for _ in range(11):
+            await rate_limiter.RATE_LIMITER.aacquire()
+
+    with pytest.raises(rate_limiter.RateLimitExceeded):
+        asyncio.run(run())
+    assert _acquired(rate_limiter, "interactive", 1) == 0
+
+
+# ---------- Retry-After ----------
+def test_retry_after_seconds_and_http_date():
+    from modules.crud_ops.rate_limiter import retry_after_seconds
+    in_5s = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=5), usegmt=True)
+
+    assert retry_after_seconds(_429("2"), 0) == 2.0
+    assert 3.0 < retry_after_seconds(_429(in_5s), 0) <= 5.0
+    assert retry_after_seconds(_429(), 2) == 4.0
+    assert retry_after_seconds(_429("soon"), 10) == 10.0
+
+
+def test_429_pauses_every_caller(rate_limiter, budget):
+    delay = rate_limiter.RATE_LIMITER.retry_delay(_429("3"), 0)
+
+    assert delay == 3.0
+    assert 2.5 < _blocked_for(rate_limiter) <= 3.0
+    assert _acquired(rate_limiter, "interactive", 1) == 0
+
+
+def test_shorter_retry_after_does_not_cut_the_pause(rate_limiter, budget):
+    rate_limiter.RATE_LIMITER.retry_delay(_429("5"), 0)
+    rate_limiter.RATE_LIMITER.retry_delay(_429("1"), 0)
+
+    assert _blocked_for(rate_limiter) > 4.0
+    assert rate_limiter.redis_client.pttl("hubspot_rate:blocked_until") > 4000
+
+
+def test_daily_429_and_last_attempt_are_not_retried(rate_limiter, budget):
+    assert rate_limiter.RATE_LIMITER.retry_delay(_429("1", policy="DAILY"), 0) is None
+    assert rate_limiter.RATE_LIMITER.retry_delay(_429("1"), 3) is None
+
+    assert not rate_limiter.redis_client.exists("hubspot_rate:blocked_until")
+    stats = rate_limiter.get_rate_limit_stats()
+    assert (stats["responses_429"], stats["retries_429"]) == (2, 0)
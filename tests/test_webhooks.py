@@ -0,0 +1,117 @@
+import pytest
+from config import CONFIG
+from modules.webhooks import signature
+
+# Inputs and v1/v2 hashes of the examples in HubSpot's "Validating requests" docs
+SECRET = "yyyyyyyy-yyyy-yyyy-yyyy-yyyyyyyyyyyy"
+V1_BODY = (
+    b'[{"eventId":1,"subscriptionId":12345,"portalId":62515,"occurredAt":1564113600000,'
+    b'"subscriptionType":"contact.creation","attemptNumber":0,"objectId":123,"changeSource":"CRM",'
+    b'"changeFlag":"NEW","appId":54321}]'
+)
+V1_SIGNATURE = "232db2615f3d666fe21a8ec971ac7b5402d33b9a925784df3ca654d05f4817de"
+URI = "https://www.example.com/webhook_uri"
+BODY = b'{"example_field":"example_value"}'
+V2_SIGNATURE = "9569219f8ba981ffa6f6f16aa0f48637d35d728c7e4d93d0d52efaa512af7900"
+TIMESTAMP = "1564113600000"
+V3_SIGNATURE = "eT0ip2TKVpsIi1vb5C2Uu42eNdHL+oTE3NRZOF67O2U="
+V3_QUERY_SIGNATURE = "DS88nZ8t1+ZpScW5wCKD81+F0g4otuztQSmTMNEXIxU="
+NS = "user:test"
+
+
+@pytest.fixture
+def secret(monkeypatch):
+    monkeypatch.setattr(CONFIG, "hubspot_client_secret", SECRET)
+    monkeypatch.setattr(CONFIG, "hubspot_webhook_url", None)
+
+
+@pytest.fixture
+def at_timestamp(monkeypatch):
+    """time.time() at TIMESTAMP plus `offset` seconds"""
+    def at(offset: float = 0.0):
+        monkeypatch.setattr(signature.time, "time", lambda: int(TIMESTAMP) / 1000 + offset)
+    return at
+
+
+def _v3_headers(value: str = V3_SIGNATURE) -> dict:
+    return {"x-hubspot-signature-v3": value, "x-hubspot-request-timestamp": TIMESTAMP}
+
+
+# ---------- Signatures ----------
+def test_v1_signature(secret):
+    assert signature.verify_signature("POST", URI, V1_BODY, {"x-hubspot-signature": V1_SIGNATURE})
+    assert not signature.verify_signature("POST", URI, V1_BODY + b" ", {"x-hubspot-signature": V1_SIGNATURE})
+    assert not signature.verify_signature("POST", URI, V1_BODY, {})
+
+
+def test_v2_signature(secret):
+    headers = {"x-hubspot-signature": V2_SIGNATURE, "x-hubspot-signature-version": "v2"}
+
+    assert signature.verify_signature("POST", URI, BODY, headers)
+    assert not signature.verify_signature("POST", URI + "?x=1", BODY, headers)
+    assert not signature.verify_signature("POST", URI, BODY, dict(headers, **{"x-hubspot-signature-version": "v1"}))
+
+
+def test_v3_signature(secret, at_timestamp):
+    at_timestamp(60)
+
+    assert signature.verify_signature("POST", URI, BODY, _v3_headers())
+    # Percent-encoded characters of the URI are signed decoded
+    assert signature.verify_signature("POST", URI + "?portal=62515&name=Jane%20Doe", BODY, _v3_headers(V3_QUERY_SIGNATURE))
+    assert not signature.verify_signature("GET", URI, BODY, _v3_headers())
+    # v3 wins over a valid v2 signature sent alongside it
+    assert not signature.verify_signature(
+        "POST", URI, BODY, dict(_v3_headers("invalid"), **{"x-hubspot-signature": V2_SIGNATURE, "x-hubspot-signature-version": "v2"})
+    )
+
+
+def test_v3_rejects_old_timestamps(secret, at_timestamp):
+    at_timestamp(301)
+
+    assert not signature.verify_signature("POST", URI, BODY, _v3_headers())
+
+
+def test_public_webhook_url_replaces_the_url_seen_behind_a_proxy(secret, at_timestamp, monkeypatch):
+    monkeypatch.setattr(CONFIG, "hubspot_webhook_url", URI)
+    at_timestamp()
+
+    assert signature.verify_signature("POST", "http://app:8000/api/v1/webhooks/hubspot", BODY, _v3_headers())
+
+
+def test_no_secret_rejects_everything(secret, monkeypatch):
+    monkeypatch.setattr(CONFIG, "hubspot_client_secret", "")
+
+    assert not signature.verify_signature("POST", URI, V1_BODY, {"x-hubspot-signature": V1_SIGNATURE})
+
+
+# ---------- Events ----------
+def _event(event_id, kind: str = "contact.propertyChange", object_id: int = 1, occurred_at: int = 0, **fields) -> dict:
+    return {"eventId": event_id, "subscriptionType": kind, "objectId": object_id, "occurredAt": occurred_at, **fields}
+
+
+def test_latest_event_per_contact_wins(contact_events):
+    upserts, removals = contact_events.coalesce_events([
+        _event(1, "contact.deletion", object_id=1, occurred_at=2),
+        _event(2, "contact.creation", object_id=1, occurred_at=1),
+        _event(3, "contact.creation", object_id=2, occurred_at=1),
+        _event(4, "contact.merge", object_id=3, occurred_at=3, primaryObjectId=3, mergedObjectIds=[2, 3]),
+    ])
+
+    assert (upserts, removals) == (["3"], ["1", "2"])
+
+
+def test_redelivered_event_ids_are_dropped(contact_events, monkeypatch):
+    monkeypatch.setattr(CONFIG, "hubspot_webhook_batch_seconds", 5)
+
+    assert contact_events.enqueue_events(NS, [_event(1), _event(2, object_id=2), _event(1)]) == 2
+    assert contact_events.enqueue_events(NS, [_event(2, object_id=2), _event(3, "company.creation")]) == 0
+
+    pending = contact_events.redis_client.lrange(contact_events._pending_key(NS), 0, -1)
+    assert len(pending) == 2
+    assert contact_events.unindexed == ["1", "2"]
+    assert contact_events.scheduled == [{"kwargs": {"user_ns": NS}, "countdown": 5}]
+
+
+def test_events_without_an_event_id_are_always_queued(contact_events):
+    assert contact_events.enqueue_events(NS, [_event(None), _event(None)]) == 2
+    assert not contact_events.redis_client.exists(contact_events._seen_key(None))